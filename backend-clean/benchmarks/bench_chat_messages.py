@@ -0,0 +1,97 @@
+"""Benchmark: mensagens de chat aceitas por segundo em um worker
+
+Compara o caminho antigo (INSERT + commit por mensagem antes do emit) com o
+message_writer (ID gerado no processo, ack imediato e gravação em lotes por
+uma thread). Mede a taxa de aceite (o que limita o handler do Socket.IO) e a
+taxa de ponta a ponta até tudo estar gravado.
+
+Uso (a partir de backend-clean/):
+    python -m benchmarks.bench_chat_messages [--messages 20000] [--legacy-sample 2000] [--users 50]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from flask import Flask
+from src.models.user import db, User, Message
+from src.models.message_writer import message_writer, new_message, id_generator
+
+def create_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(app)
+    id_generator.configure(0)  # Um único processo gera IDs
+    with app.app_context():
+        db.create_all()
+    return app
+
+def seed(users):
+    db.session.execute(User.__table__.insert(), [
+        {'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': '-',
+         'followers_count': 0, 'following_count': 0}
+        for i in range(users)
+    ])
+    db.session.commit()
+    return [row[0] for row in db.session.query(User.id).all()]
+
+def workload(user_ids, count):
+    """Mensagens diretas entre pares aleatórios"""
+    rng = random.Random(42)
+    for i in range(count):
+        sender_id, receiver_id = rng.sample(user_ids, 2)
+        yield sender_id, {'content': f'mensagem {i}', 'receiver_id': receiver_id,
+                          'message_type': 'direct', 'client_id': f'c{i}'}
+
+def legacy_send(messages):
+    """Caminho antigo: uma mensagem e um commit por envio"""
+    for sender_id, data in messages:
+        db.session.add(new_message(sender_id, data))
+        db.session.commit()
+
+def writer_send(messages):
+    for sender_id, data in messages:
+        message_writer.submit(sender_id, data)
+    accepted = time.perf_counter()
+    while message_writer.flush():
+        pass
+    return accepted
+
+def run(count, legacy_sample, users):
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = create_app(path)
+        with app.app_context():
+            user_ids = seed(users)
+
+            start = time.perf_counter()
+            legacy_send(workload(user_ids, legacy_sample))
+            legacy_rate = legacy_sample / (time.perf_counter() - start)
+            db.session.query(Message).delete()
+            db.session.commit()
+
+            # Sem init_app: nenhuma thread concorre com o flush medido aqui
+            start = time.perf_counter()
+            accepted = writer_send(workload(user_ids, count))
+            elapsed = time.perf_counter() - start
+            stored = db.session.query(Message).count()
+        return legacy_rate, count / (accepted - start), elapsed, stored
+    finally:
+        os.remove(path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--legacy-sample', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=50)
+    args = parser.parse_args()
+
+    legacy_rate, accept_rate, elapsed, stored = run(args.messages, args.legacy_sample, args.users)
+    print(f'antes (commit por mensagem): {legacy_rate:,.0f} mensagens/s')
+    print(f'depois (write-behind): aceite {accept_rate:,.0f} mensagens/s; '
+          f'{stored:,} gravadas em {elapsed:.2f}s ({stored / elapsed:,.0f} mensagens/s)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark: likes/s em um único post "quente"
+
+Compara o caminho antigo (carregar post, procurar like, commit e COUNT(*) a
+cada clique) com o like_buffer (linha de Like durável + contador write-behind).
+
+Uso (a partir de backend-clean/):
+    python -m benchmarks.bench_hot_post_likes [--likes 5000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from flask import Flask
+from src.models.user import db, User, Post, Like
+from src.models.like_buffer import like_buffer
+
+def create_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(app)
+    like_buffer.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+def seed(users):
+    author = User(username='author', email='author@example.com', password_hash='-')
+    db.session.add(author)
+    db.session.flush()
+    db.session.add_all([
+        User(username=f'user{i}', email=f'user{i}@example.com', password_hash='-')
+        for i in range(users)
+    ])
+    post = Post(content='post viral', author_id=author.id)
+    db.session.add(post)
+    db.session.commit()
+    user_ids = [user_id for (user_id,) in db.session.query(User.id).filter(User.id != author.id)]
+    return post.id, user_ids
+
+def legacy_like(user_id, post_id):
+    """Caminho original de like_post"""
+    Post.query.get_or_404(post_id)
+    existing_like = Like.query.filter_by(user_id=user_id, post_id=post_id).first()
+    if existing_like:
+        db.session.delete(existing_like)
+    else:
+        db.session.add(Like(user_id=user_id, post_id=post_id))
+    db.session.commit()
+    return Like.query.filter_by(post_id=post_id).count()
+
+def buffered_like(user_id, post_id):
+    return like_buffer.like(user_id, post_id)[0]
+
+def run(like, likes):
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = create_app(path)
+        with app.app_context():
+            post_id, user_ids = seed(likes)
+            start = time.perf_counter()
+            for user_id in user_ids:
+                count = like(user_id, post_id)
+            like_buffer.flush()
+            elapsed = time.perf_counter() - start
+            stored = db.session.get(Post, post_id).likes_count
+        return likes / elapsed, count, stored
+    finally:
+        os.remove(path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--likes', type=int, default=5000)
+    args = parser.parse_args()
+    
+    for name, like in [('antes (síncrono)', legacy_like), ('depois (write-behind)', buffered_like)]:
+        rate, count, stored = run(like, args.likes)
+        print(f'{name}: {rate:,.0f} likes/s (contagem retornada={count}, gravada={stored})')
+
+if __name__ == '__main__':
+    main()
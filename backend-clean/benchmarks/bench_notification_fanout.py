@@ -0,0 +1,103 @@
+"""Benchmark: fan-out de uma notificação para todos os membros de uma comunidade
+
+Compara o caminho síncrono (um INSERT + commit por destinatário dentro da
+requisição) com o outbox (intenção gravada na requisição e INSERTs de várias
+linhas em blocos pelo worker). O caminho síncrono roda só em uma amostra e a
+taxa é extrapolada.
+
+Uso (a partir de backend-clean/):
+    python -m benchmarks.bench_notification_fanout [--recipients 50000] [--legacy-sample 2000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from flask import Flask
+from src.models.user import db, User, Community, Notification, community_members
+from src.models.outbox import outbox_worker, enqueue_notification
+
+def create_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+def seed(recipients):
+    """Comunidade com `recipients` membros além do dono"""
+    db.session.execute(User.__table__.insert(), [
+        {'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': '-',
+         'followers_count': 0, 'following_count': 0}
+        for i in range(recipients + 1)
+    ])
+    owner_id = db.session.query(db.func.min(User.id)).scalar()
+    community = Community(name='comunidade', owner_id=owner_id)
+    db.session.add(community)
+    db.session.flush()
+    db.session.execute(
+        community_members.insert().from_select(
+            ['user_id', 'community_id'],
+            db.select(User.id, db.literal(community.id))
+        )
+    )
+    db.session.commit()
+    return community.id, owner_id
+
+def legacy_fan_out(community_id, owner_id, limit):
+    """Caminho síncrono: uma notificação e um commit por membro"""
+    member_ids = [row[0] for row in db.session.execute(
+        db.select(community_members.c.user_id)
+        .where(community_members.c.community_id == community_id, community_members.c.user_id != owner_id)
+        .limit(limit)
+    )]
+    for user_id in member_ids:
+        db.session.add(Notification(user_id=user_id, title='Novo evento', content='...', notification_type='event'))
+        db.session.commit()
+    return len(member_ids)
+
+def outbox_fan_out(community_id, owner_id):
+    enqueue_notification('community', community_id, 'Novo evento', '...', 'event', actor_id=owner_id)
+    db.session.commit()
+    request_done = time.perf_counter()
+    while outbox_worker.process():
+        pass
+    return request_done
+
+def run(recipients, legacy_sample):
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = create_app(path)
+        with app.app_context():
+            community_id, owner_id = seed(recipients)
+            
+            start = time.perf_counter()
+            sent = legacy_fan_out(community_id, owner_id, legacy_sample)
+            legacy_rate = sent / (time.perf_counter() - start)
+            db.session.query(Notification).delete()
+            db.session.commit()
+            
+            start = time.perf_counter()
+            request_done = outbox_fan_out(community_id, owner_id)
+            elapsed = time.perf_counter() - start
+            delivered = db.session.query(Notification).count()
+        return legacy_rate, request_done - start, elapsed, delivered
+    finally:
+        os.remove(path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipients', type=int, default=50000)
+    parser.add_argument('--legacy-sample', type=int, default=2000)
+    args = parser.parse_args()
+    
+    legacy_rate, request_time, elapsed, delivered = run(args.recipients, args.legacy_sample)
+    print(f'antes (síncrono): {legacy_rate:,.0f} notificações/s; '
+          f'{args.recipients:,} destinatários levariam ~{args.recipients / legacy_rate:.1f}s na requisição')
+    print(f'depois (outbox): requisição {request_time * 1000:.1f}ms; worker entregou {delivered:,} '
+          f'em {elapsed:.1f}s ({delivered / elapsed:,.0f} notificações/s)')
+
+if __name__ == '__main__':
+    main()
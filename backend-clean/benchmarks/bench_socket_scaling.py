@@ -0,0 +1,189 @@
+"""Teste de carga: conexões Socket.IO e fan-out entre N workers
+
+Sobe o pub/sub local (scripts/local_pubsub.py) e N workers (python -m
+src.main) sobre um SQLite temporário. Cada worker recebe --clients-per-worker
+conexões de um processo de clientes próprio, como um balanceador com sessões
+fixas faria, e todas entram na sala de uma comunidade. Um cliente ligado ao
+primeiro worker envia --messages mensagens; cada uma precisa chegar a todas as
+conexões, em todos os workers, pela fila de mensagens.
+
+Mede o tempo para abrir as conexões e as entregas por segundo. Com a fila, o
+total de conexões cresce linearmente com o número de workers sem perder
+entregas; sem ela (--no-queue) só os clientes do primeiro worker recebem.
+
+Requer python-socketio[client] (requests e websocket-client) e redis, além das
+dependências do backend.
+
+Uso (a partir de backend-clean/):
+    python -m benchmarks.bench_socket_scaling [--workers 1 2 4] [--clients-per-worker 100] [--messages 20]
+"""
+import argparse
+import http.cookiejar
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import socketio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_healthy(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health')
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'worker na porta {port} não respondeu')
+
+def start_workers(count, database, queue_url):
+    """Subir os workers; o primeiro aplica as migrações antes dos outros"""
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database}', SECRET_KEY='bench-socket-scaling')
+    if queue_url:
+        # O pub/sub local só atende a fila: cache e presença ficam por processo,
+        # o que basta para medir o fan-out (ver ALLOW_LOCAL_STATE em src/main.py)
+        env.update(SOCKETIO_MESSAGE_QUEUE=queue_url, ALLOW_LOCAL_STATE='1')
+    processes, ports = [], []
+    for i in range(count):
+        port = free_port()
+        processes.append(subprocess.Popen(
+            [sys.executable, '-m', 'src.main'], cwd=ROOT,
+            env=dict(env, PORT=str(port), HOST='127.0.0.1', WORKER_ID=str(i)),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ))
+        ports.append(port)
+        if i == 0:
+            wait_healthy(port)
+    for port in ports:
+        wait_healthy(port)
+    return processes, ports
+
+def login(port):
+    """Registrar um usuário e criar a comunidade; retorna (cookie, community_id)"""
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+
+    def post(path, data):
+        request = urllib.request.Request(
+            f'http://127.0.0.1:{port}{path}', data=json.dumps(data).encode(),
+            headers={'Content-Type': 'application/json'}
+        )
+        return json.loads(opener.open(request).read())
+
+    post('/api/auth/register', {'username': 'bench', 'email': 'bench@example.com', 'password': 'bench'})
+    community = post('/api/communities/communities', {'name': 'bench'})['community']
+    cookie = '; '.join(f'{c.name}={c.value}' for c in jar)
+    return cookie, community['id']
+
+def client_process(port, cookie, clients, community_id, expected, ready, results, go):
+    """Abrir `clients` conexões num worker e contar as mensagens recebidas
+
+    `expected` é o número de mensagens enviadas; cada conexão recebe todas.
+    """
+    lock = threading.Lock()
+    state = {'received': 0, 'last': None}
+
+    def on_message(data):
+        with lock:
+            state['received'] += 1
+            state['last'] = time.time()
+
+    started = time.perf_counter()
+    connections = []
+    for _ in range(clients):
+        client = socketio.Client(reconnection=False)
+        client.on('new_message', on_message)
+        client.connect(f'http://127.0.0.1:{port}', headers={'Cookie': cookie}, transports=['websocket'])
+        client.call('sync', {'rooms': [{'type': 'community', 'id': community_id}]})  # Entra na sala
+        connections.append(client)
+    ready.put(time.perf_counter() - started)
+
+    go.wait()
+    expected *= clients
+    deadline = time.time() + 30
+    while state['received'] < expected and time.time() < deadline:
+        time.sleep(0.05)
+    results.put((state['received'], state['last']))
+    for client in connections:
+        client.disconnect()
+
+def run(workers, clients_per_worker, messages, use_queue):
+    handle, database = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    processes = []
+    try:
+        queue_url = None
+        if use_queue:
+            pubsub_port = free_port()
+            processes.append(subprocess.Popen(
+                [sys.executable, 'scripts/local_pubsub.py', '--port', str(pubsub_port)],
+                cwd=ROOT, stdout=subprocess.DEVNULL
+            ))
+            queue_url = f'redis://127.0.0.1:{pubsub_port}/0'
+
+        worker_processes, ports = start_workers(workers, database, queue_url)
+        processes += worker_processes
+        cookie, community_id = login(ports[0])
+
+        ready, results, go = multiprocessing.Queue(), multiprocessing.Queue(), multiprocessing.Event()
+        client_processes = [multiprocessing.Process(
+            target=client_process,
+            args=(port, cookie, clients_per_worker, community_id, messages, ready, results, go)
+        ) for port in ports]
+        for process in client_processes:
+            process.start()
+        connect_time = max(ready.get(timeout=300) for _ in client_processes)
+
+        sender = socketio.Client(reconnection=False)
+        sender.connect(f'http://127.0.0.1:{ports[0]}', headers={'Cookie': cookie}, transports=['websocket'])
+        go.set()
+        start = time.time()
+        for i in range(messages):
+            sender.call('send_message', {'content': f'mensagem {i}', 'message_type': 'community',
+                                         'community_id': community_id, 'client_id': f'bench-{i}'})
+        collected = [results.get(timeout=60) for _ in client_processes]
+        sender.disconnect()
+        for process in client_processes:
+            process.join()
+
+        received = sum(count for count, _ in collected)
+        last = max((at for _, at in collected if at), default=start)
+        return connect_time, received, received / max(last - start, 1e-6)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        os.remove(database)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients-per-worker', type=int, default=100)
+    parser.add_argument('--messages', type=int, default=20)
+    parser.add_argument('--no-queue', action='store_true', help='rodar sem SOCKETIO_MESSAGE_QUEUE')
+    args = parser.parse_args()
+
+    print('workers  conexões  abertura  entregas esperadas  recebidas  entregas/s')
+    for workers in args.workers:
+        connections = workers * args.clients_per_worker
+        expected = connections * args.messages
+        connect_time, received, rate = run(workers, args.clients_per_worker, args.messages, not args.no_queue)
+        print(f'{workers:>7}  {connections:>8}  {connect_time:>7.1f}s  {expected:>18,}  '
+              f'{received:>9,}  {rate:>10,.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Servidor de pub/sub compatível com Redis para desenvolvimento e testes
+
+Implementa só o necessário para a fila de mensagens do Socket.IO
+(SOCKETIO_MESSAGE_QUEUE): HELLO, PING, PUBLISH, SUBSCRIBE e UNSUBSCRIBE, em
+RESP2 ou RESP3 (o que o cliente pedir no HELLO). Não guarda dados nem
+substitui um Redis em produção; serve para rodar vários workers na mesma
+máquina sem instalar um servidor.
+
+Uso (a partir de backend-clean/):
+    python scripts/local_pubsub.py [--host 127.0.0.1] [--port 6390]
+    SOCKETIO_MESSAGE_QUEUE=redis://127.0.0.1:6390/0 ...
+"""
+import argparse
+import socketserver
+import threading
+
+def _encode(value, kind=b'*'):
+    """Codificar uma resposta RESP (bytes, str, int, lista); kind=b'>' para push do RESP3"""
+    if isinstance(value, dict):
+        return b'%%%d\r\n' % len(value) + b''.join(_encode(k) + _encode(v) for k, v in value.items())
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+    return kind + b'%d\r\n' % len(value) + b''.join(_encode(item) for item in value)
+
+class PubSubHandler(socketserver.StreamRequestHandler):
+
+    def setup(self):
+        super().setup()
+        self.channels = set()
+        self.protocol = 2
+        self.write_lock = threading.Lock()
+
+    def push(self, value):
+        """Mensagem de pub/sub: array no RESP2, push no RESP3"""
+        self.send(_encode(value, b'>' if self.protocol == 3 else b'*'))
+
+    def send(self, payload):
+        with self.write_lock:
+            self.wfile.write(payload)
+            self.wfile.flush()
+
+    def read_command(self):
+        """Ler um comando (array RESP ou linha inline); None no fim da conexão"""
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def handle(self):
+        try:
+            while True:
+                args = self.read_command()
+                if args is None:
+                    break
+                if args:
+                    self.execute(args[0].upper(), args[1:])
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self.server.unsubscribe(self, self.channels)
+
+    def execute(self, command, args):
+        if command == b'HELLO':
+            if args and args[0] not in (b'2', b'3'):
+                self.send(b'-NOPROTO unsupported protocol version\r\n')
+                return
+            self.protocol = int(args[0]) if args else self.protocol
+            info = {b'server': b'local_pubsub', b'version': b'7.0.0', b'proto': self.protocol,
+                    b'id': id(self) % 100000, b'mode': b'standalone', b'role': b'master', b'modules': []}
+            if self.protocol == 3:
+                self.send(_encode(info))
+            else:
+                self.send(_encode([item for pair in info.items() for item in pair]))
+        elif command == b'PING':
+            if self.channels and self.protocol == 2:
+                self.send(_encode([b'pong', b'']))
+            else:
+                self.send(b'+PONG\r\n')
+        elif command == b'PUBLISH' and len(args) == 2:
+            self.send(_encode(self.server.publish(args[0], args[1])))
+        elif command == b'SUBSCRIBE' and args:
+            for channel in args:
+                self.channels.add(channel)
+                self.server.subscribe(self, channel)
+                self.push([b'subscribe', channel, len(self.channels)])
+        elif command == b'UNSUBSCRIBE':
+            for channel in args or list(self.channels):
+                self.channels.discard(channel)
+                self.server.unsubscribe(self, [channel])
+                self.push([b'unsubscribe', channel, len(self.channels)])
+        elif command in (b'SELECT', b'CLIENT'):
+            self.send(b'+OK\r\n')
+        else:
+            self.send(b'-ERR unknown command\r\n')
+
+class PubSubServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, PubSubHandler)
+        self.subscribers = {}  # canal -> {handler}
+        self.lock = threading.Lock()
+
+    def subscribe(self, handler, channel):
+        with self.lock:
+            self.subscribers.setdefault(channel, set()).add(handler)
+
+    def unsubscribe(self, handler, channels):
+        with self.lock:
+            for channel in channels:
+                self.subscribers.get(channel, set()).discard(handler)
+
+    def publish(self, channel, message):
+        with self.lock:
+            handlers = list(self.subscribers.get(channel, ()))
+        delivered = 0
+        for handler in handlers:
+            try:
+                handler.push([b'message', channel, message])
+                delivered += 1
+            except OSError:
+                pass
+        return delivered
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+
+    server = PubSubServer((args.host, args.port))
+    print(f'pub/sub em redis://{args.host}:{args.port}/0', flush=True)
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env bash
+# Sobe N workers do backend, um processo eventlet por porta, ligados pela fila
+# de mensagens do Socket.IO.
+#
+# O Socket.IO precisa de sessões fixas (sticky): o long-polling do Engine.IO
+# faz várias requisições HTTP que têm de cair no mesmo processo. Por isso cada
+# worker escuta numa porta própria e o balanceador escolhe o worker pelo IP do
+# cliente (ver scripts/nginx-socketio.conf), em vez de vários processos atrás
+# da mesma porta.
+#
+# Além da fila, os workers compartilham cache (versões, grafo de follows) e
+# presença por CACHE_REDIS_URL (PRESENCE_REDIS_URL, se for outro servidor);
+# com mais de um worker o script recusa subir sem eles. A fila usa o mesmo
+# Redis quando SOCKETIO_MESSAGE_QUEUE não é informada.
+#
+# Uso (a partir de backend-clean/):
+#   CACHE_REDIS_URL=redis://redis:6379/1 WORKERS=4 BASE_PORT=5001 scripts/run_workers.sh
+#   CACHE_REDIS_URL=redis://redis:6379/1 SOCKETIO_MESSAGE_QUEUE=redis://redis:6379/0 WORKERS=4 scripts/run_workers.sh
+#   WORKERS=1 scripts/run_workers.sh  # um worker: cache, presença e emits locais
+set -euo pipefail
+cd "$(dirname "$0")/.."
+
+WORKERS=${WORKERS:-2}
+BASE_PORT=${BASE_PORT:-5001}
+PIDS=()
+
+cleanup() {
+  kill "${PIDS[@]}" 2>/dev/null || true
+}
+trap cleanup EXIT INT TERM
+
+wait_healthy() {
+  until python -c "import sys, urllib.request; urllib.request.urlopen(sys.argv[1])" \
+      "http://127.0.0.1:$1/api/health" 2>/dev/null; do
+    sleep 0.5
+  done
+}
+
+if [ "$WORKERS" -gt 1 ]; then
+  if [ -z "${CACHE_REDIS_URL:-}" ]; then
+    echo "Com WORKERS=$WORKERS defina CACHE_REDIS_URL (e PRESENCE_REDIS_URL, se for outro servidor):" \
+      "cache e presença locais divergem entre os workers" >&2
+    exit 1
+  fi
+  export SOCKETIO_MESSAGE_QUEUE="${SOCKETIO_MESSAGE_QUEUE:-$CACHE_REDIS_URL}"
+fi
+
+for i in $(seq 0 $((WORKERS - 1))); do
+  port=$((BASE_PORT + i))
+  # WORKER_ID distinto mantém os IDs de mensagem únicos entre processos
+  WORKER_ID=$i PORT=$port python -m src.main &
+  PIDS+=($!)
+  if [ "$i" -eq 0 ]; then
+    # O primeiro worker aplica as migrações antes dos outros subirem
+    wait_healthy "$port"
+  fi
+done
+
+echo "$WORKERS worker(s) nas portas $BASE_PORT-$((BASE_PORT + WORKERS - 1)); fila: ${SOCKETIO_MESSAGE_QUEUE:-nenhuma}"
+wait
@@ -0,0 +1,222 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Cache de leitura (read-through) para respostas anônimas. Os valores são
+# guardados como JSON, então cada leitura devolve objetos novos que podem ser
+# decorados com o estado do visitante sem sujar o cache.
+#
+# Invalidação por chaves versionadas: cada entidade tem um contador de versão
+# ("post:5", "community:2", "posts" para as listas) que entra na chave; os
+# handlers de escrita chamam bump() e as entradas antigas simplesmente deixam
+# de ser lidas até expirarem.
+#
+# Payloads em cache não embutem entidades relacionadas (autor, comunidade,
+# dono): guardam só os IDs, e quem lê preenche cada uma a partir da entrada
+# dela ("user:<id>", "community:<id>", ver cached_many). Assim uma mudança no
+# autor invalida só a entrada do autor, não todos os posts que o mostram.
+#
+# O LocalCache é por processo. Um job em processo separado que invalida ou
+# ajusta valores não alcança os workers web sem o backend compartilhado: os que
+# dependem disso chamam require_shared; os demais só avisam (is_shared) e
+# contam com a expiração das entradas.
+
+DEFAULT_TTL = 60
+
+logger = logging.getLogger(__name__)
+
+class LocalCache:
+    """Backend em processo: LRU limitado com expiração por TTL"""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        # Versões ficam fora do LRU: se fossem despejadas voltariam a 0 e
+        # chaves antigas poderiam ser lidas de novo
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def add(self, key, delta):
+        """Somar a um número guardado; None (sem criar) se a chave não estiver em cache"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data[key] = (int(value) + delta, expires_at)
+            return int(value) + delta
+
+    def add_many(self, keys, delta):
+        for key in keys:
+            self.add(key, delta)
+
+    def counter(self, key):
+        return self._counters.get(key, 0)
+
+    def counters(self, keys):
+        return [self._counters.get(key, 0) for key in keys]
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+class RedisCache:
+    """Backend compartilhado entre workers, para qualquer cliente compatível com Redis"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        value = self.client.get(key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, value, ex=ttl)
+
+    def get_many(self, keys):
+        return [value.decode() if isinstance(value, bytes) else value for value in self.client.mget(keys)]
+
+    # INCRBY só se a chave existir, para não criar contagens parciais
+    _ADD_IF_EXISTS = (
+        "if redis.call('exists', KEYS[1]) == 1 then "
+        "return redis.call('incrby', KEYS[1], ARGV[1]) end return nil"
+    )
+
+    def add(self, key, delta):
+        return self.client.eval(self._ADD_IF_EXISTS, 1, key, delta)
+
+    def add_many(self, keys, delta):
+        pipeline = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.eval(self._ADD_IF_EXISTS, 1, key, delta)
+        pipeline.execute()
+
+    def counter(self, key):
+        return int(self.client.get(key) or 0)
+
+    def counters(self, keys):
+        return [int(value or 0) for value in self.client.mget(keys)] if keys else []
+
+    def incr(self, key):
+        return self.client.incr(key)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+def create_backend():
+    """Escolher o backend a partir de CACHE_REDIS_URL (padrão: cache local)"""
+    redis_url = os.environ.get('CACHE_REDIS_URL')
+    if redis_url:
+        try:
+            import redis
+        except ImportError:
+            logger.warning('CACHE_REDIS_URL definido, mas o pacote redis não está instalado; usando cache local')
+        else:
+            return RedisCache(redis.Redis.from_url(redis_url))
+
+    return LocalCache(max_entries=int(os.environ.get('CACHE_MAX_ENTRIES', 2048)))
+
+backend = create_backend()
+
+def is_shared():
+    """Se o backend é visto por todos os processos (Redis) ou só por este"""
+    return not isinstance(backend, LocalCache)
+
+def require_shared(purpose):
+    """Falhar se o backend for local: as mudanças feitas aqui não chegariam aos workers"""
+    if not is_shared():
+        raise RuntimeError(f'{purpose} precisa de um cache compartilhado: defina CACHE_REDIS_URL '
+                           '(e instale o pacote redis)')
+
+def version(namespace):
+    """Versão atual de um namespace (ex.: 'post:5')"""
+    return backend.counter(f'v:{namespace}')
+
+def bump(*namespaces):
+    """Invalidar namespaces incrementando suas versões"""
+    for namespace in namespaces:
+        if namespace is not None:
+            backend.incr(f'v:{namespace}')
+
+def _key(name, versions, params):
+    key = f'{name}:' + ':'.join(str(v) for v in versions)
+    if params:
+        key += ':' + json.dumps(params, sort_keys=True)
+    return key
+
+def cached(name, namespaces, compute, params=None, ttl=DEFAULT_TTL):
+    """Ler de cache ou calcular e guardar; compute() pode retornar None (não guardado)
+
+    A chave combina o nome, as versões dos namespaces e os parâmetros da consulta.
+    """
+    key = _key(name, [version(namespace) for namespace in namespaces], params)
+
+    hit = backend.get(key)
+    if hit is not None:
+        return json.loads(hit)
+
+    value = compute()
+    if value is not None:
+        backend.set(key, json.dumps(value), ttl=ttl)
+    return value
+
+def cached_many(name, ids, compute, ttl=DEFAULT_TTL):
+    """Versão em lote de cached() para entidades por ID; retorna {id: valor}
+
+    Usa as mesmas chaves de cached(name, [f'{name}:{id}'], params={'id': id}).
+    compute(ids) recebe só os IDs ausentes e retorna {id: valor}; IDs que ele
+    não devolver ficam fora do resultado.
+    """
+    ids = list(dict.fromkeys(i for i in ids if i is not None))
+    if not ids:
+        return {}
+    versions = backend.counters([f'v:{name}:{i}' for i in ids])
+    keys = [_key(name, [v], {'id': i}) for i, v in zip(ids, versions)]
+
+    found = {}
+    for i, hit in zip(ids, backend.get_many(keys)):
+        if hit is not None:
+            found[i] = json.loads(hit)
+
+    missing = [i for i in ids if i not in found]
+    if missing:
+        computed = compute(missing)
+        for i, key in zip(ids, keys):
+            if i in computed:
+                backend.set(key, json.dumps(computed[i]), ttl=ttl)
+                found[i] = computed[i]
+    return found
@@ -0,0 +1,114 @@
+"""Verificação dos planos de execução das consultas quentes
+
+Roda EXPLAIN em cada consulta e termina com erro se alguma delas cair em
+varredura completa da tabela (full scan). A mesma verificação roda na suíte de
+testes (tests/test_query_plans.py, com python -m pytest); este job serve para
+conferir um banco real após aplicar migrações.
+
+Uso (a partir de backend-clean/):
+    python -m src.jobs.check_query_plans
+"""
+import re
+import sys
+
+from sqlalchemy import select, text
+from src.main import app
+from src.models.user import (
+    db, User, Post, Comment, Like, Message, Notification, Event, FollowSuggestion, NotificationOutbox,
+    Conversation, community_members, event_participants, user_follows
+)
+
+def hot_queries():
+    """Consultas representativas dos caminhos quentes, com parâmetros fixos"""
+    return {
+        'feed global': select(Post).order_by(Post.created_at.desc()).limit(20),
+        'feed da comunidade': select(Post).where(Post.community_id == 1)
+            .order_by(Post.created_at.desc()).limit(20),
+        'posts do autor': select(Post).where(Post.author_id == 1)
+            .order_by(Post.created_at.desc()).limit(20),
+        'feed hot': select(Post).order_by(Post.hot_score.desc()).limit(20),
+        'feed hot da comunidade': select(Post).where(Post.community_id == 1)
+            .order_by(Post.hot_score.desc()).limit(20),
+        'feed top': select(Post).order_by(Post.likes_count.desc()).limit(20),
+        'likes do post': select(Like).where(Like.post_id == 1),
+        'comentários do post': select(Comment).where(Comment.post_id == 1)
+            .order_by(Comment.created_at.asc()).limit(20),
+        'notificações não lidas': select(Notification)
+            .where(Notification.user_id == 1, Notification.is_read == False)
+            .order_by(Notification.created_at.desc()).limit(20),
+        'notificações do usuário': select(Notification).where(Notification.user_id == 1)
+            .order_by(Notification.created_at.desc()).limit(20),
+        'grupo de notificação': select(Notification).where(
+            Notification.user_id == 1, Notification.notification_type == 'follow',
+            Notification.related_id == None, Notification.bucket == 1),
+        'mensagens diretas': select(Message)
+            .where(Message.sender_id == 1, Message.receiver_id == 2, Message.id < 10 ** 12)
+            .order_by(Message.id.desc()).limit(50),
+        'conversas do usuário': select(Conversation, Message)
+            .outerjoin(Message, Message.id == Conversation.last_message_id)
+            .where(Conversation.user_id == 1)
+            .order_by(Conversation.last_message_id.desc(), Conversation.partner_id.desc()).limit(50),
+        'conversas com o parceiro': select(Conversation.user_id).where(Conversation.partner_id == 1),
+        'leitura da conversa': select(Message.id).where(
+            Message.sender_id == 1, Message.receiver_id == 2, Message.id <= 10 ** 12,
+            Message.message_type == 'direct', Message.is_read == False
+        ),
+        'chat da comunidade': select(Message).where(Message.community_id == 1, Message.id < 10 ** 12)
+            .order_by(Message.id.desc()).limit(50),
+        'chat do evento': select(Message).where(Message.event_id == 1, Message.id > 10 ** 12)
+            .order_by(Message.id.asc()).limit(50),
+        'eventos por data': select(Event).order_by(Event.start_date.asc()).limit(20),
+        'seguidores': select(user_follows).where(user_follows.c.followed_id == 1),
+        'seguindo': select(user_follows).where(user_follows.c.follower_id == 1),
+        'sugestões de follow': select(FollowSuggestion).where(FollowSuggestion.user_id == 1)
+            .order_by(FollowSuggestion.mutual_count.desc()).limit(20),
+        'outbox pendente': select(NotificationOutbox.id).where(NotificationOutbox.processed_at == None)
+            .order_by(NotificationOutbox.id).limit(20),
+        'fan-out para membros': select(community_members.c.user_id).where(
+            community_members.c.community_id == 1, community_members.c.user_id > 0)
+            .order_by(community_members.c.user_id).limit(1000),
+        'fan-out para participantes': select(event_participants.c.user_id).where(
+            event_participants.c.event_id == 1, event_participants.c.user_id > 0)
+            .order_by(event_participants.c.user_id).limit(1000),
+        'usuários mais seguidos': select(User).order_by(User.followers_count.desc()).limit(30),
+    }
+
+def explain(statement):
+    """Obter as linhas do plano de execução para o dialeto atual"""
+    dialect = db.engine.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    
+    with db.engine.connect() as conn:
+        if dialect.name == 'sqlite':
+            rows = conn.execute(text(f'EXPLAIN QUERY PLAN {sql}')).fetchall()
+            return [row[-1] for row in rows]
+        
+        # Em tabelas pequenas o Postgres prefere Seq Scan; desabilitar para
+        # verificar se existe um índice utilizável
+        conn.execute(text('SET enable_seqscan = off'))
+        rows = conn.execute(text(f'EXPLAIN {sql}')).fetchall()
+        return [row[0] for row in rows]
+
+def is_full_scan(plan_line):
+    # SQLite: "SCAN post" (sem "USING INDEX"); Postgres: "Seq Scan on post"
+    if re.match(r'^SCAN \S+$', plan_line.strip()):
+        return True
+    return 'Seq Scan' in plan_line
+
+def main():
+    failures = []
+    
+    with app.app_context():
+        for name, statement in hot_queries().items():
+            plan = explain(statement)
+            status = 'FULL SCAN' if any(is_full_scan(line) for line in plan) else 'ok'
+            print(f'[{status}] {name}: {" | ".join(plan)}')
+            if status != 'ok':
+                failures.append(name)
+    
+    if failures:
+        print(f'{len(failures)} consulta(s) sem índice: {", ".join(failures)}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
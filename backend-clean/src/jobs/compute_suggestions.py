@@ -0,0 +1,34 @@
+"""Cálculo periódico das sugestões de quem seguir
+
+Uso (a partir de backend-clean/):
+    python -m src.jobs.compute_suggestions [--interval 3600] [--top-n 20] [--block-size 2000]
+
+Sem --interval roda uma vez; com --interval fica em loop. Usa numpy/scipy se
+estiverem instalados (recomendado em produção).
+"""
+import argparse
+import time
+
+from src.main import app
+from src.models.suggestions import compute_suggestions, TOP_N, BLOCK_SIZE
+
+def main():
+    parser = argparse.ArgumentParser(description='Recalcular sugestões de quem seguir')
+    parser.add_argument('--interval', type=int, help='segundos entre passes (loop)')
+    parser.add_argument('--top-n', type=int, default=TOP_N)
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE)
+    args = parser.parse_args()
+    
+    while True:
+        started = time.perf_counter()
+        with app.app_context():
+            stats = compute_suggestions(top_n=args.top_n, block_size=args.block_size)
+        elapsed = time.perf_counter() - started
+        print(f"{stats['suggestions']} sugestão(ões) para {stats['users']} usuário(s) em {elapsed:.1f}s")
+        
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Retenção periódica de notificações (arquivar e remover em lotes)
+
+Uso (a partir de backend-clean/):
+    python -m src.jobs.notification_retention [--interval 3600] [--read-days 30]
+        [--max-per-user 1000] [--outbox-days 7] [--batch-size 1000] [--pause 0.05]
+
+Sem --interval roda uma vez; com --interval fica em loop. Imprime uma linha
+JSON de métricas por política (linhas movidas, lotes, duração). A remoção
+ajusta as contagens de não lidas no cache; com o cache local (sem
+CACHE_REDIS_URL) o ajuste não chega aos workers web, que releem a contagem do
+banco quando ela expira (unread.COUNT_TTL).
+"""
+import argparse
+import json
+import time
+
+from src.main import app
+from src.models import retention
+from src import cache
+
+def main():
+    parser = argparse.ArgumentParser(description='Arquivar notificações antigas')
+    parser.add_argument('--interval', type=int, help='segundos entre passes (loop)')
+    parser.add_argument('--read-days', type=int, default=retention.READ_RETENTION_DAYS)
+    parser.add_argument('--max-per-user', type=int, default=retention.MAX_PER_USER)
+    parser.add_argument('--outbox-days', type=int, default=retention.OUTBOX_RETENTION_DAYS)
+    parser.add_argument('--batch-size', type=int, default=retention.BATCH_SIZE)
+    parser.add_argument('--pause', type=float, default=retention.PAUSE)
+    args = parser.parse_args()
+    if not cache.is_shared():
+        app.logger.warning('notification_retention sem cache compartilhado (CACHE_REDIS_URL): '
+                           'as contagens de não lidas nos workers web se corrigem ao expirar')
+    
+    while True:
+        with app.app_context():
+            metrics = retention.run_retention(
+                read_days=args.read_days,
+                max_per_user=args.max_per_user,
+                outbox_days=args.outbox_days,
+                batch_size=args.batch_size,
+                pause=args.pause
+            )
+        for item in metrics:
+            print(json.dumps(item))
+        
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Worker do outbox de notificações em um processo separado
+
+Uso (a partir de backend-clean/):
+    python -m src.jobs.notification_worker [--once]
+
+O servidor web (python -m src.main) já roda o worker em uma thread; este
+comando serve para escalar a entrega separadamente ou para servir apps
+iniciados de outra forma (ex.: gunicorn src.main:app), que não o iniciam. Vários processos podem rodar ao mesmo tempo. Exige o
+cache compartilhado (CACHE_REDIS_URL), onde ficam as contagens de não lidas, e
+SOCKETIO_MESSAGE_QUEUE para o push chegar aos clientes dos workers web.
+"""
+import argparse
+import os
+import time
+
+from src.main import app
+from src.models.outbox import outbox_worker, POLL_INTERVAL
+from src import cache
+
+def main():
+    parser = argparse.ArgumentParser(description='Entregar notificações pendentes do outbox')
+    parser.add_argument('--once', action='store_true', help='processar o que estiver pendente e sair')
+    args = parser.parse_args()
+    cache.require_shared('notification_worker')
+    if not os.environ.get('SOCKETIO_MESSAGE_QUEUE'):
+        # Sem a fila o push sairia por um SocketIO sem clientes e se perderia
+        parser.error('defina SOCKETIO_MESSAGE_QUEUE para o push chegar aos workers web')
+    
+    total = 0
+    while True:
+        with app.app_context():
+            processed = outbox_worker.process()
+        total += processed
+        
+        if not processed:
+            if args.once:
+                break
+            time.sleep(POLL_INTERVAL)
+    
+    print(f'{total} intenção(ões) entregue(s)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+"""Job offline de reconciliação dos contadores denormalizados
+
+Uso (a partir de backend-clean/):
+    python -m src.jobs.reconcile_counters [--batch-size 1000]
+"""
+import argparse
+
+from src.main import app
+from src.models.counters import reconcile_counters
+
+def main():
+    parser = argparse.ArgumentParser(description='Recalcular contadores denormalizados')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+    
+    with app.app_context():
+        fixed = reconcile_counters(batch_size=args.batch_size)
+    
+    for name, count in fixed.items():
+        print(f'{name}: {count} linha(s) corrigida(s)')
+
+if __name__ == '__main__':
+    main()
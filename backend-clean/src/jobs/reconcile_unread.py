@@ -0,0 +1,41 @@
+"""Reconciliação periódica das contagens de não lidas
+
+Uso (a partir de backend-clean/):
+    python -m src.jobs.reconcile_unread [--interval 600] [--batch-size 1000]
+
+Regrava as contagens de notificações no backend compartilhado
+(CACHE_REDIS_URL) e corrige as não lidas da tabela conversation que divergirem
+das mensagens. Sem o backend compartilhado só a parte das conversas roda: o
+cache local deste processo não é o dos workers web, onde o TTL corrige as
+contagens.
+"""
+import argparse
+import time
+
+from src.main import app
+from src.models.unread import reconcile, RECONCILE_BATCH_SIZE
+from src.models import conversations
+from src import cache
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconciliar contagens de não lidas')
+    parser.add_argument('--interval', type=int, help='segundos entre passes (loop)')
+    parser.add_argument('--batch-size', type=int, default=RECONCILE_BATCH_SIZE)
+    args = parser.parse_args()
+    
+    while True:
+        with app.app_context():
+            notifications = reconcile(batch_size=args.batch_size) if cache.is_shared() else None
+            fixed = conversations.reconcile(batch_size=args.batch_size)
+        if notifications is None:
+            print('Cache local: contagens de notificações não regravadas (defina CACHE_REDIS_URL)')
+        else:
+            print(f'{notifications} contagem(ns) de notificações regravada(s)')
+        print(f'{fixed} conversa(s) corrigida(s)')
+        
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""Passe periódico de re-decaimento das pontuações hot dos posts
+
+Uso (a partir de backend-clean/):
+    python -m src.jobs.redecay_scores [--interval 300] [--batch-size 1000]
+
+Sem --interval roda uma vez; com --interval fica em loop. Com o cache
+compartilhado (CACHE_REDIS_URL) os feeds em cache são invalidados ao fim de
+cada passe; com o cache local, os workers web só veem as novas pontuações
+quando as páginas em cache expiram (cache.DEFAULT_TTL).
+"""
+import argparse
+import time
+
+from src.main import app
+from src.models.ranking import redecay
+from src import cache
+
+def main():
+    parser = argparse.ArgumentParser(description='Recalcular pontuações hot')
+    parser.add_argument('--interval', type=int, help='segundos entre passes (loop)')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+    if not cache.is_shared():
+        app.logger.warning('redecay_scores sem cache compartilhado (CACHE_REDIS_URL): '
+                           'os feeds em cache nos workers web só mudam ao expirar')
+    
+    while True:
+        with app.app_context():
+            updated = redecay(batch_size=args.batch_size)
+        cache.bump('posts')
+        print(f'{updated} post(s) recalculado(s)')
+        
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+if __name__ == '__main__':
+    main()
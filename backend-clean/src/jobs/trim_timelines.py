@@ -0,0 +1,33 @@
+"""Passe periódico que limita as home timelines a TIMELINE_SIZE entradas
+
+O feed apara a timeline de quem o abre; este job cobre os usuários inativos,
+que continuam recebendo entradas pelo fan-out na escrita.
+
+Uso (a partir de backend-clean/):
+    python -m src.jobs.trim_timelines [--interval 900] [--batch-size 1000]
+
+Sem --interval roda uma vez; com --interval fica em loop.
+"""
+import argparse
+import time
+
+from src.main import app
+from src.models.timeline import trim_timelines
+
+def main():
+    parser = argparse.ArgumentParser(description='Aparar as home timelines')
+    parser.add_argument('--interval', type=int, help='segundos entre passes (loop)')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+    
+    while True:
+        with app.app_context():
+            removed = trim_timelines(batch_size=args.batch_size)
+        print(f'{removed} entrada(s) removida(s)')
+        
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+if __name__ == '__main__':
+    main()
@@ -12,8 +12,17 @@ from flask_cors import CORS
 import os
 
 # Importações corrigidas para execução como módulo
+from . import cache
 from .models.user import db
-from .routes import auth, communities, events, posts, messages, notifications, follows, upload, user
+from .models.migrations import run_migrations
+from .models.like_buffer import like_buffer
+from .models.autocomplete import autocomplete
+from .models.notification_push import notification_pusher
+from .models.outbox import outbox_worker
+from .models.message_writer import message_writer
+from .models.presence import presence
+from .models.typing_indicator import typing_indicators
+from .routes import auth, communities, events, posts, messages, notifications, follows, upload, user, search
 
 app = Flask(__name__)
 # O ideal é que as instâncias de pastas e db fiquem fora do app factory, mas vamos manter assim por enquanto
@@ -41,7 +50,32 @@ CORS(app, origins=['https://gameversu.com', 'http://localhost:5173'], supports_c
 
 # Inicializar extensões
 db.init_app(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
+like_buffer.init_app(app)
+presence.init_app(app)
+# Com mais de um worker, SOCKETIO_MESSAGE_QUEUE (ex.: redis://host:6379/0) leva
+# os emits de um processo aos clientes conectados nos outros; sem ela, cada
+# worker só alcança as próprias conexões. Ver scripts/run_workers.sh.
+#
+# A fila só resolve os emits: cache (versões, grafo de follows) e presença
+# também precisam ser compartilhados entre os workers, então com a fila o
+# backend exige CACHE_REDIS_URL (e PRESENCE_REDIS_URL, se for outro servidor).
+# ALLOW_LOCAL_STATE=1 libera o estado por processo, só para testes de carga do
+# fan-out (benchmarks/bench_socket_scaling.py).
+message_queue = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+if message_queue and os.environ.get('ALLOW_LOCAL_STATE') != '1':
+    if not cache.is_shared() or not presence.is_shared():
+        raise RuntimeError('SOCKETIO_MESSAGE_QUEUE indica mais de um worker: defina CACHE_REDIS_URL '
+                           '(e PRESENCE_REDIS_URL) para compartilhar cache e presença entre eles')
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    message_queue=message_queue,
+    channel=os.environ.get('SOCKETIO_CHANNEL', 'gameversu-socketio')
+)
+notification_pusher.init_app(app, socketio)
+message_writer.init_app(app, socketio)
+typing_indicators.init_app(app, socketio)
+messages.init_socketio_events(socketio)
 
 # BLOCO CORRIGIDO
 app.register_blueprint(auth.auth_bp, url_prefix='/api/auth')
@@ -53,18 +87,26 @@ app.register_blueprint(notifications.notifications_bp, url_prefix='/api/notifica
 app.register_blueprint(follows.follows_bp, url_prefix='/api/follows')
 app.register_blueprint(upload.upload_bp, url_prefix='/api/upload')
 app.register_blueprint(user.user_bp, url_prefix='/api/user')
+app.register_blueprint(search.search_bp, url_prefix='/api/search')
 
 
 with app.app_context():
     db.create_all()
+    run_migrations()
+    message_writer.resume_ids()
+
+autocomplete.init_app(app)
+outbox_worker.init_app(app)
 
 @app.route('/api/health')
 def health():
     return {'status': 'ok'}
 
-@socketio.on('connect')
-def on_connect():
-    print(f'Cliente conectado: {request.sid}')
-    emit('connected', {'data': 'Conectado!'})
+# Eventos do Socket.IO: ver init_socketio_events em routes/messages.py
 
-# ... (resto dos seus eventos socketio, se houver mais) ...
+if __name__ == '__main__':
+    # python -m src.main (um worker; PORT define a porta). A entrega do outbox
+    # só roda no servidor web: jobs e testes importam o app sem iniciá-la, e
+    # fora deste caminho ela fica com src.jobs.notification_worker.
+    outbox_worker.start()
+    socketio.run(app, host=os.environ.get('HOST', '0.0.0.0'), port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,232 @@
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from src.models.user import db, User
+
+# Índice em memória para autocompletar usuários (@menções, busca de usuários).
+# Chaves normalizadas (username, display_name e cada palavra do display_name)
+# ficam em uma lista ordenada com um array paralelo de IDs: uma busca por
+# prefixo é uma bisseção seguida de uma varredura curta. Para termos que
+# aparecem no meio do nome há um índice de trigramas (trigrama -> array
+# ordenado de IDs). Nenhuma consulta ao banco acontece durante a busca.
+#
+# Cada worker tem sua cópia: os handlers do próprio worker atualizam o índice
+# na hora e uma thread o reconstrói periodicamente para trazer as mudanças
+# feitas pelos outros workers. O índice é construído na primeira busca, então
+# processos que só importam o app (jobs, testes) não leem os usuários nem
+# iniciam a thread.
+
+REBUILD_INTERVAL = 300  # segundos entre reconstruções completas
+BUILD_BATCH_SIZE = 5000
+MAX_SCAN = 200  # chaves varridas por busca de prefixo
+DEFAULT_LIMIT = 10
+
+def normalize(value):
+    """Minúsculas e sem acentos"""
+    value = value or ''
+    if value.isascii():
+        return value.lower().strip()
+    decomposed = unicodedata.normalize('NFKD', value)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+def _entry(username, display_name):
+    """Chaves de prefixo e texto normalizado de um usuário"""
+    username, display_name = normalize(username), normalize(display_name)
+    keys = {username, display_name}
+    keys.update(display_name.split())
+    keys.discard('')
+    return keys, f'{username} {display_name}'
+
+def _trigrams(value):
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+class _Snapshot:
+    """Estruturas do índice; trocadas inteiras ao reconstruir"""
+
+    def __init__(self):
+        self.keys = []  # chaves normalizadas em ordem
+        self.ids = array('q')  # ID do usuário de cada chave
+        self.trigrams = {}  # trigrama -> array ordenado de IDs
+        self.users = {}  # id -> (username, display_name, avatar_url, chaves, texto normalizado)
+
+    def add(self, user_id, username, display_name, avatar_url):
+        keys, text = _entry(username, display_name)
+        self.users[user_id] = (username, display_name, avatar_url, keys, text)
+
+        for key in keys:
+            position = bisect_left(self.keys, key)
+            while position < len(self.keys) and self.keys[position] == key and self.ids[position] < user_id:
+                position += 1
+            self.keys.insert(position, key)
+            self.ids.insert(position, user_id)
+
+        for trigram in _trigrams(text):
+            ids = self.trigrams.setdefault(trigram, array('q'))
+            position = bisect_left(ids, user_id)
+            if position == len(ids) or ids[position] != user_id:
+                ids.insert(position, user_id)
+
+    def remove(self, user_id):
+        entry = self.users.pop(user_id, None)
+        if entry is None:
+            return
+        _, _, _, keys, text = entry
+
+        for key in keys:
+            position = bisect_left(self.keys, key)
+            while position < len(self.keys) and self.keys[position] == key:
+                if self.ids[position] == user_id:
+                    del self.keys[position]
+                    del self.ids[position]
+                    break
+                position += 1
+
+        for trigram in _trigrams(text):
+            ids = self.trigrams.get(trigram)
+            if ids is None:
+                continue
+            position = bisect_left(ids, user_id)
+            if position < len(ids) and ids[position] == user_id:
+                del ids[position]
+            if not ids:
+                del self.trigrams[trigram]
+
+    @classmethod
+    def bulk(cls, rows):
+        """Construir de uma vez (ordenando no final em vez de inserir um a um)"""
+        snapshot = cls()
+        pairs = []
+        postings = {}
+        for user_id, username, display_name, avatar_url in rows:
+            keys, text = _entry(username, display_name)
+            snapshot.users[user_id] = (username, display_name, avatar_url, keys, text)
+            pairs.extend((key, user_id) for key in keys)
+            for trigram in _trigrams(text):
+                postings.setdefault(trigram, []).append(user_id)
+
+        pairs.sort()
+        snapshot.keys = [key for key, _ in pairs]
+        snapshot.ids = array('q', (user_id for _, user_id in pairs))
+        snapshot.trigrams = {trigram: array('q', sorted(ids)) for trigram, ids in postings.items()}
+        return snapshot
+
+class AutocompleteIndex:
+
+    def __init__(self):
+        self.app = None
+        self._snapshot = _Snapshot()
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._refresher = None
+
+    def init_app(self, app):
+        self.app = app
+
+    def _ensure_built(self):
+        """Construir o índice e iniciar a reconstrução periódica na primeira busca"""
+        if self._refresher is not None or self.app is None:
+            return
+        with self._build_lock:
+            if self._refresher is None:
+                self.build()
+                self._refresher = threading.Thread(target=self._run, daemon=True)
+                self._refresher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(REBUILD_INTERVAL)
+            try:
+                with self.app.app_context():
+                    self.build()
+            except Exception:
+                self.app.logger.exception('Erro ao reconstruir o índice de autocompletar')
+
+    def build(self, batch_size=BUILD_BATCH_SIZE):
+        """Ler todos os usuários em lotes e trocar o índice de uma vez"""
+        rows = []
+        last_id = 0
+        while True:
+            batch = db.session.query(User.id, User.username, User.display_name, User.avatar_url) \
+                .filter(User.id > last_id).order_by(User.id).limit(batch_size).all()
+            if not batch:
+                break
+            rows.extend(tuple(row) for row in batch)
+            last_id = batch[-1][0]
+        db.session.commit()
+
+        snapshot = _Snapshot.bulk(rows)
+        with self._lock:
+            self._snapshot = snapshot
+        return len(rows)
+
+    def add(self, user):
+        """Inserir ou atualizar um usuário (chamar depois do commit)"""
+        with self._lock:
+            self._snapshot.remove(user.id)
+            self._snapshot.add(user.id, user.username, user.display_name, user.avatar_url)
+
+    def remove(self, user_id):
+        with self._lock:
+            self._snapshot.remove(user_id)
+
+    def _prefix_ids(self, snapshot, term, limit):
+        found = []
+        seen = set()
+        position = bisect_left(snapshot.keys, term)
+        end = min(len(snapshot.keys), position + MAX_SCAN)
+        while position < end and len(found) < limit:
+            if not snapshot.keys[position].startswith(term):
+                break
+            user_id = snapshot.ids[position]
+            if user_id not in seen:
+                seen.add(user_id)
+                found.append(user_id)
+            position += 1
+        return found
+
+    def _infix_ids(self, snapshot, term, limit, exclude):
+        postings = [snapshot.trigrams.get(trigram) for trigram in _trigrams(term)]
+        if not postings or any(ids is None for ids in postings):
+            return []
+        postings.sort(key=len)
+
+        found = []
+        for user_id in postings[0]:
+            if user_id in exclude:
+                continue
+            if all(_contains(ids, user_id) for ids in postings[1:]) and term in snapshot.users[user_id][4]:
+                found.append(user_id)
+                if len(found) >= limit:
+                    break
+        return found
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Top-k usuários: primeiro por prefixo, depois por trecho do nome"""
+        term = normalize(query)
+        if not term:
+            return []
+        self._ensure_built()
+
+        with self._lock:
+            snapshot = self._snapshot
+            ids = self._prefix_ids(snapshot, term, limit)
+            if len(ids) < limit and len(term) >= 3:
+                ids += self._infix_ids(snapshot, term, limit - len(ids), set(ids))
+
+            return [{
+                'id': user_id,
+                'username': snapshot.users[user_id][0],
+                'display_name': snapshot.users[user_id][1],
+                'avatar_url': snapshot.users[user_id][2]
+            } for user_id in ids]
+
+    def __len__(self):
+        return len(self._snapshot.users)
+
+def _contains(sorted_ids, user_id):
+    position = bisect_left(sorted_ids, user_id)
+    return position < len(sorted_ids) and sorted_ids[position] == user_id
+
+autocomplete = AutocompleteIndex()
@@ -0,0 +1,251 @@
+from sqlalchemy import bindparam, case, func, select, union_all, update
+from src.models.user import db, Conversation, Message, User
+
+# Resumo das conversas diretas mantido incrementalmente. Cada conversa tem uma
+# linha por participante (user_id, partner_id) com a última mensagem, as não
+# lidas daquele lado e o nome/avatar do parceiro. O envio e a leitura de
+# mensagens atualizam as linhas na mesma transação, então a lista de conversas
+# é uma única consulta pelo índice (user_id, last_message_id), paginada por
+# cursor, sem varrer o histórico nem carregar os parceiros.
+#
+# Como os IDs das mensagens crescem com o tempo, last_message_id também ordena
+# as conversas pela mais recente.
+#
+# last_read_id guarda até onde o usuário leu (mark_read). Com a gravação
+# write-behind, uma mensagem pode ser lida pelo emit antes de chegar ao banco;
+# ao ser gravada com ID até essa marca, ela já entra como lida e não conta como
+# não lida.
+
+REBUILD_BATCH_SIZE = 1000
+
+def _partner_name(user):
+    return user.display_name or user.username
+
+def _existing(keys):
+    """Quais pares (user_id, partner_id) já têm linha no resumo"""
+    users = {user_id for user_id, _ in keys}
+    partners = {partner_id for _, partner_id in keys}
+    rows = db.session.query(Conversation.user_id, Conversation.partner_id).filter(
+        Conversation.user_id.in_(users), Conversation.partner_id.in_(partners)
+    ).all()
+    return {tuple(row) for row in rows} & set(keys)
+
+def _summary_update(incoming):
+    """UPDATE de uma conversa com a última mensagem e `incoming` IDs recebidos (executemany)"""
+    table = Conversation.__table__
+    # Mensagens de outro worker podem chegar fora de ordem: só avançar
+    newer = table.c.last_message_id < bindparam('mid')
+    # Só contam como não lidas as que passam da marca de leitura
+    unread = sum((case((table.c.last_read_id < bindparam(f'in{i}'), 1), else_=0) for i in range(incoming)),
+                 table.c.unread_count)
+    return (
+        update(table)
+        .where(table.c.user_id == bindparam('uid'), table.c.partner_id == bindparam('pid'))
+        .values(
+            last_message_id=case((newer, bindparam('mid')), else_=table.c.last_message_id),
+            last_message_at=case((newer, bindparam('sent_at')), else_=table.c.last_message_at),
+            unread_count=unread
+        )
+    )
+
+def record_messages(messages):
+    """Atualizar os resumos com mensagens diretas da transação atual (sem commit)"""
+    latest = {}  # (user_id, partner_id) -> [mensagem mais recente, IDs recebidos]
+    received = []
+    for message in messages:
+        if message.message_type != 'direct' or not message.receiver_id:
+            continue
+        received.append(message.id)
+        sides = ((message.sender_id, message.receiver_id, False), (message.receiver_id, message.sender_id, True))
+        for user_id, partner_id, incoming in sides:
+            entry = latest.setdefault((user_id, partner_id), [message, []])
+            if message.id > entry[0].id:
+                entry[0] = message
+            if incoming:
+                entry[1].append(message.id)
+    if not latest:
+        return
+
+    # Um UPDATE executemany por número de mensagens recebidas no lote, em vez
+    # de um comando diferente (e compilado de novo) por conversa
+    existing = _existing(latest)
+    by_size = {}
+    missing = []
+    for (user_id, partner_id), (message, incoming) in latest.items():
+        if (user_id, partner_id) not in existing:
+            missing.append((user_id, partner_id, message, len(incoming)))
+            continue
+        params = {'uid': user_id, 'pid': partner_id, 'mid': message.id, 'sent_at': message.created_at}
+        params.update((f'in{i}', message_id) for i, message_id in enumerate(incoming))
+        by_size.setdefault(len(incoming), []).append(params)
+    for size, rows in by_size.items():
+        db.session.execute(_summary_update(size), rows)
+
+    if missing:
+        partners = {u.id: u for u in User.query.filter(User.id.in_({m[1] for m in missing})).all()}
+        db.session.execute(Conversation.__table__.insert(), [{
+            'user_id': user_id,
+            'partner_id': partner_id,
+            'last_message_id': message.id,
+            'last_message_at': message.created_at,
+            'unread_count': unread,
+            'partner_name': _partner_name(partners[partner_id]) if partner_id in partners else None,
+            'partner_avatar': partners[partner_id].avatar_url if partner_id in partners else None
+        } for user_id, partner_id, message, unread in missing])
+
+    if received:
+        # Lidas antes de serem gravadas: marcar pela conversa do destinatário
+        read_up_to = select(Conversation.last_read_id).where(
+            Conversation.user_id == Message.receiver_id,
+            Conversation.partner_id == Message.sender_id
+        ).scalar_subquery()
+        db.session.execute(
+            update(Message)
+            .where(Message.id.in_(received), Message.is_read == False, Message.id <= read_up_to)
+            .values(is_read=True)
+            .execution_options(synchronize_session=False)
+        )
+
+def mark_read(user_id, partner_id, up_to_id, accepted_id=0):
+    """Marcar as mensagens do parceiro até up_to_id como lidas (sem commit)
+
+    Um UPDATE pelo índice (sender_id, receiver_id, id) em vez de uma
+    requisição por mensagem. up_to_id é limitado à última mensagem da
+    conversa ou a accepted_id (a mais nova aceita por este worker e ainda na
+    fila de gravação): um ID no futuro levaria a marca de leitura além de
+    mensagens que ainda nem existem. Retorna (mensagens marcadas, se a marca
+    de leitura avançou, up_to_id aplicado); com os dois primeiros zerados não
+    há nada a avisar.
+    """
+    newest = db.session.query(Conversation.last_message_id).filter(
+        Conversation.user_id == user_id, Conversation.partner_id == partner_id
+    ).scalar() or 0
+    up_to_id = min(up_to_id, max(newest, accepted_id))
+    if up_to_id <= 0:
+        return 0, False, 0
+    
+    marked = db.session.execute(
+        update(Message)
+        .where(
+            Message.sender_id == partner_id,
+            Message.receiver_id == user_id,
+            Message.id <= up_to_id,
+            Message.message_type == 'direct',
+            Message.is_read == False
+        )
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    advanced = db.session.execute(
+        update(Conversation)
+        .where(
+            Conversation.user_id == user_id,
+            Conversation.partner_id == partner_id,
+            Conversation.last_read_id < up_to_id
+        )
+        .values(last_read_id=up_to_id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    messages_read(user_id, partner_id, marked)
+    return marked, bool(advanced), up_to_id
+
+def messages_read(user_id, partner_id, count=1):
+    """Descontar mensagens lidas do parceiro (sem commit)"""
+    if count <= 0:
+        return
+    db.session.execute(
+        update(Conversation)
+        .where(Conversation.user_id == user_id, Conversation.partner_id == partner_id)
+        .values(unread_count=case(
+            (Conversation.unread_count > count, Conversation.unread_count - count), else_=0
+        ))
+        .execution_options(synchronize_session=False)
+    )
+
+def partner_changed(user):
+    """Propagar nome/avatar do usuário para as conversas dos parceiros (sem commit)"""
+    db.session.execute(
+        update(Conversation)
+        .where(Conversation.partner_id == user.id)
+        .values(partner_name=_partner_name(user), partner_avatar=user.avatar_url)
+        .execution_options(synchronize_session=False)
+    )
+
+def inbox_query(user_id):
+    """Consulta das conversas do usuário com a última mensagem (para keyset_paginate)"""
+    return db.session.query(Conversation, Message).outerjoin(
+        Message, Message.id == Conversation.last_message_id
+    ).filter(Conversation.user_id == user_id)
+
+def _unread_actual():
+    return select(func.count(Message.id)).where(
+        Message.receiver_id == Conversation.user_id,
+        Message.sender_id == Conversation.partner_id,
+        Message.message_type == 'direct',
+        Message.is_read == False
+    ).scalar_subquery()
+
+def reconcile(batch_size=REBUILD_BATCH_SIZE):
+    """Recontar as não lidas de cada conversa em faixas de usuários; retorna as corrigidas"""
+    actual = _unread_actual()
+    max_id = db.session.query(func.max(Conversation.user_id)).scalar() or 0
+    fixed = 0
+    for start in range(0, max_id + 1, batch_size):
+        result = db.session.execute(
+            update(Conversation)
+            .where(
+                Conversation.user_id >= start,
+                Conversation.user_id < start + batch_size,
+                Conversation.unread_count != actual
+            )
+            .values(unread_count=actual)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        fixed += result.rowcount
+    return fixed
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE):
+    """Recriar os resumos a partir das mensagens, em faixas de usuários"""
+    table = Conversation.__table__
+    direct = (Message.message_type == 'direct', Message.receiver_id.isnot(None))
+    max_id = db.session.query(func.max(User.id)).scalar() or 0
+    total = 0
+
+    for start in range(0, max_id + 1, batch_size):
+        end = start + batch_size
+        sides = union_all(
+            select(Message.sender_id.label('user_id'), Message.receiver_id.label('partner_id'), Message.id)
+            .where(*direct, Message.sender_id >= start, Message.sender_id < end),
+            select(Message.receiver_id.label('user_id'), Message.sender_id.label('partner_id'), Message.id)
+            .where(*direct, Message.receiver_id >= start, Message.receiver_id < end)
+        ).subquery()
+        latest = db.session.execute(
+            select(sides.c.user_id, sides.c.partner_id, func.max(sides.c.id))
+            .group_by(sides.c.user_id, sides.c.partner_id)
+        ).all()
+
+        db.session.execute(table.delete().where(table.c.user_id >= start, table.c.user_id < end))
+        if latest:
+            sent_at = dict(db.session.query(Message.id, Message.created_at).filter(
+                Message.id.in_([row[2] for row in latest])
+            ).all())
+            unread = {(receiver_id, sender_id): count for receiver_id, sender_id, count in db.session.query(
+                Message.receiver_id, Message.sender_id, func.count(Message.id)
+            ).filter(
+                *direct, Message.is_read == False, Message.receiver_id >= start, Message.receiver_id < end
+            ).group_by(Message.receiver_id, Message.sender_id).all()}
+            partners = {u.id: u for u in User.query.filter(User.id.in_({row[1] for row in latest})).all()}
+
+            db.session.execute(table.insert(), [{
+                'user_id': user_id,
+                'partner_id': partner_id,
+                'last_message_id': message_id,
+                'last_message_at': sent_at[message_id],
+                'unread_count': unread.get((user_id, partner_id), 0),
+                'partner_name': _partner_name(partners[partner_id]) if partner_id in partners else None,
+                'partner_avatar': partners[partner_id].avatar_url if partner_id in partners else None
+            } for user_id, partner_id, message_id in latest])
+        db.session.commit()
+        total += len(latest)
+    return total
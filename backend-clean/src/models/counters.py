@@ -0,0 +1,57 @@
+from sqlalchemy import func, select, update
+from src.models.user import (
+    db, User, Community, Event, Post, Comment, Like,
+    community_members, event_participants, user_follows
+)
+
+# Contadores denormalizados: (coluna do contador, coluna de FK que é contada)
+COUNTERS = [
+    (User.followers_count, user_follows.c.followed_id),
+    (User.following_count, user_follows.c.follower_id),
+    (Post.likes_count, Like.__table__.c.post_id),
+    (Post.comments_count, Comment.__table__.c.post_id),
+    (Community.members_count, community_members.c.community_id),
+    (Event.participants_count, event_participants.c.event_id),
+]
+
+def increment(counter, row_id, delta=1):
+    """Atualizar um contador atomicamente (SET n = n + delta) na transação atual"""
+    model = counter.class_
+    db.session.execute(
+        update(model).where(model.id == row_id).values({counter: counter + delta})
+    )
+
+def decrement(counter, row_id):
+    """Decrementar um contador atomicamente na transação atual"""
+    increment(counter, row_id, -1)
+
+def reconcile_counters(batch_size=1000):
+    """Recalcular todos os contadores em lote e corrigir divergências
+
+    Processa cada tabela em faixas de IDs para não segurar locks longos.
+    Retorna o número de linhas corrigidas por contador. Pode rodar com a web no
+    ar: post.likes_count é regravado pelo flush do like_buffer a partir da
+    contagem, não somando deltas, então não há delta pendente a contar em dobro.
+    """
+    fixed = {}
+    for counter, fk_column in COUNTERS:
+        model = counter.class_
+        actual = select(func.count()).select_from(fk_column.table).where(
+            fk_column == model.id
+        ).scalar_subquery()
+
+        max_id = db.session.query(func.max(model.id)).scalar() or 0
+        total = 0
+        for start in range(0, max_id + 1, batch_size):
+            result = db.session.execute(
+                update(model)
+                .where(model.id >= start, model.id < start + batch_size, counter != actual)
+                .values({counter: actual})
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            total += result.rowcount
+
+        fixed[f'{model.__tablename__}.{counter.key}'] = total
+
+    return fixed
@@ -0,0 +1,108 @@
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from src.models.user import db, user_follows
+from src import cache
+
+# Grafo de follows em memória: para cada usuário, um array ordenado com os IDs
+# de quem ele segue, carregado sob demanda (uma consulta pela chave primária
+# de user_follows) e atualizado no lugar a cada follow/unfollow. Verificar se
+# A segue B é uma bisseção, O(log n), sem carregar objetos User.
+#
+# Cada lista tem uma versão no backend de cache ('following:{id}'); um follow
+# feito em outro worker incrementa a versão e a lista local é relida no próximo
+# acesso. Isso só vale com o backend compartilhado (CACHE_REDIS_URL): com o
+# LocalCache padrão as versões são do próprio processo, então mais de um worker
+# exige Redis (src/main.py recusa subir com a fila do Socket.IO e cache local).
+# As rotas de follow ainda tratam a violação da chave primária como "já segue",
+# já que a lista pode estar desatualizada.
+
+MAX_USERS = 10000  # listas mantidas em memória (LRU)
+
+def _namespace(user_id):
+    return f'following:{user_id}'
+
+def _contains(sorted_ids, user_id):
+    position = bisect_left(sorted_ids, user_id)
+    return position < len(sorted_ids) and sorted_ids[position] == user_id
+
+class FollowGraph:
+
+    def __init__(self, max_users=MAX_USERS):
+        self.max_users = max_users
+        self._following = OrderedDict()  # user_id -> (versão, array ordenado de IDs)
+        self._lock = threading.Lock()
+
+    def _load(self, user_id):
+        rows = db.session.query(user_follows.c.followed_id).filter(
+            user_follows.c.follower_id == user_id
+        ).order_by(user_follows.c.followed_id).all()
+        return array('q', (row[0] for row in rows))
+
+    def following(self, user_id):
+        """Array ordenado com os IDs que o usuário segue"""
+        current = cache.version(_namespace(user_id))
+        with self._lock:
+            entry = self._following.get(user_id)
+            if entry is not None and entry[0] == current:
+                self._following.move_to_end(user_id)
+                return entry[1]
+
+        ids = self._load(user_id)
+        with self._lock:
+            self._following[user_id] = (current, ids)
+            self._following.move_to_end(user_id)
+            while len(self._following) > self.max_users:
+                self._following.popitem(last=False)
+        return ids
+
+    def is_following(self, follower_id, followed_id):
+        if not follower_id or not followed_id:
+            return False
+        return _contains(self.following(follower_id), followed_id)
+
+    def following_among(self, follower_id, user_ids):
+        """Subconjunto de `user_ids` que o usuário segue"""
+        if not follower_id:
+            return set()
+        ids = self.following(follower_id)
+        return {user_id for user_id in user_ids if user_id is not None and _contains(ids, user_id)}
+
+    def _changed(self, follower_id, update):
+        """Aplicar uma mudança local e publicar a nova versão (chamar depois do commit)"""
+        namespace = _namespace(follower_id)
+        before = cache.version(namespace)
+        cache.bump(namespace)
+        after = cache.version(namespace)
+
+        with self._lock:
+            entry = self._following.get(follower_id)
+            if entry is None:
+                return
+            if entry[0] != before or after != before + 1:
+                # A lista local já estava desatualizada ou outro worker mudou no meio
+                del self._following[follower_id]
+                return
+            update(entry[1])
+            self._following[follower_id] = (after, entry[1])
+
+    def add(self, follower_id, followed_id):
+        def insert(ids):
+            position = bisect_left(ids, followed_id)
+            if position == len(ids) or ids[position] != followed_id:
+                ids.insert(position, followed_id)
+        self._changed(follower_id, insert)
+
+    def remove(self, follower_id, followed_id):
+        def delete(ids):
+            position = bisect_left(ids, followed_id)
+            if position < len(ids) and ids[position] == followed_id:
+                del ids[position]
+        self._changed(follower_id, delete)
+
+    def forget(self, user_id):
+        with self._lock:
+            self._following.pop(user_id, None)
+
+follow_graph = FollowGraph()
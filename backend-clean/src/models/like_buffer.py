@@ -0,0 +1,178 @@
+import atexit
+import threading
+import time
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db, Post, Like
+from src.models.ranking import refresh_scores
+from src import cache
+
+# Agregação write-behind dos likes: a linha de Like é gravada na hora (durável),
+# mas a atualização de post.likes_count fica num buffer em memória e é feita em
+# lote (um UPDATE executemany por flush). Assim um post viral não serializa
+# todos os escritores na mesma linha de post.
+#
+# O flush regrava likes_count a partir da contagem das linhas de Like (pelo
+# índice ix_like_post) em vez de somar o delta: o delta só marca o post como
+# sujo e serve à contagem otimista entre flushes. Assim o flush é idempotente,
+# deltas perdidos numa queda se corrigem no próximo like do post e o
+# reconcile_counters pode rodar com a web no ar sem contar nada em dobro.
+#
+# A contagem base de cada post fica em memória por até KNOWN_TTL segundos:
+# likes gravados por outros workers só aparecem no count() deste depois de
+# relida do banco.
+
+FLUSH_INTERVAL = 1.0  # segundos entre flushes
+MAX_PENDING = 500  # posts com delta pendente que disparam um flush imediato
+MAX_KNOWN = 10000  # contagens lidas do banco mantidas em memória
+KNOWN_TTL = 5.0  # segundos até reler do banco uma contagem (flushes de outros workers)
+
+class LikeBuffer:
+
+    def __init__(self):
+        self.app = None
+        self._pending = {}  # post_id -> delta ainda não gravado
+        self._flushing = {}  # post_id -> delta sendo gravado pelo flush em curso
+        self._known = {}  # post_id -> (likes_count lido do banco, time.time() da leitura)
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def init_app(self, app):
+        self.app = app
+        atexit.register(self._flush_on_exit)
+
+    def _ensure_flusher(self):
+        if self._flusher is None and self.app is not None:
+            self._flusher = threading.Thread(target=self._run, daemon=True)
+            self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception:
+                self.app.logger.exception('Erro ao gravar contadores de likes')
+
+    def _flush_on_exit(self):
+        with self.app.app_context():
+            self.flush()
+
+    def _base_count(self, post_id):
+        """Contagem gravada no banco; None se o post não existir"""
+        known = self._known.get(post_id)
+        now = time.time()
+        if known is None or now - known[1] >= KNOWN_TTL:
+            count = db.session.query(Post.likes_count).filter(Post.id == post_id).scalar()
+            if count is None:
+                self._known.pop(post_id, None)
+                return None
+            if len(self._known) >= MAX_KNOWN:
+                self._known.clear()
+            known = self._known[post_id] = (count, now)
+        return known[0]
+
+    def count(self, post_id):
+        """Contagem atual: valor do banco + delta pendente
+
+        Otimista: um like gravado durante um flush entra na recontagem e também
+        no delta pendente, então a contagem pode passar um pouco do real até o
+        flush seguinte (FLUSH_INTERVAL) regravá-la.
+        """
+        base = self._base_count(post_id)
+        if base is None:
+            return None
+        return base + self._flushing.get(post_id, 0) + self._pending.get(post_id, 0)
+
+    def _add(self, post_id, delta):
+        with self._lock:
+            self._pending[post_id] = self._pending.get(post_id, 0) + delta
+            should_flush = len(self._pending) >= MAX_PENDING
+        if should_flush:
+            self.flush()
+        else:
+            self._ensure_flusher()
+
+    def like(self, user_id, post_id):
+        """Curtir (idempotente). Retorna (likes_count, criado) ou None se o post não existir"""
+        if self._base_count(post_id) is None:
+            return None
+
+        try:
+            db.session.add(Like(user_id=user_id, post_id=post_id))
+            db.session.commit()
+            created = True
+        except IntegrityError:
+            db.session.rollback()
+            created = False
+
+        if created:
+            self._add(post_id, 1)
+        return self.count(post_id), created
+
+    def unlike(self, user_id, post_id):
+        """Descurtir (idempotente). Retorna (likes_count, removido) ou None se o post não existir"""
+        if self._base_count(post_id) is None:
+            return None
+
+        result = db.session.execute(
+            Like.__table__.delete().where(Like.user_id == user_id, Like.post_id == post_id)
+        )
+        db.session.commit()
+        removed = result.rowcount > 0
+
+        if removed:
+            self._add(post_id, -1)
+        return self.count(post_id), removed
+
+    def forget(self, post_id):
+        """Descartar o estado de um post removido"""
+        with self._lock:
+            self._pending.pop(post_id, None)
+            self._known.pop(post_id, None)
+
+    def flush(self):
+        """Recontar os posts com delta pendente em uma única transação"""
+        with self._lock:
+            if self._flushing:
+                return 0  # Outro flush em andamento
+            pending = {post_id: delta for post_id, delta in self._pending.items() if delta}
+            self._pending = {}
+            self._flushing = pending
+        if not pending:
+            return 0
+
+        try:
+            posts, likes = Post.__table__, Like.__table__
+            db.session.execute(
+                update(posts)
+                .where(posts.c.id == bindparam('post_id'))
+                .values(likes_count=select(func.count()).select_from(likes)
+                        .where(likes.c.post_id == posts.c.id).scalar_subquery()),
+                [{'post_id': post_id} for post_id in pending]
+            )
+            refresh_scores(pending)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Devolver os deltas ao buffer para a próxima tentativa
+            with self._lock:
+                for post_id, delta in pending.items():
+                    self._pending[post_id] = self._pending.get(post_id, 0) + delta
+                self._flushing = {}
+            raise
+
+        # Reler os valores gravados (outros workers também gravam deltas)
+        rows = db.session.query(Post.id, Post.likes_count).filter(Post.id.in_(pending)).all()
+        with self._lock:
+            now = time.time()
+            self._known.update({post_id: (count, now) for post_id, count in rows})
+            self._flushing = {}
+
+        # Só as entradas dos posts: as páginas de listas expiram pelo TTL, em vez
+        # de invalidar todos os feeds em cache a cada flush
+        cache.bump(*[f'post:{post_id}' for post_id in pending])
+        return len(pending)
+
+like_buffer = LikeBuffer()
@@ -0,0 +1,264 @@
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db, Message
+from src.models import conversations
+
+# Envio de mensagens do chat em tempo real com gravação write-behind.
+#
+# O ID da mensagem é gerado no próprio processo (estilo snowflake: milissegundos
+# desde MESSAGE_EPOCH, ID do worker e sequência), então o remetente recebe o
+# ack com o ID definitivo e a mensagem vai para a sala antes de tocar o banco.
+# A gravação fica numa fila FIFO que uma thread esvazia em lotes: um INSERT em
+# lote (executemany), o resumo das conversas e um commit por lote. Os IDs são crescentes no tempo, o que dá
+# a ordem de cada conversa (clientes ordenam e sincronizam por ID), e cabem em
+# 53 bits para não perder precisão em JavaScript. Cada processo precisa de um
+# WORKER_ID próprio de 0 a 31 (variável de ambiente, obrigatória): init_app
+# falha sem ele, já que dois processos com o mesmo ID gerariam chaves iguais.
+# Ao subir, o gerador continua depois do maior ID gravado (resume_after), então
+# um reinício no mesmo milissegundo ou um relógio atrasado não repetem IDs.
+#
+# Entrega pelo menos uma vez: o cliente pode reenviar com o mesmo client_id
+# (ex.: não recebeu o ack antes de reconectar) e recebe o mesmo ID de volta, sem
+# duplicar a mensagem; quem perdeu o emit busca a diferença pelo ID. Uma
+# mensagem já aceita nunca é descartada em silêncio: se não puder ser gravada
+# (ex.: destinatário removido, ou um ID repetido por WORKER_ID duplicado) o
+# remetente recebe message_failed. Ela não é regravada com outro ID, já que o
+# ack e o emit já levaram o ID original aos clientes.
+
+MESSAGE_EPOCH = datetime(2025, 1, 1)
+WORKER_BITS = 5
+SEQUENCE_BITS = 7
+FLUSH_INTERVAL = 0.05  # segundos entre gravações
+MAX_BATCH = 500  # mensagens por INSERT
+MAX_CLIENT_IDS = 10000  # client_ids lembrados para deduplicar reenvios
+
+def _epoch_ms(moment):
+    return int((moment - MESSAGE_EPOCH).total_seconds() * 1000)
+
+def worker_id_from_env():
+    """WORKER_ID deste processo; falha se ausente ou fora de 0 a 31"""
+    value = os.environ.get('WORKER_ID')
+    try:
+        worker_id = int(value)
+    except (TypeError, ValueError):
+        worker_id = -1
+    if not 0 <= worker_id < 1 << WORKER_BITS:
+        raise RuntimeError(f'WORKER_ID deve ser um inteiro de 0 a {(1 << WORKER_BITS) - 1}, '
+                           f'diferente em cada processo (recebido: {value!r})')
+    return worker_id
+
+class MessageIdGenerator:
+    """IDs únicos entre workers e crescentes no tempo"""
+
+    def __init__(self, worker_id=None):
+        self.worker_id = None
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+        if worker_id is not None:
+            self.configure(worker_id)
+
+    def configure(self, worker_id):
+        if not 0 <= worker_id < 1 << WORKER_BITS:
+            raise ValueError(f'worker_id fora de 0 a {(1 << WORKER_BITS) - 1}: {worker_id}')
+        self.worker_id = worker_id
+
+    def next_id(self):
+        if self.worker_id is None:
+            raise RuntimeError('Gerador de IDs sem WORKER_ID (ver message_writer.init_app)')
+        with self._lock:
+            now_ms = max(_epoch_ms(datetime.utcnow()), self._last_ms)  # Nunca voltar no tempo
+            if now_ms == self._last_ms:
+                self._sequence = (self._sequence + 1) % (1 << SEQUENCE_BITS)
+                if self._sequence == 0:
+                    # Sequência esgotada neste milissegundo: avançar para o próximo
+                    now_ms += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now_ms
+            return (now_ms << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+    def resume_after(self, message_id):
+        """Gerar só IDs maiores que message_id (o maior já gravado)"""
+        if not message_id:
+            return
+        with self._lock:
+            last_ms = (message_id >> (WORKER_BITS + SEQUENCE_BITS)) + 1
+            if last_ms > self._last_ms:
+                # A próxima chamada no mesmo milissegundo começa da sequência 0
+                self._last_ms, self._sequence = last_ms, -1
+
+def rewind(message_id, seconds):
+    """Menor ID que pode ter sido gerado até `seconds` antes de message_id"""
+    return max(message_id - (int(seconds * 1000) << (WORKER_BITS + SEQUENCE_BITS)), 0)
+
+def first_id_at(moment):
+    """Menor ID possível gerado a partir de um instante (para filtros por tempo)"""
+    return _epoch_ms(moment) << (WORKER_BITS + SEQUENCE_BITS)
+
+id_generator = MessageIdGenerator()  # Configurado em MessageWriter.init_app
+
+def _same_message(stored, message):
+    """Se a linha gravada com o ID é esta mensagem (e não outra com o mesmo ID)"""
+    return all(getattr(stored, field) == getattr(message, field) for field in (
+        'sender_id', 'receiver_id', 'community_id', 'event_id', 'message_type', 'content'
+    ))
+
+def new_message(sender_id, data):
+    """Criar (sem gravar) uma mensagem com ID já definido"""
+    return Message(
+        id=id_generator.next_id(),
+        content=data['content'],
+        sender_id=sender_id,
+        receiver_id=data.get('receiver_id'),
+        community_id=data.get('community_id'),
+        event_id=data.get('event_id'),
+        message_type=data.get('message_type', 'direct'),
+        is_read=False,
+        created_at=datetime.utcnow()
+    )
+
+class MessageWriter:
+
+    def __init__(self):
+        self.app = None
+        self.socketio = None
+        self._queue = deque()
+        self._client_ids = OrderedDict()  # (sender_id, client_id) -> mensagem
+        self._in_flight = []  # Lote sendo gravado agora
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._writer = None
+
+    def init_app(self, app, socketio=None):
+        id_generator.configure(worker_id_from_env())
+        self.app = app
+        self.socketio = socketio
+        atexit.register(self._flush_on_exit)
+
+    def resume_ids(self):
+        """Continuar a geração de IDs depois do maior ID gravado (chamar depois das migrações)"""
+        id_generator.resume_after(db.session.query(func.max(Message.id)).scalar())
+
+    def _ensure_writer(self):
+        if self._writer is None and self.app is not None:
+            self._writer = threading.Thread(target=self._run, daemon=True)
+            self._writer.start()
+
+    def _run(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                with self.app.app_context():
+                    while self.flush():
+                        pass
+            except Exception:
+                self.app.logger.exception('Erro ao gravar mensagens')
+
+    def _flush_on_exit(self):
+        with self.app.app_context():
+            while self.flush():
+                pass
+
+    def submit(self, sender_id, data):
+        """Aceitar uma mensagem para gravação; retorna (mensagem, nova)
+
+        Um reenvio com o mesmo client_id devolve o ID já atribuído e nova=False.
+        """
+        client_id = data.get('client_id')
+        with self._lock:
+            if client_id is not None and (sender_id, client_id) in self._client_ids:
+                return self._client_ids[(sender_id, client_id)], False
+
+            message = new_message(sender_id, data)
+            message.client_id = client_id  # Só em memória, para avisar o remetente
+            self._queue.append(message)
+            if client_id is not None:
+                self._client_ids[(sender_id, client_id)] = message
+                while len(self._client_ids) > MAX_CLIENT_IDS:
+                    self._client_ids.popitem(last=False)
+        self._ensure_writer()
+        return message, True
+
+    def pending(self):
+        return len(self._queue)
+
+    def pending_messages(self):
+        """Mensagens aceitas por este processo que ainda podem não estar no banco"""
+        with self._lock:
+            return self._in_flight + list(self._queue)
+
+    def _insert(self, batch):
+        db.session.execute(Message.__table__.insert(), [{
+            'id': m.id,
+            'content': m.content,
+            'sender_id': m.sender_id,
+            'receiver_id': m.receiver_id,
+            'community_id': m.community_id,
+            'event_id': m.event_id,
+            'message_type': m.message_type,
+            'is_read': False,
+            'created_at': m.created_at
+        } for m in batch])
+        conversations.record_messages(batch)
+        db.session.commit()
+
+    def _insert_one(self, message):
+        """Gravar sozinha uma mensagem de um lote que falhou; retorna True se ela está no banco"""
+        try:
+            self._insert([message])
+            return True
+        except IntegrityError as e:
+            db.session.rollback()
+            error = e
+
+        stored = db.session.get(Message, message.id)
+        if stored is not None and _same_message(stored, message):
+            return True  # Já gravada (ex.: lote repetido depois de um commit)
+        if stored is not None:
+            self.app.logger.error('Mensagem %s não gravada: ID já usado por outra mensagem '
+                                  '(WORKER_ID repetido entre processos?)', message.id)
+        else:
+            self.app.logger.error('Mensagem %s não gravada: %s', message.id, error.orig)
+        if self.socketio is not None:
+            self.socketio.emit('message_failed', {
+                'id': message.id,
+                'client_id': getattr(message, 'client_id', None),
+                'error': 'Não foi possível entregar a mensagem'
+            }, room=f'user_{message.sender_id}')
+        return False
+
+    def flush(self, max_batch=MAX_BATCH):
+        """Gravar o próximo lote da fila em um commit; retorna quantas foram gravadas"""
+        with self._flush_lock:  # Um lote por vez mantém a ordem da fila
+            with self._lock:
+                batch = [self._queue.popleft() for _ in range(min(max_batch, len(self._queue)))]
+                self._in_flight = batch
+            if not batch:
+                return 0
+
+            try:
+                self._insert(batch)
+            except IntegrityError:
+                # Uma linha inválida (ex.: destinatário removido) não pode travar
+                # a fila: gravar uma a uma (ver _insert_one)
+                db.session.rollback()
+                batch = [message for message in batch if self._insert_one(message)]
+            except Exception:
+                db.session.rollback()
+                # Devolver o lote ao início da fila, na mesma ordem
+                with self._lock:
+                    self._queue.extendleft(reversed(batch))
+                    self._in_flight = []
+                raise
+            with self._lock:
+                self._in_flight = []
+        return len(batch)
+
+message_writer = MessageWriter()
@@ -0,0 +1,159 @@
+import json
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, select, text
+from src.models.user import db, Conversation, Notification, notification_actors
+from src.models.counters import COUNTERS, reconcile_counters
+from src.models.ranking import redecay
+from src.models import search, conversations
+
+# Migrações versionadas de esquema. db.create_all() só cria tabelas novas e
+# nunca altera as existentes; cada migração aqui deve ser idempotente para
+# funcionar tanto em bancos novos (já criados com o esquema atual) quanto em
+# bancos antigos, em SQLite e Postgres.
+
+_metadata = MetaData()
+schema_version = Table('schema_version', _metadata, Column('version', Integer, nullable=False))
+
+def _columns(table_name):
+    return {column['name'] for column in inspect(db.engine).get_columns(table_name)}
+
+def _add_column(table_name, column_name, ddl):
+    """Adicionar uma coluna se ainda não existir; retorna True se adicionou"""
+    if column_name in _columns(table_name):
+        return False
+    with db.engine.begin() as conn:
+        conn.execute(text(f'ALTER TABLE "{table_name}" ADD COLUMN {column_name} {ddl}'))
+    return True
+
+def add_counter_columns():
+    """Adicionar as colunas de contadores denormalizados e preenchê-las"""
+    added = False
+    for counter, _ in COUNTERS:
+        if _add_column(counter.class_.__tablename__, counter.key, 'INTEGER NOT NULL DEFAULT 0'):
+            added = True
+
+    if added:
+        reconcile_counters()
+
+def create_indexes():
+    """Criar os índices das consultas quentes em tabelas existentes
+
+    Índices sobre colunas que uma migração posterior ainda vai adicionar são
+    pulados; essa migração os cria depois.
+    """
+    for table in db.metadata.sorted_tables:
+        columns = _columns(table.name)
+        for index in table.indexes:
+            if all(column.name in columns for column in index.columns):
+                index.create(db.engine, checkfirst=True)
+
+def add_hot_score():
+    """Adicionar post.hot_score, calcular para todos os posts e indexar"""
+    if _add_column('post', 'hot_score', 'FLOAT NOT NULL DEFAULT 0'):
+        redecay(window=None)
+    create_indexes()
+
+def create_search_index():
+    """Criar o índice de busca textual e indexar o conteúdo existente"""
+    search.create_index()
+    search.rebuild()
+
+def add_notification_groups():
+    """Adicionar as colunas de agregação de notificações e o índice do grupo"""
+    _add_column('notification', 'actor_count', 'INTEGER NOT NULL DEFAULT 1')
+    _add_column('notification', 'actor_ids', 'TEXT')
+    _add_column('notification', 'bucket', 'INTEGER')
+    create_indexes()
+
+def add_notification_outbox():
+    """Trocar os índices de membros/participantes pelos compostos usados no fan-out"""
+    with db.engine.begin() as conn:
+        conn.execute(text('DROP INDEX IF EXISTS ix_community_members_community'))
+        conn.execute(text('DROP INDEX IF EXISTS ix_event_participants_event'))
+    create_indexes()
+
+def widen_message_id():
+    """Ampliar message.id para BIGINT (IDs gerados pela aplicação); no SQLite já é 64 bits"""
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.begin() as conn:
+            conn.execute(text('ALTER TABLE message ALTER COLUMN id TYPE BIGINT'))
+
+def add_conversations():
+    """Criar o resumo das conversas diretas e preenchê-lo a partir das mensagens"""
+    Conversation.__table__.create(db.engine, checkfirst=True)
+    conversations.rebuild()
+
+def index_messages_by_id():
+    """Trocar os índices de mensagens por created_at pelos equivalentes por ID"""
+    with db.engine.begin() as conn:
+        for name in ('ix_message_pair_created', 'ix_message_community_created', 'ix_message_event_created'):
+            conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+    create_indexes()
+
+def add_conversation_read_marker():
+    """Adicionar à conversa o ID até o qual o usuário já leu"""
+    _add_column('conversation', 'last_read_id', 'BIGINT NOT NULL DEFAULT 0')
+
+def add_notification_actors():
+    """Criar a tabela de atores distintos dos grupos e preenchê-la com os recentes de cada grupo
+
+    Grupos antigos só guardavam os IDs dos atores mais recentes; os demais
+    não podem ser recuperados, então actor_count deles fica como está.
+    """
+    notification_actors.create(db.engine, checkfirst=True)
+    last_id = 0
+    while True:
+        groups = db.session.query(Notification.id, Notification.actor_ids).filter(
+            Notification.id > last_id, Notification.bucket.isnot(None)
+        ).order_by(Notification.id).limit(1000).all()
+        if not groups:
+            break
+        rows = [{'notification_id': notification_id, 'actor_id': actor_id}
+                for notification_id, actor_ids in groups for actor_id in set(json.loads(actor_ids or '[]'))]
+        if rows:
+            db.session.execute(notification_actors.delete().where(
+                notification_actors.c.notification_id.in_([group[0] for group in groups])
+            ))
+            db.session.execute(notification_actors.insert(), rows)
+        db.session.commit()
+        last_id = groups[-1][0]
+
+# (versão, função) em ordem; nunca renumerar migrações já publicadas
+MIGRATIONS = [
+    (1, add_counter_columns),
+    (2, create_indexes),
+    (3, add_hot_score),
+    (4, create_search_index),
+    (5, create_indexes),
+    (6, add_notification_groups),
+    (7, add_notification_outbox),
+    (8, create_indexes),
+    (9, widen_message_id),
+    (10, add_conversations),
+    (11, index_messages_by_id),
+    (12, add_conversation_read_marker),
+    (13, add_notification_actors),
+]
+
+def current_version():
+    """Obter a versão de esquema aplicada ao banco"""
+    schema_version.create(db.engine, checkfirst=True)
+    with db.engine.connect() as conn:
+        return conn.execute(select(schema_version.c.version)).scalar() or 0
+
+def run_migrations():
+    """Aplicar as migrações pendentes em ordem"""
+    version = current_version()
+
+    for target, migration in MIGRATIONS:
+        if target <= version:
+            continue
+
+        migration()
+
+        with db.engine.begin() as conn:
+            conn.execute(schema_version.delete())
+            conn.execute(schema_version.insert().values(version=target))
+        version = target
+        print(f'Migração {target} aplicada: {migration.__name__}')
+
+    return version
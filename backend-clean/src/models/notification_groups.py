@@ -0,0 +1,69 @@
+import calendar
+import json
+from src.models.user import db, insert_ignore, Notification, notification_actors
+
+# Agregação de notificações: eventos do mesmo tipo sobre o mesmo objeto
+# (user_id, notification_type, related_id) dentro de uma janela de tempo viram
+# uma única linha, atualizada no lugar com a contagem de atores e os IDs dos
+# mais recentes. O texto "Fulano e outras N pessoas ..." é montado na
+# serialização.
+#
+# A contagem é de atores distintos: cada grupo registra seus atores em
+# notification_actors, e só um ator novo incrementa actor_count. created_at
+# fica com a criação do grupo; atualizar o grupo não o move na lista, que é
+# paginada por (created_at, id).
+
+AGGREGATION_WINDOW = 6 * 3600  # segundos por janela de agrupamento
+RECENT_ACTORS = 3  # IDs de atores guardados por grupo
+
+# Tipos agregáveis e o texto no plural de cada um
+AGGREGATED_TYPES = {
+    'follow': 'começaram a seguir você',
+    'like': 'curtiram seu post',
+    'comment': 'comentaram no seu post',
+}
+
+def bucket_for(moment):
+    """Janela de agrupamento de um instante (UTC)"""
+    return calendar.timegm(moment.utctimetuple()) // AGGREGATION_WINDOW
+
+def recent_actor_ids(notification):
+    return json.loads(notification.actor_ids or '[]')
+
+def add_to_group(user_id, notification_type, related_id, actor_id, now):
+    """Somar o ator ao grupo da janela atual
+
+    Retorna (grupo, reaberto), em que reaberto indica que o grupo estava lido
+    e voltou a contar como não lido; (None, False) se ainda não houver grupo.
+
+    Só altera a sessão; o commit fica com quem chamou. Um ator que volta a
+    agir (ex.: descurtir e curtir de novo) não é contado outra vez.
+    """
+    group = Notification.query.filter_by(
+        user_id=user_id,
+        notification_type=notification_type,
+        related_id=related_id,
+        bucket=bucket_for(now)
+    ).order_by(Notification.id.desc()).first()
+    if group is None:
+        return None, False
+    reopened = bool(group.is_read)
+
+    if add_actor(group.id, actor_id):
+        group.actor_count = Notification.actor_count + 1
+    actors = recent_actor_ids(group)
+    group.actor_ids = json.dumps(([actor_id] + [a for a in actors if a != actor_id])[:RECENT_ACTORS])
+    group.is_read = False
+    return group, reopened
+
+def add_actor(notification_id, actor_id):
+    """Registrar o ator no grupo; retorna True se ele ainda não estava lá"""
+    return db.session.execute(insert_ignore(notification_actors).values(
+        notification_id=notification_id, actor_id=actor_id
+    )).rowcount > 0
+
+def render_content(notification, actor_name):
+    """Texto de um grupo com mais de um ator"""
+    others = notification.actor_count - 1
+    people = 'outra pessoa' if others == 1 else f'outras {others} pessoas'
+    return f'{actor_name} e {people} {AGGREGATED_TYPES[notification.notification_type]}'
@@ -0,0 +1,80 @@
+import threading
+import time
+from src.models.user import db, Notification
+from src.models.serializers import serialize_notifications
+from src.models import unread
+
+# Entrega em tempo real das notificações na sala user_{id} do Socket.IO.
+# create_notification só enfileira o ID; a cada janela curta uma thread junta
+# o que chegou para cada usuário e faz um único emit 'new_notification' com o
+# lote e a contagem de não lidas atual. Assim uma rajada (ex.: vários likes
+# seguidos) vira uma mensagem, e o cliente não precisa consultar
+# /unread-count.
+
+PUSH_WINDOW = 0.5  # segundos de agrupamento por usuário
+LOAD_CHUNK_SIZE = 500  # notificações carregadas por consulta
+
+class NotificationPusher:
+
+    def __init__(self):
+        self.app = None
+        self.socketio = None
+        self._pending = {}  # user_id -> [notification_id, ...]
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def init_app(self, app, socketio):
+        self.app = app
+        self.socketio = socketio
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            time.sleep(PUSH_WINDOW)
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception:
+                self.app.logger.exception('Erro ao enviar notificações')
+
+    def push(self, user_id, notification_id):
+        """Enfileirar uma notificação já gravada (chamar depois do commit)"""
+        if self.socketio is None:
+            return  # Sem Socket.IO (jobs, scripts): o cliente lê pela API
+        with self._lock:
+            self._pending.setdefault(user_id, []).append(notification_id)
+        self._ensure_worker()
+
+    def flush(self):
+        """Emitir um lote por usuário com as notificações pendentes"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        ids = [notification_id for batch in pending.values() for notification_id in batch]
+        notifications = {}
+        for start in range(0, len(ids), LOAD_CHUNK_SIZE):
+            chunk = ids[start:start + LOAD_CHUNK_SIZE]
+            for n in serialize_notifications(Notification.query.filter(Notification.id.in_(chunk)).all()):
+                notifications[n['id']] = n
+        db.session.commit()
+
+        for user_id, batch in pending.items():
+            # Mais recentes primeiro, como na listagem; um grupo atualizado
+            # várias vezes na janela vai uma vez só
+            ids = list(dict.fromkeys(reversed(batch)))
+            items = [notifications[i] for i in ids if i in notifications]
+            if not items:
+                continue
+            self.socketio.emit('new_notification', {
+                'notifications': items,
+                'unread_count': unread.notification_count(user_id)
+            }, room=f'user_{user_id}')
+        return len(pending)
+
+notification_pusher = NotificationPusher()
@@ -0,0 +1,200 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import or_, select, update
+from src.models.user import db, Notification, NotificationOutbox, community_members, event_participants, user_follows
+from src.models.notification_push import notification_pusher
+from src.models import unread
+
+# Outbox de notificações: o handler grava uma intenção (NotificationOutbox) na
+# mesma transação da mudança que a originou e responde na hora. Um worker em
+# segundo plano reivindica as intenções pendentes, expande os destinatários
+# (membros da comunidade, participantes do evento, seguidores) em blocos pela
+# ordem do ID e insere as notificações com INSERTs de várias linhas. Cada bloco
+# é gravado junto com o progresso (last_recipient_id), então uma falha no meio
+# retoma do ponto em que parou sem duplicar. Depois de cada bloco as
+# notificações seguem para a entrega em tempo real.
+#
+# Vários processos podem rodar o worker: a reivindicação é um UPDATE
+# condicional em locked_until, que expira se o processo cair. A thread só é
+# iniciada pelo servidor web (start, em src/main.py); importar o app não a
+# inicia, e o job notification_worker chama process() no próprio laço.
+
+POLL_INTERVAL = 0.5  # segundos entre buscas por intenções pendentes
+CLAIM_BATCH_SIZE = 20  # intenções reivindicadas por vez
+CHUNK_SIZE = 1000  # destinatários por INSERT
+LOCK_TIMEOUT = timedelta(seconds=60)
+MAX_ATTEMPTS = 5
+
+# Destinatários por tipo de público: (coluna do usuário, coluna do público)
+AUDIENCES = {
+    'community': (community_members.c.user_id, community_members.c.community_id),
+    'event': (event_participants.c.user_id, event_participants.c.event_id),
+    'followers': (user_follows.c.follower_id, user_follows.c.followed_id),
+}
+
+def enqueue_notification(audience, audience_id, title, content, notification_type,
+                         related_id=None, actor_id=None):
+    """Registrar uma intenção de notificação na transação atual (sem commit)
+
+    audience é 'user' (audience_id é o destinatário) ou um dos públicos de
+    AUDIENCES; o ator nunca recebe a própria notificação.
+    """
+    if audience != 'user' and audience not in AUDIENCES:
+        raise ValueError(f'Público de notificação inválido: {audience}')
+    intent = NotificationOutbox(
+        audience=audience,
+        audience_id=audience_id,
+        title=title,
+        content=content,
+        notification_type=notification_type,
+        related_id=related_id,
+        actor_id=actor_id
+    )
+    db.session.add(intent)
+    return intent
+
+class OutboxWorker:
+
+    def __init__(self):
+        self.app = None
+        self._worker = None
+
+    def init_app(self, app):
+        self.app = app
+
+    def start(self):
+        """Iniciar a thread de entrega (servidor web); jobs chamam process() direto"""
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    processed = self.process()
+            except Exception:
+                self.app.logger.exception('Erro ao processar outbox de notificações')
+                processed = 0
+            if not processed:
+                time.sleep(POLL_INTERVAL)
+
+    def _claim(self, limit):
+        """Reivindicar intenções pendentes; retorna os IDs obtidos por este processo"""
+        now = datetime.utcnow()
+        available = or_(NotificationOutbox.locked_until.is_(None), NotificationOutbox.locked_until < now)
+        candidates = db.session.query(NotificationOutbox.id).filter(
+            NotificationOutbox.processed_at.is_(None),
+            NotificationOutbox.attempts < MAX_ATTEMPTS,
+            available
+        ).order_by(NotificationOutbox.id).limit(limit).all()
+
+        claimed = []
+        for (intent_id,) in candidates:
+            result = db.session.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id == intent_id, available)
+                .values(locked_until=now + LOCK_TIMEOUT, attempts=NotificationOutbox.attempts + 1)
+            )
+            if result.rowcount:
+                claimed.append(intent_id)
+        db.session.commit()
+        return claimed
+
+    def process(self, limit=CLAIM_BATCH_SIZE):
+        """Entregar um lote de intenções; retorna quantas foram concluídas"""
+        done = 0
+        for intent_id in self._claim(limit):
+            intent = db.session.get(NotificationOutbox, intent_id)
+            try:
+                after_commit = None
+                if intent.audience == 'user':
+                    after_commit = self._deliver_one(intent)
+                else:
+                    self._fan_out(intent)
+                intent.processed_at = datetime.utcnow()
+                intent.locked_until = None
+                intent.last_error = None
+                db.session.commit()
+                done += 1
+            except Exception as e:
+                db.session.rollback()
+                db.session.execute(
+                    update(NotificationOutbox).where(NotificationOutbox.id == intent_id)
+                    .values(last_error=str(e), locked_until=None)
+                )
+                db.session.commit()
+                current_app.logger.error('Erro ao entregar notificação %s: %s', intent_id, e)
+            else:
+                if after_commit is not None:
+                    after_commit()
+        return done
+
+    def _deliver_one(self, intent):
+        """Destinatário único: passa pela agregação de add_notification
+
+        A notificação entra na mesma transação que marca a intenção como
+        concluída, então uma falha entre as duas não a cria de novo. Retorna
+        o que fazer depois do commit (contagem e push).
+        """
+        from src.routes.notifications import add_notification, notification_added
+        if intent.audience_id == intent.actor_id:
+            return None
+        user_id = intent.audience_id
+        notification, unread_delta = add_notification(
+            user_id=user_id,
+            title=intent.title,
+            content=intent.content,
+            notification_type=intent.notification_type,
+            related_id=intent.related_id,
+            actor_id=intent.actor_id
+        )
+        intent.delivered_count = 1
+        return lambda: notification_added(user_id, notification, unread_delta)
+
+    def _recipients(self, intent, limit):
+        user_column, audience_column = AUDIENCES[intent.audience]
+        query = select(user_column).where(
+            audience_column == intent.audience_id,
+            user_column > intent.last_recipient_id
+        )
+        if intent.actor_id is not None:
+            query = query.where(user_column != intent.actor_id)
+        return [row[0] for row in db.session.execute(query.order_by(user_column).limit(limit))]
+
+    def _fan_out(self, intent):
+        table = Notification.__table__
+        actor_ids = json.dumps([intent.actor_id]) if intent.actor_id is not None else None
+
+        while True:
+            recipients = self._recipients(intent, CHUNK_SIZE)
+            if not recipients:
+                return
+
+            now = datetime.utcnow()
+            # executemany com RETURNING vira INSERTs de várias linhas (insertmanyvalues)
+            inserted = db.session.execute(table.insert().returning(table.c.id, table.c.user_id), [{
+                'user_id': user_id,
+                'title': intent.title,
+                'content': intent.content,
+                'notification_type': intent.notification_type,
+                'related_id': intent.related_id,
+                'is_read': False,
+                'created_at': now,
+                'actor_count': 1,
+                'actor_ids': actor_ids
+            } for user_id in recipients]).fetchall()
+
+            intent.last_recipient_id = recipients[-1]
+            intent.delivered_count = (intent.delivered_count or 0) + len(inserted)
+            intent.locked_until = now + LOCK_TIMEOUT
+            db.session.commit()
+
+            unread.notifications_added_many(recipients)
+            for notification_id, user_id in inserted:
+                notification_pusher.push(user_id, notification_id)
+
+outbox_worker = OutboxWorker()
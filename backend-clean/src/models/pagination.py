@@ -0,0 +1,91 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+# Paginação por chave (keyset): em vez de OFFSET + COUNT(*), o cliente envia o
+# cursor da última linha recebida, codificado como (valor de ordenação, id).
+# Listagens com mais de uma ordenação gravam também o nome dela (`sort`) no
+# cursor, e um cursor de outra ordenação é recusado em vez de dar uma página
+# errada.
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(sort_value, row_id, sort=None):
+    """Codificar a posição (valor de ordenação, id) como cursor opaco"""
+    if isinstance(sort_value, datetime):
+        sort_value = {'t': sort_value.isoformat()}
+    payload = json.dumps([sort_value, row_id] if sort is None else [sort_value, row_id, sort])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, sort=None):
+    """Decodificar um cursor; lança InvalidCursor se for inválido ou de outra ordenação"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        if len(payload) == 2:
+            payload.append(None)  # Cursor sem nome de ordenação
+        sort_value, row_id, cursor_sort = payload
+        if isinstance(sort_value, dict):
+            sort_value = datetime.fromisoformat(sort_value['t'])
+        elif not isinstance(sort_value, (int, float)):
+            raise ValueError(sort_value)
+        row_id = int(row_id)
+    except (KeyError, TypeError, ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor('Cursor inválido') from e
+    if cursor_sort != sort:
+        raise InvalidCursor('Cursor de outra ordenação (recomece sem cursor)')
+    return sort_value, row_id
+
+def keyset_paginate(query, sort_column, id_column, cursor=None, per_page=20,
+                    descending=True, key=None, sort=None):
+    """Paginar uma consulta por (sort_column, id_column) sem OFFSET nem COUNT(*)
+
+    `key` extrai (valor de ordenação, id) de uma linha; por padrão lê os
+    atributos da própria instância. `sort` é o nome da ordenação gravado no
+    cursor (ver decode_cursor). Retorna (linhas, next_cursor).
+    """
+    if key is None:
+        key = lambda row: (getattr(row, sort_column.key), row.id)
+
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor, sort)
+        if descending:
+            query = query.filter(or_(
+                sort_column < sort_value,
+                and_(sort_column == sort_value, id_column < last_id)
+            ))
+        else:
+            query = query.filter(or_(
+                sort_column > sort_value,
+                and_(sort_column == sort_value, id_column > last_id)
+            ))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    # Buscar uma linha a mais para saber se existe próxima página
+    rows = query.limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    next_cursor = encode_cursor(*key(rows[-1]), sort=sort) if has_next else None
+    return rows, next_cursor
+
+def cursor_response(items_key, items, next_cursor, count_query=None):
+    """Montar a resposta do modo cursor; o total só é contado se pedido"""
+    response = {
+        items_key: items,
+        'next_cursor': next_cursor,
+        'has_next': next_cursor is not None
+    }
+    if count_query is not None:
+        response['total'] = count_query.order_by(None).count()
+    return response
+
+def wants_total(args):
+    """Verificar se o cliente pediu o total no modo cursor (?include_total=true)"""
+    return args.get('include_total', 'false').lower() in ('1', 'true')
@@ -0,0 +1,244 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import bindparam, update
+from src.models.user import db, User
+
+# Presença (online/offline) sem escrever no banco a cada conexão. Um registro
+# guarda as conexões Socket.IO abertas de cada usuário (várias abas contam
+# separadamente) com prazo de expiração renovado pelo heartbeat do cliente; o
+# usuário está online enquanto tiver alguma conexão válida. last_seen e
+# is_online vão para a tabela user em lote, por uma thread, no máximo uma vez
+# por LAST_SEEN_RESOLUTION para heartbeats (conectar e desconectar sempre
+# entram no próximo lote).
+#
+# Com PRESENCE_REDIS_URL (ou CACHE_REDIS_URL) o registro fica num servidor
+# compatível com Redis e vale para todos os workers; sem ele, cada processo
+# conhece só as próprias conexões.
+
+CONNECTION_TTL = 90  # segundos sem heartbeat até a conexão expirar
+FLUSH_INTERVAL = 5.0  # segundos entre gravações de last_seen
+LAST_SEEN_RESOLUTION = 60  # segundos entre regravações de last_seen por heartbeat
+MAX_BATCH = 1000  # usuários por UPDATE
+
+logger = logging.getLogger(__name__)
+
+class LocalPresence:
+    """Registro em processo: {user_id: {sid: expira_em}}"""
+
+    def __init__(self):
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def connect(self, user_id, sid, ttl):
+        """Registrar ou renovar uma conexão; True se o usuário acabou de ficar online"""
+        now = time.time()
+        with self._lock:
+            sids = self._connections.setdefault(user_id, {})
+            was_online = any(expires_at > now for expires_at in sids.values())
+            sids[sid] = now + ttl
+        return not was_online
+
+    def disconnect(self, user_id, sid):
+        """Remover uma conexão; True se era a última do usuário"""
+        now = time.time()
+        with self._lock:
+            sids = self._connections.get(user_id)
+            if not sids or sids.pop(sid, None) is None:
+                return False
+            if any(expires_at > now for expires_at in sids.values()):
+                return False
+            del self._connections[user_id]
+        return True
+
+    def online_among(self, user_ids):
+        now = time.time()
+        with self._lock:
+            return {
+                user_id for user_id in user_ids
+                if any(expires_at > now for expires_at in self._connections.get(user_id, {}).values())
+            }
+
+    def expire(self):
+        """Descartar conexões vencidas; retorna os usuários que ficaram offline"""
+        now = time.time()
+        offline = []
+        with self._lock:
+            for user_id, sids in list(self._connections.items()):
+                for sid, expires_at in list(sids.items()):
+                    if expires_at <= now:
+                        del sids[sid]
+                if not sids:
+                    del self._connections[user_id]
+                    offline.append(user_id)
+        return offline
+
+class RedisPresence:
+    """Registro compartilhado: um sorted set por usuário (sid -> expira_em)"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def _key(self, user_id):
+        return f'presence:{user_id}'
+
+    def connect(self, user_id, sid, ttl):
+        now = time.time()
+        key = self._key(user_id)
+        pipeline = self.client.pipeline()
+        pipeline.zremrangebyscore(key, '-inf', now)
+        pipeline.zcard(key)
+        pipeline.zadd(key, {sid: now + ttl})
+        pipeline.expire(key, int(ttl) + 1)
+        _, before, _, _ = pipeline.execute()
+        return before == 0
+
+    def disconnect(self, user_id, sid):
+        key = self._key(user_id)
+        pipeline = self.client.pipeline()
+        pipeline.zrem(key, sid)
+        pipeline.zremrangebyscore(key, '-inf', time.time())
+        pipeline.zcard(key)
+        removed, _, remaining = pipeline.execute()
+        return bool(removed) and remaining == 0
+
+    def online_among(self, user_ids):
+        user_ids = list(user_ids)
+        now = time.time()
+        pipeline = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipeline.zcount(self._key(user_id), now, '+inf')
+        return {user_id for user_id, count in zip(user_ids, pipeline.execute()) if count}
+
+    def expire(self):
+        # As entradas vencidas somem sozinhas (EXPIRE / ZREMRANGEBYSCORE); o
+        # last_seen de quem caiu sem desconectar fica no último heartbeat gravado
+        return []
+
+def create_backend():
+    """Escolher o registro a partir de PRESENCE_REDIS_URL/CACHE_REDIS_URL (padrão: local)"""
+    redis_url = os.environ.get('PRESENCE_REDIS_URL') or os.environ.get('CACHE_REDIS_URL')
+    if redis_url:
+        try:
+            import redis
+        except ImportError:
+            logger.warning('PRESENCE_REDIS_URL definido, mas o pacote redis não está instalado; usando presença local')
+        else:
+            return RedisPresence(redis.Redis.from_url(redis_url))
+    return LocalPresence()
+
+class Presence:
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.app = None
+        self._last_seen = {}  # user_id -> datetime ainda não gravado
+        self._recorded = {}  # user_id -> time.time() do último registro
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def init_app(self, app):
+        self.app = app
+        atexit.register(self._flush_on_exit)
+
+    def is_shared(self):
+        """Se o registro é visto por todos os workers (Redis) ou só por este processo"""
+        return not isinstance(self.backend, LocalPresence)
+
+    def _ensure_flusher(self):
+        if self._flusher is None and self.app is not None:
+            self._flusher = threading.Thread(target=self._run, daemon=True)
+            self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                for user_id in self.backend.expire():
+                    self._record(user_id, force=True)
+                with self.app.app_context():
+                    self.flush()
+            except Exception:
+                self.app.logger.exception('Erro ao gravar presença')
+
+    def _flush_on_exit(self):
+        with self.app.app_context():
+            self.flush()
+
+    def _record(self, user_id, force=False):
+        now = time.time()
+        with self._lock:
+            if not force and now - self._recorded.get(user_id, 0) < LAST_SEEN_RESOLUTION:
+                return
+            self._recorded[user_id] = now
+            self._last_seen[user_id] = datetime.utcnow()
+        self._ensure_flusher()
+
+    def connect(self, user_id, sid):
+        """Nova conexão Socket.IO do usuário"""
+        self.backend.connect(user_id, sid, CONNECTION_TTL)
+        self._record(user_id, force=True)
+
+    def heartbeat(self, user_id, sid):
+        """Renovar a conexão (o cliente envia a cada poucos segundos)"""
+        if self.backend.connect(user_id, sid, CONNECTION_TTL):
+            self._record(user_id, force=True)  # Tinha expirado
+        else:
+            self._record(user_id)
+
+    def disconnect(self, user_id, sid):
+        self.backend.disconnect(user_id, sid)
+        self._record(user_id, force=True)
+
+    def touch(self, user_id):
+        """Registrar atividade sem conexão (login/logout)"""
+        self._record(user_id, force=True)
+
+    def online_among(self, user_ids):
+        """Subconjunto de `user_ids` com alguma conexão válida"""
+        user_ids = {user_id for user_id in user_ids if user_id is not None}
+        return self.backend.online_among(user_ids) if user_ids else set()
+
+    def is_online(self, user_id):
+        return user_id in self.online_among([user_id])
+
+    def last_seen(self, user_id):
+        """last_seen ainda não gravado no banco, ou None"""
+        return self._last_seen.get(user_id)
+
+    def flush(self):
+        """Gravar last_seen/is_online pendentes; retorna quantos usuários foram gravados"""
+        with self._lock:
+            pending, self._last_seen = self._last_seen, {}
+            cutoff = time.time() - LAST_SEEN_RESOLUTION
+            self._recorded = {user_id: at for user_id, at in self._recorded.items() if at > cutoff}
+        if not pending:
+            return 0
+
+        table = User.__table__
+        statement = update(table).where(table.c.id == bindparam('user_id')).values(
+            last_seen=bindparam('seen'), is_online=bindparam('online')
+        )
+        items = list(pending.items())
+        try:
+            for start in range(0, len(items), MAX_BATCH):
+                batch = items[start:start + MAX_BATCH]
+                online = self.online_among(user_id for user_id, _ in batch)
+                db.session.execute(statement, [
+                    {'user_id': user_id, 'seen': seen, 'online': user_id in online}
+                    for user_id, seen in batch
+                ])
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Devolver ao buffer sem sobrescrever registros mais novos
+            with self._lock:
+                for user_id, seen in pending.items():
+                    self._last_seen.setdefault(user_id, seen)
+            raise
+        return len(items)
+
+presence = Presence(create_backend())
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, update
+from src.models.user import db, Post
+
+# Ranking "hot": engajamento dividido por uma potência da idade (gravidade),
+# gravado em post.hot_score para que o feed ordenado seja uma leitura por
+# índice. A pontuação é recalculada de forma incremental quando likes e
+# comentários mudam, e um passe periódico (redecay) envelhece os posts
+# recentes que não receberam interação.
+
+GRAVITY = 1.8
+COMMENT_WEIGHT = 2
+DECAY_WINDOW = timedelta(days=7)  # Posts mais antigos ficam com a pontuação congelada
+
+def hot_score(likes_count, comments_count, created_at, now=None):
+    """Calcular a pontuação hot de um post"""
+    now = now or datetime.utcnow()
+    age_hours = max((now - (created_at or now)).total_seconds() / 3600, 0)
+    engagement = (likes_count or 0) + COMMENT_WEIGHT * (comments_count or 0) + 1
+    return engagement / (age_hours + 2) ** GRAVITY
+
+def _update_scores(rows, now):
+    """Gravar as pontuações de (id, likes, comentários, data) com um executemany"""
+    params = [
+        {'post_id': post_id, 'score': hot_score(likes, comments, created_at, now)}
+        for post_id, likes, comments, created_at in rows
+    ]
+    if params:
+        db.session.execute(
+            update(Post.__table__)
+            .where(Post.__table__.c.id == bindparam('post_id'))
+            .values(hot_score=bindparam('score')),
+            params
+        )
+    return len(params)
+
+def refresh_scores(post_ids):
+    """Recalcular a pontuação de posts cujo engajamento mudou (na transação atual)"""
+    post_ids = list(set(post_ids))
+    if not post_ids:
+        return 0
+    rows = db.session.query(
+        Post.id, Post.likes_count, Post.comments_count, Post.created_at
+    ).filter(Post.id.in_(post_ids)).all()
+    return _update_scores(rows, datetime.utcnow())
+
+def redecay(batch_size=1000, window=DECAY_WINDOW):
+    """Passe periódico: recalcular os posts dentro da janela, em lotes por ID"""
+    now = datetime.utcnow()
+    query = db.session.query(
+        Post.id, Post.likes_count, Post.comments_count, Post.created_at
+    ).order_by(Post.id)
+    if window is not None:
+        query = query.filter(Post.created_at >= now - window)
+
+    last_id, total = 0, 0
+    while True:
+        rows = query.filter(Post.id > last_id).limit(batch_size).all()
+        if not rows:
+            break
+        total += _update_scores(rows, now)
+        db.session.commit()
+        last_id = rows[-1][0]
+    return total
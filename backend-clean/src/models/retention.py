@@ -0,0 +1,148 @@
+import json
+import os
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from src.models.user import db, Notification, NotificationArchive, NotificationOutbox, notification_actors
+from src.models import unread
+
+# Retenção de notificações. Cada política escolhe, em lotes limitados, as
+# linhas que devem sair da tabela notification; cada lote é copiado para
+# notification_archive (um registro por usuário com o JSON comprimido) e
+# removido na mesma transação curta, para não segurar locks por muito tempo.
+# As contagens de não lidas são ajustadas quando uma linha não lida sai.
+
+READ_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_READ_RETENTION_DAYS', 30))
+MAX_PER_USER = int(os.environ.get('NOTIFICATION_MAX_PER_USER', 1000))
+OUTBOX_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_OUTBOX_RETENTION_DAYS', 7))
+BATCH_SIZE = 1000
+PAUSE = 0.05  # segundos entre lotes, para dar espaço às escritas da aplicação
+
+_COLUMNS = [column.name for column in Notification.__table__.columns]
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def _archive_batch(ids, policy):
+    """Arquivar e remover um lote de notificações em uma transação; retorna quantas saíram"""
+    rows = db.session.query(Notification.__table__).filter(Notification.id.in_(ids)).all()
+    if not rows:
+        return 0
+
+    by_user = defaultdict(list)
+    for row in rows:
+        by_user[row.user_id].append(row)
+
+    archived_at = datetime.utcnow()
+    db.session.execute(NotificationArchive.__table__.insert(), [{
+        'user_id': user_id,
+        'policy': policy,
+        'notification_count': len(user_rows),
+        'oldest_at': min(row.created_at for row in user_rows),
+        'newest_at': max(row.created_at for row in user_rows),
+        'archived_at': archived_at,
+        'payload': zlib.compress(json.dumps([
+            {column: _encode(getattr(row, column)) for column in _COLUMNS} for row in user_rows
+        ]).encode())
+    } for user_id, user_rows in by_user.items()])
+
+    removed = [row.id for row in rows]
+    db.session.execute(notification_actors.delete().where(notification_actors.c.notification_id.in_(removed)))
+    db.session.execute(Notification.__table__.delete().where(Notification.id.in_(removed)))
+    db.session.commit()
+
+    for user_id, user_rows in by_user.items():
+        removed_unread = sum(1 for row in user_rows if not row.is_read)
+        if removed_unread:
+            unread.notifications_read(user_id, removed_unread)
+    return len(rows)
+
+def _run_policy(policy, next_batch, batch_size, pause):
+    """Rodar uma política até esgotar os candidatos; retorna as métricas"""
+    started = time.perf_counter()
+    archived = batches = 0
+    while True:
+        ids = next_batch(batch_size)
+        if not ids:
+            break
+        archived += _archive_batch(ids, policy)
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return {'policy': policy, 'archived': archived, 'batches': batches,
+            'seconds': round(time.perf_counter() - started, 3)}
+
+def archive_read_older_than(days=READ_RETENTION_DAYS, batch_size=BATCH_SIZE, pause=PAUSE):
+    """Política: notificações lidas com mais de `days` dias"""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    last_id = 0
+
+    def next_batch(limit):
+        nonlocal last_id
+        ids = [row[0] for row in db.session.query(Notification.id).filter(
+            Notification.id > last_id,
+            Notification.is_read == True,
+            Notification.created_at < cutoff
+        ).order_by(Notification.id).limit(limit).all()]
+        if ids:
+            last_id = ids[-1]
+        return ids
+
+    return _run_policy(f'read_older_than_{days}d', next_batch, batch_size, pause)
+
+def archive_over_limit(keep=MAX_PER_USER, batch_size=BATCH_SIZE, pause=PAUSE):
+    """Política: manter no máximo `keep` notificações (as mais recentes) por usuário"""
+    users = [row[0] for row in db.session.query(Notification.user_id).group_by(
+        Notification.user_id
+    ).having(func.count(Notification.id) > keep).all()]
+    pending = iter(users)
+    current = next(pending, None)
+
+    def next_batch(limit):
+        nonlocal current
+        while current is not None:
+            ids = [row[0] for row in db.session.query(Notification.id).filter(
+                Notification.user_id == current
+            ).order_by(Notification.created_at.desc(), Notification.id.desc()).offset(keep).limit(limit).all()]
+            if ids:
+                return ids
+            current = next(pending, None)
+        return []
+
+    return _run_policy(f'max_{keep}_per_user', next_batch, batch_size, pause)
+
+def purge_outbox(days=OUTBOX_RETENTION_DAYS, batch_size=BATCH_SIZE, pause=PAUSE):
+    """Remover intenções do outbox já entregues há mais de `days` dias (sem arquivar)"""
+    started = time.perf_counter()
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    removed = batches = 0
+    while True:
+        ids = [row[0] for row in db.session.query(NotificationOutbox.id).filter(
+            NotificationOutbox.processed_at < cutoff
+        ).order_by(NotificationOutbox.processed_at).limit(batch_size).all()]
+        if not ids:
+            break
+        db.session.execute(NotificationOutbox.__table__.delete().where(NotificationOutbox.id.in_(ids)))
+        db.session.commit()
+        removed += len(ids)
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return {'policy': f'outbox_older_than_{days}d', 'archived': removed, 'batches': batches,
+            'seconds': round(time.perf_counter() - started, 3)}
+
+def run_retention(read_days=READ_RETENTION_DAYS, max_per_user=MAX_PER_USER,
+                  outbox_days=OUTBOX_RETENTION_DAYS, batch_size=BATCH_SIZE, pause=PAUSE):
+    """Aplicar todas as políticas; retorna a lista de métricas por política"""
+    return [
+        archive_read_older_than(read_days, batch_size, pause),
+        archive_over_limit(max_per_user, batch_size, pause),
+        purge_outbox(outbox_days, batch_size, pause),
+    ]
+
+def load_archive(user_id):
+    """Notificações arquivadas de um usuário (para suporte/exportação)"""
+    archives = NotificationArchive.query.filter_by(user_id=user_id).order_by(NotificationArchive.archived_at).all()
+    return [item for archive in archives for item in json.loads(zlib.decompress(archive.payload))]
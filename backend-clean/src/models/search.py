@@ -0,0 +1,155 @@
+import re
+from sqlalchemy import Integer, text
+from src.models.user import db, User, Community, Event, Post
+from src.models.pagination import encode_cursor, decode_cursor
+
+# Busca textual: um índice único com um documento por objeto (post, comunidade,
+# evento, usuário). Em SQLite usa uma tabela virtual FTS5 (ranking bm25); em
+# Postgres, uma tabela com coluna tsvector e índice GIN (ranking ts_rank). Os
+# handlers de criação/edição/remoção mantêm o índice na mesma transação.
+# Em ambos os backends, score menor = mais relevante.
+
+KINDS = {
+    'post': Post,
+    'community': Community,
+    'event': Event,
+    'user': User,
+}
+
+# (título, corpo) indexados para cada tipo
+_DOCUMENTS = {
+    Post: ('post', lambda post: ('', post.content)),
+    Community: ('community', lambda c: (c.name, c.description)),
+    Event: ('event', lambda e: (e.title, ' '.join(filter(None, [e.description, e.location])))),
+    User: ('user', lambda u: (' '.join(filter(None, [u.username, u.display_name])), u.bio)),
+}
+
+def _is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+def create_index():
+    """Criar a estrutura do índice de busca (idempotente)"""
+    with db.engine.begin() as conn:
+        if _is_postgres():
+            conn.execute(text(
+                'CREATE TABLE IF NOT EXISTS search_document ('
+                'id SERIAL PRIMARY KEY, kind VARCHAR(20) NOT NULL, ref_id INTEGER NOT NULL, '
+                'title TEXT, body TEXT, document TSVECTOR NOT NULL, '
+                'UNIQUE (kind, ref_id))'
+            ))
+            conn.execute(text(
+                'CREATE INDEX IF NOT EXISTS ix_search_document_gin '
+                'ON search_document USING GIN (document)'
+            ))
+        else:
+            conn.execute(text(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5('
+                'kind UNINDEXED, ref_id UNINDEXED, title, body, '
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            ))
+
+def index_document(obj):
+    """Inserir ou atualizar o documento de um objeto (na transação atual)"""
+    kind, extract = _DOCUMENTS[type(obj)]
+    title, body = extract(obj)
+    remove_document(obj)
+
+    if _is_postgres():
+        db.session.execute(text(
+            'INSERT INTO search_document (kind, ref_id, title, body, document) '
+            "VALUES (:kind, :ref_id, :title, :body, "
+            "setweight(to_tsvector('simple', coalesce(:title, '')), 'A') || "
+            "to_tsvector('simple', coalesce(:body, '')))"
+        ), {'kind': kind, 'ref_id': obj.id, 'title': title, 'body': body})
+    else:
+        db.session.execute(text(
+            'INSERT INTO search_index (kind, ref_id, title, body) '
+            'VALUES (:kind, :ref_id, :title, :body)'
+        ), {'kind': kind, 'ref_id': obj.id, 'title': title or '', 'body': body or ''})
+
+def remove_document(obj):
+    """Remover o documento de um objeto do índice (na transação atual)"""
+    kind, _ = _DOCUMENTS[type(obj)]
+    table = 'search_document' if _is_postgres() else 'search_index'
+    db.session.execute(
+        text(f'DELETE FROM {table} WHERE kind = :kind AND ref_id = :ref_id'),
+        {'kind': kind, 'ref_id': obj.id}
+    )
+
+def rebuild(batch_size=1000):
+    """Reindexar todos os objetos em lotes"""
+    table = 'search_document' if _is_postgres() else 'search_index'
+    db.session.execute(text(f'DELETE FROM {table}'))
+
+    total = 0
+    for model in _DOCUMENTS:
+        last_id = 0
+        while True:
+            rows = model.query.filter(model.id > last_id).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            for obj in rows:
+                index_document(obj)
+            db.session.commit()
+            total += len(rows)
+            last_id = rows[-1].id
+    db.session.commit()
+    return total
+
+def _terms(query):
+    return re.findall(r'\w+', query or '', re.UNICODE)
+
+def _match_sql(kind=None):
+    """SQL que retorna (ref_id, kind, score, rid) para os documentos que casam"""
+    kind_filter = ' AND kind = :kind' if kind else ''
+    if _is_postgres():
+        return (
+            "SELECT ref_id, kind, -ts_rank(document, to_tsquery('simple', :query)) AS score, id AS rid "
+            "FROM search_document WHERE document @@ to_tsquery('simple', :query)" + kind_filter
+        )
+    return (
+        'SELECT ref_id, kind, bm25(search_index, 2.0, 1.0) AS score, rowid AS rid '
+        'FROM search_index WHERE search_index MATCH :query' + kind_filter
+    )
+
+def _query_string(terms):
+    """Termos com casamento por prefixo, no formato de cada backend"""
+    if _is_postgres():
+        return ' & '.join(f'{term}:*' for term in terms)
+    return ' '.join('"{}"*'.format(term.replace('"', '')) for term in terms)
+
+def matching_ids(kind, query):
+    """Subconsulta com os IDs de um tipo que casam com a busca (para filtrar listagens)"""
+    terms = _terms(query)
+    if not terms:
+        return text('SELECT NULL WHERE 1 = 0').columns(ref_id=Integer)
+    sql = f'SELECT ref_id FROM ({_match_sql(kind)}) AS matches'
+    return text(sql).bindparams(query=_query_string(terms), kind=kind).columns(ref_id=Integer)
+
+def search(query, kind=None, cursor=None, per_page=20):
+    """Buscar por relevância com paginação por cursor (score, rid)
+
+    Retorna ([(kind, ref_id, score)], next_cursor).
+    """
+    terms = _terms(query)
+    if not terms:
+        return [], None
+
+    params = {'query': _query_string(terms), 'limit': per_page + 1}
+    if kind:
+        params['kind'] = kind
+
+    where = ''
+    if cursor:
+        params['score'], params['rid'] = decode_cursor(cursor)
+        where = ' WHERE score > :score OR (score = :score AND rid > :rid)'
+
+    rows = db.session.execute(text(
+        f'SELECT ref_id, kind, score, rid FROM ({_match_sql(kind)}) AS matches'
+        f'{where} ORDER BY score, rid LIMIT :limit'
+    ), params).fetchall()
+
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = encode_cursor(rows[-1].score, rows[-1].rid) if has_next else None
+    return [(row.kind, row.ref_id, row.score) for row in rows], next_cursor
@@ -0,0 +1,243 @@
+from src.models.user import User, Community
+from src.models.notification_groups import AGGREGATED_TYPES, recent_actor_ids, render_content
+from src.models.presence import presence
+from src import cache
+
+# Serialização em lote: cada função recebe uma lista de linhas, coleta os IDs
+# relacionados e resolve autores e comunidades com um número fixo de consultas
+# por conjunto (IN), em vez de um to_dict() recursivo por item. As contagens vêm
+# dos contadores denormalizados (ver src/models/counters.py).
+#
+# Com related=False as entidades relacionadas ficam de fora (só os IDs): é a
+# forma guardada no cache de respostas, e embed_*_related preenche autor,
+# comunidade e dono na leitura a partir das entradas de cada entidade.
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+def _unique(ids):
+    return list({i for i in ids if i is not None})
+
+def _load_by_id(model, ids):
+    """Carregar instâncias de um modelo por ID em uma única consulta"""
+    ids = _unique(ids)
+    if not ids:
+        return {}
+    return {obj.id: obj for obj in model.query.filter(model.id.in_(ids)).all()}
+
+def _related(serialize, model, ids):
+    """Serializar os objetos relacionados e indexá-los por ID"""
+    objects = list(_load_by_id(model, ids).values())
+    return {data['id']: data for data in serialize(objects)}
+
+def serialize_users(users):
+    """Serializar usuários, com a presença vinda do registro em memória"""
+    online = presence.online_among(user.id for user in users)
+    return [{
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'display_name': user.display_name,
+        'bio': user.bio,
+        'avatar_url': user.avatar_url,
+        'is_online': user.id in online,
+        'last_seen': _isoformat(presence.last_seen(user.id) or user.last_seen),
+        'created_at': _isoformat(user.created_at),
+        'followers_count': user.followers_count or 0,
+        'following_count': user.following_count or 0
+    } for user in users]
+
+PRIVATE_USER_FIELDS = ('email',)
+
+def public_view(data):
+    """Cópia sem os campos privados de usuários, inclusive nos embutidos (autor, dono)"""
+    if isinstance(data, dict):
+        return {key: public_view(value) for key, value in data.items() if key not in PRIVATE_USER_FIELDS}
+    if isinstance(data, list):
+        return [public_view(value) for value in data]
+    return data
+
+def serialize_communities(communities, related=True):
+    """Serializar comunidades com donos em lote"""
+    owners = _related(serialize_users, User, [c.owner_id for c in communities]) if related else {}
+
+    return [{
+        'id': community.id,
+        'name': community.name,
+        'description': community.description,
+        'banner_url': community.banner_url,
+        'avatar_url': community.avatar_url,
+        'is_private': community.is_private,
+        'owner_id': community.owner_id,
+        'owner': owners.get(community.owner_id),
+        'members_count': community.members_count or 0,
+        'created_at': _isoformat(community.created_at)
+    } for community in communities]
+
+def serialize_events(events, related=True):
+    """Serializar eventos com criador e comunidade em lote"""
+    creators = _related(serialize_users, User, [e.creator_id for e in events]) if related else {}
+    communities = _related(serialize_communities, Community, [e.community_id for e in events]) if related else {}
+
+    return [{
+        'id': event.id,
+        'title': event.title,
+        'description': event.description,
+        'banner_url': event.banner_url,
+        'start_date': _isoformat(event.start_date),
+        'end_date': _isoformat(event.end_date),
+        'location': event.location,
+        'is_online': event.is_online,
+        'max_participants': event.max_participants,
+        'creator_id': event.creator_id,
+        'creator': creators.get(event.creator_id),
+        'community_id': event.community_id,
+        'community': communities.get(event.community_id),
+        'participants_count': event.participants_count or 0,
+        'created_at': _isoformat(event.created_at)
+    } for event in events]
+
+def serialize_posts(posts, related=True):
+    """Serializar posts com autor e comunidade em lote"""
+    authors = _related(serialize_users, User, [p.author_id for p in posts]) if related else {}
+    communities = _related(serialize_communities, Community, [p.community_id for p in posts]) if related else {}
+
+    return [{
+        'id': post.id,
+        'content': post.content,
+        'image_url': post.image_url,
+        'author_id': post.author_id,
+        'author': authors.get(post.author_id),
+        'community_id': post.community_id,
+        'community': communities.get(post.community_id),
+        'likes_count': post.likes_count or 0,
+        'comments_count': post.comments_count or 0,
+        'created_at': _isoformat(post.created_at)
+    } for post in posts]
+
+def cached_users(ids):
+    """Usuários serializados por ID a partir do cache de cada um ('user:<id>')"""
+    users = cache.cached_many('user', ids, lambda missing: _related(serialize_users, User, missing))
+    # A presença muda a cada conexão e não entra no cache
+    online = presence.online_among(users)
+    for user in users.values():
+        user['is_online'] = user['id'] in online
+    return users
+
+def cached_communities(ids):
+    """Comunidades serializadas por ID a partir do cache de cada uma, com o dono"""
+    communities = cache.cached_many('community', ids, lambda missing: {
+        data['id']: data for data in serialize_communities(
+            list(_load_by_id(Community, missing).values()), related=False
+        )
+    })
+    embed_community_related(communities.values())
+    return communities
+
+def embed_community_related(communities):
+    """Preencher o dono de comunidades serializadas com related=False"""
+    communities = list(communities)
+    owners = cached_users(c['owner_id'] for c in communities)
+    for community in communities:
+        community['owner'] = owners.get(community['owner_id'])
+    return communities
+
+def embed_event_related(events):
+    """Preencher criador e comunidade de eventos serializados com related=False"""
+    creators = cached_users(e['creator_id'] for e in events)
+    communities = cached_communities(e['community_id'] for e in events)
+    for event in events:
+        event['creator'] = creators.get(event['creator_id'])
+        event['community'] = communities.get(event['community_id'])
+    return events
+
+def embed_post_related(posts):
+    """Preencher autor e comunidade de posts serializados com related=False"""
+    authors = cached_users(p['author_id'] for p in posts)
+    communities = cached_communities(p['community_id'] for p in posts)
+    for post in posts:
+        post['author'] = authors.get(post['author_id'])
+        post['community'] = communities.get(post['community_id'])
+    return posts
+
+def serialize_comments(comments):
+    """Serializar comentários com autores em lote"""
+    authors = _related(serialize_users, User, [c.author_id for c in comments])
+
+    return [{
+        'id': comment.id,
+        'content': comment.content,
+        'author_id': comment.author_id,
+        'author': authors.get(comment.author_id),
+        'post_id': comment.post_id,
+        'created_at': _isoformat(comment.created_at)
+    } for comment in comments]
+
+def serialize_messages(messages):
+    """Serializar mensagens com remetente e destinatário em lote"""
+    users = _related(
+        serialize_users, User,
+        [m.sender_id for m in messages] + [m.receiver_id for m in messages]
+    )
+
+    return [{
+        'id': message.id,
+        'content': message.content,
+        'sender_id': message.sender_id,
+        'sender': users.get(message.sender_id),
+        'receiver_id': message.receiver_id,
+        'receiver': users.get(message.receiver_id),
+        'community_id': message.community_id,
+        'event_id': message.event_id,
+        'message_type': message.message_type,
+        'is_read': message.is_read,
+        'created_at': _isoformat(message.created_at)
+    } for message in messages]
+
+def serialize_conversations(rows):
+    """Serializar linhas (Conversation, última Message) do resumo
+
+    last_message mantém o formato de serialize_messages, com remetente e
+    destinatário carregados em lote.
+    """
+    last_messages = [message for _, message in rows if message is not None]
+    serialized = dict(zip((m.id for m in last_messages), serialize_messages(last_messages)))
+    return [{
+        'type': 'direct',
+        'id': conversation.partner_id,
+        'name': conversation.partner_name,
+        'avatar': conversation.partner_avatar,
+        'last_message': serialized.get(conversation.last_message_id),
+        'last_message_at': _isoformat(conversation.last_message_at),
+        'unread_count': conversation.unread_count
+    } for conversation, message in rows]
+
+def serialize_notifications(notifications):
+    """Serializar notificações, montando o texto dos grupos com o ator mais recente"""
+    actors = {n.id: recent_actor_ids(n) for n in notifications}
+    grouped = {
+        n.id: actors[n.id][0] for n in notifications
+        if (n.actor_count or 1) > 1 and n.notification_type in AGGREGATED_TYPES and actors[n.id]
+    }
+    names = {
+        user.id: user.display_name or user.username
+        for user in _load_by_id(User, grouped.values()).values()
+    }
+
+    def content(notification):
+        if grouped.get(notification.id) in names:
+            return render_content(notification, names[grouped[notification.id]])
+        return notification.content
+
+    return [{
+        'id': notification.id,
+        'user_id': notification.user_id,
+        'title': notification.title,
+        'content': content(notification),
+        'notification_type': notification.notification_type,
+        'related_id': notification.related_id,
+        'actor_count': notification.actor_count or 1,
+        'actor_ids': actors[notification.id],
+        'is_read': notification.is_read,
+        'created_at': _isoformat(notification.created_at)
+    } for notification in notifications]
@@ -0,0 +1,151 @@
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import select
+from src.models.user import db, User, FollowSuggestion, user_follows
+from src.models.follow_graph import follow_graph
+
+# Sugestões de quem seguir (amigos de amigos). Calculadas em lote pelo job
+# compute_suggestions e gravadas em follow_suggestion; o endpoint só lê.
+#
+# Com A sendo a matriz de adjacência (A[u, x] = 1 se u segue x), (A @ A)[u, v]
+# conta quantos usuários seguidos por u seguem v. Tirando quem u já segue e o
+# próprio u, os maiores valores de cada linha são as sugestões. O cálculo usa
+# matrizes esparsas do SciPy em blocos de linhas; sem numpy/scipy instalados
+# (requirements-optional.txt) cai para uma implementação em Python puro
+# (correta, mas bem mais lenta).
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+TOP_N = 20  # sugestões guardadas por usuário
+BLOCK_SIZE = 2000  # linhas da matriz processadas por vez
+LOAD_BATCH_SIZE = 50000
+
+def load_edges():
+    """Ler todos os follows como (follower_ids, followed_ids)"""
+    result = db.session.execute(
+        select(user_follows.c.follower_id, user_follows.c.followed_id)
+        .execution_options(yield_per=LOAD_BATCH_SIZE)
+    )
+    if np is None:
+        followers, followed = [], []
+        for rows in result.partitions():
+            for follower_id, followed_id in rows:
+                followers.append(follower_id)
+                followed.append(followed_id)
+        return followers, followed
+
+    chunks = [np.array(rows, dtype=np.int64) for rows in result.partitions()]
+    if not chunks:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    edges = np.concatenate(chunks)
+    return edges[:, 0], edges[:, 1]
+
+def _compute_sparse(followers, followed, top_n, block_size):
+    ids, positions = np.unique(np.concatenate([followers, followed]), return_inverse=True)
+    src, dst = positions[:len(followers)], positions[len(followers):]
+    n = len(ids)
+    adjacency = sparse.csr_matrix(
+        (np.ones(len(src), dtype=np.int32), (src, dst)), shape=(n, n)
+    )
+
+    for start in range(0, n, block_size):
+        rows = np.arange(start, min(start + block_size, n))
+        block = adjacency[rows]
+        paths = (block @ adjacency).tocsr()
+
+        # Tirar quem já é seguido e o próprio usuário
+        own = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (np.arange(len(rows)), rows)), shape=block.shape
+        )
+        paths = paths - paths.multiply((block + own) > 0)
+        paths.eliminate_zeros()
+
+        # Top-N de cada linha: ordenar por (linha, -contagem, id) e cortar pela posição na linha
+        row_of = np.repeat(np.arange(len(rows)), np.diff(paths.indptr))
+        order = np.lexsort((paths.indices, -paths.data, row_of))
+        rank = np.arange(len(order)) - paths.indptr[row_of[order]]
+        keep = order[rank < top_n]
+
+        triples = zip(
+            ids[rows[row_of[keep]]].tolist(),
+            ids[paths.indices[keep]].tolist(),
+            paths.data[keep].tolist()
+        )
+        yield ids[rows].tolist(), list(triples)
+
+def _compute_python(followers, followed, top_n, block_size):
+    following = {}
+    for follower_id, followed_id in zip(followers, followed):
+        following.setdefault(follower_id, set()).add(followed_id)
+    users = sorted(set(followers) | set(followed))
+
+    for start in range(0, len(users), block_size):
+        block = users[start:start + block_size]
+        triples = []
+        for user_id in block:
+            mine = following.get(user_id, set())
+            counts = Counter()
+            for friend_id in mine:
+                counts.update(following.get(friend_id, ()))
+            for excluded in mine | {user_id}:
+                counts.pop(excluded, None)
+            best = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:top_n]
+            triples.extend((user_id, suggested_id, mutual) for suggested_id, mutual in best)
+        yield block, triples
+
+def compute(followers, followed, top_n=TOP_N, block_size=BLOCK_SIZE):
+    """Gerar (ids do bloco, [(user_id, suggested_id, mutual_count)]) por bloco de usuários"""
+    if sparse is None:
+        return _compute_python(followers, followed, top_n, block_size)
+    return _compute_sparse(np.asarray(followers), np.asarray(followed), top_n, block_size)
+
+def compute_suggestions(top_n=TOP_N, block_size=BLOCK_SIZE):
+    """Recalcular e gravar as sugestões de todos os usuários"""
+    started = datetime.utcnow()
+    followers, followed = load_edges()
+    table = FollowSuggestion.__table__
+
+    users = total = 0
+    for block_users, triples in compute(followers, followed, top_n, block_size):
+        db.session.execute(table.delete().where(table.c.user_id.in_(block_users)))
+        if triples:
+            db.session.execute(table.insert(), [{
+                'user_id': user_id,
+                'suggested_id': suggested_id,
+                'mutual_count': mutual,
+                'computed_at': started
+            } for user_id, suggested_id, mutual in triples])
+        db.session.commit()
+        users += len(block_users)
+        total += len(triples)
+
+    # Usuários que saíram do grafo desde o último cálculo
+    db.session.execute(table.delete().where(table.c.computed_at < started))
+    db.session.commit()
+
+    return {'users': users, 'suggestions': total}
+
+def suggestions_for(user_id, limit=10):
+    """[(User, mutual_count)] para o usuário, sem quem ele já passou a seguir
+
+    Sem sugestões calculadas (usuário novo) cai para os usuários mais seguidos.
+    """
+    candidates = db.session.query(FollowSuggestion.suggested_id, FollowSuggestion.mutual_count).filter(
+        FollowSuggestion.user_id == user_id
+    ).order_by(FollowSuggestion.mutual_count.desc(), FollowSuggestion.suggested_id).limit(limit * 2).all()
+
+    if not candidates:
+        popular = db.session.query(User.id).filter(User.id != user_id).order_by(
+            User.followers_count.desc()
+        ).limit(limit * 3).all()
+        candidates = [(row[0], 0) for row in popular]
+
+    followed = follow_graph.following_among(user_id, [suggested_id for suggested_id, _ in candidates])
+    candidates = [(s, m) for s, m in candidates if s not in followed and s != user_id][:limit]
+
+    users = {user.id: user for user in User.query.filter(User.id.in_([s for s, _ in candidates])).all()}
+    return [(users[s], m) for s, m in candidates if s in users]
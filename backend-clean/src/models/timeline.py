@@ -0,0 +1,140 @@
+from sqlalchemy import and_, delete, func, insert, literal, or_, select
+from src.models.user import db, insert_ignore, Post, User, TimelineEntry, user_follows
+from src.models.pagination import encode_cursor, keyset_paginate
+
+# Home timeline com fan-out na escrita: ao criar um post, o ID é copiado para a
+# timeline de cada seguidor com um único INSERT ... SELECT. Autores com muitos
+# seguidores (acima de FANOUT_THRESHOLD) não fazem fan-out; seus posts são
+# mesclados na leitura (fan-out na leitura).
+#
+# O fan-out de um post e o backfill de um follow feito ao mesmo tempo podem
+# entregar a mesma entrada; os dois usam insert_ignore, então quem grava
+# depois só pula a linha em vez de falhar a requisição.
+
+TIMELINE_SIZE = 800  # Máximo de entradas mantidas por usuário
+FANOUT_THRESHOLD = 5000  # Seguidores a partir dos quais o autor passa a fan-out na leitura
+FOLLOW_BACKFILL = 50  # Posts recentes copiados ao seguir alguém
+
+def is_high_fanout(user):
+    return (user.followers_count or 0) > FANOUT_THRESHOLD
+
+def fan_out_post(post):
+    """Entregar um post recém-criado às timelines do autor e dos seguidores"""
+    db.session.execute(insert(TimelineEntry).values(
+        user_id=post.author_id, post_id=post.id, created_at=post.created_at
+    ))
+    
+    if is_high_fanout(post.author):
+        return
+    
+    db.session.execute(insert_ignore(TimelineEntry.__table__).from_select(
+        ['user_id', 'post_id', 'created_at'],
+        select(user_follows.c.follower_id, literal(post.id), literal(post.created_at))
+        .where(user_follows.c.followed_id == post.author_id)
+    ))
+
+def backfill_author(follower_id, author):
+    """Copiar os posts recentes de um autor recém-seguido para a timeline"""
+    if is_high_fanout(author):
+        return
+    
+    recent = (
+        select(literal(follower_id), Post.id, Post.created_at)
+        .where(Post.author_id == author.id)
+        .order_by(Post.created_at.desc())
+        .limit(FOLLOW_BACKFILL)
+    )
+    db.session.execute(insert_ignore(TimelineEntry.__table__).from_select(
+        ['user_id', 'post_id', 'created_at'], recent
+    ))
+
+def remove_author(follower_id, author_id):
+    """Remover da timeline os posts de um autor que deixou de ser seguido"""
+    db.session.execute(delete(TimelineEntry).where(
+        TimelineEntry.user_id == follower_id,
+        TimelineEntry.post_id.in_(select(Post.id).where(Post.author_id == author_id))
+    ))
+
+def remove_post(post_id):
+    """Remover um post de todas as timelines"""
+    db.session.execute(delete(TimelineEntry).where(TimelineEntry.post_id == post_id))
+
+def trim_timeline(user_id):
+    """Manter apenas as TIMELINE_SIZE entradas mais recentes do usuário (sem commit)
+
+    O corte segue a ordem da leitura, (created_at, post_id): entradas com a
+    mesma data da última mantida não são removidas junto. Retorna quantas saíram.
+    """
+    cutoff = db.session.query(TimelineEntry.created_at, TimelineEntry.post_id).filter(
+        TimelineEntry.user_id == user_id
+    ).order_by(TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc()).offset(TIMELINE_SIZE).first()
+    
+    if cutoff is None:
+        return 0
+    created_at, post_id = cutoff
+    return db.session.execute(delete(TimelineEntry).where(
+        TimelineEntry.user_id == user_id,
+        or_(
+            TimelineEntry.created_at < created_at,
+            and_(TimelineEntry.created_at == created_at, TimelineEntry.post_id <= post_id)
+        )
+    )).rowcount
+
+def trim_timelines(batch_size=1000):
+    """Passe periódico: aparar as timelines acima de TIMELINE_SIZE, em faixas de usuários
+
+    O fan-out escreve nas timelines de quem não abre o feed; sem este passe
+    elas cresceriam sem limite. Retorna quantas entradas foram removidas.
+    """
+    max_id = db.session.query(func.max(User.id)).scalar() or 0
+    total = 0
+    for start in range(0, max_id + 1, batch_size):
+        over = db.session.query(TimelineEntry.user_id).filter(
+            TimelineEntry.user_id >= start,
+            TimelineEntry.user_id < start + batch_size
+        ).group_by(TimelineEntry.user_id).having(func.count() > TIMELINE_SIZE).all()
+        for (user_id,) in over:
+            total += trim_timeline(user_id)
+        db.session.commit()
+    return total
+
+def home_timeline(user_id, cursor=None, per_page=20):
+    """Ler a home timeline: entradas materializadas + posts de autores grandes
+
+    Retorna (posts em ordem, next_cursor).
+    """
+    entries, entries_cursor = keyset_paginate(
+        TimelineEntry.query.filter(TimelineEntry.user_id == user_id),
+        TimelineEntry.created_at, TimelineEntry.post_id, cursor, per_page,
+        key=lambda entry: (entry.created_at, entry.post_id)
+    )
+    candidates = [(entry.created_at, entry.post_id) for entry in entries]
+    has_more = entries_cursor is not None
+    
+    # Fan-out na leitura para autores seguidos acima do limite
+    high_fanout_ids = select(User.id).join(
+        user_follows, User.id == user_follows.c.followed_id
+    ).where(
+        user_follows.c.follower_id == user_id,
+        User.followers_count > FANOUT_THRESHOLD
+    )
+    merged_posts, merged_cursor = keyset_paginate(
+        Post.query.filter(Post.author_id.in_(high_fanout_ids)),
+        Post.created_at, Post.id, cursor, per_page
+    )
+    candidates += [(post.created_at, post.id) for post in merged_posts]
+    has_more = has_more or merged_cursor is not None
+    
+    # Mesclar por (created_at, id) desc, sem duplicatas (autor que cruzou o limite)
+    page, seen = [], set()
+    for created_at, post_id in sorted(candidates, reverse=True):
+        if post_id not in seen:
+            seen.add(post_id)
+            page.append((created_at, post_id))
+    
+    has_more = has_more or len(page) > per_page
+    page = page[:per_page]
+    next_cursor = encode_cursor(*page[-1]) if has_more and page else None
+    
+    posts = {p.id: p for p in Post.query.filter(Post.id.in_([pid for _, pid in page])).all()} if page else {}
+    return [posts[pid] for _, pid in page if pid in posts], next_cursor
@@ -0,0 +1,89 @@
+import threading
+import time
+
+# Indicador "digitando..." agregado no servidor. O cliente manda 'typing' a
+# cada tecla; aqui cada (usuário, sala) vira no máximo um 'user_typing' com
+# typing=True a cada THROTTLE segundos, e um typing=False quando o usuário
+# para (evento explícito, desconexão ou DEBOUNCE segundos sem teclas). Não há
+# acesso ao banco: os dados do usuário vêm da sessão do Socket.IO.
+
+THROTTLE = 3.0  # segundos entre repetições de typing=True na mesma sala
+DEBOUNCE = 5.0  # segundos sem teclas até considerar que o usuário parou
+SWEEP_INTERVAL = 1.0
+
+class TypingIndicators:
+
+    def __init__(self):
+        self.app = None
+        self.socketio = None
+        self._active = {}  # (user_id, sala) -> [sid, dados do usuário, último emit, última tecla]
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    def init_app(self, app, socketio):
+        self.app = app
+        self.socketio = socketio
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(target=self._run, daemon=True)
+            self._sweeper.start()
+
+    def _run(self):
+        while True:
+            time.sleep(SWEEP_INTERVAL)
+            try:
+                self.sweep()
+            except Exception:
+                self.app.logger.exception('Erro ao expirar indicadores de digitação')
+
+    def _emit(self, room, sid, user, typing):
+        self.socketio.emit('user_typing', {
+            'user_id': user['id'],
+            'username': user['username'],
+            'display_name': user['display_name'],
+            'avatar_url': user['avatar_url'],
+            'typing': typing
+        }, room=room, skip_sid=sid)
+
+    def typing(self, user, room, sid, is_typing):
+        """Registrar um evento 'typing' da conexão `sid` em `room`"""
+        key = (user['id'], room)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._active.get(key)
+            if not is_typing:
+                if entry is None:
+                    return
+                del self._active[key]
+            elif entry is None or now - entry[2] >= THROTTLE:
+                self._active[key] = [sid, user, now, now]
+            else:
+                entry[3] = now
+                return
+
+        if is_typing:
+            self._ensure_sweeper()
+        self._emit(room, sid, user, bool(is_typing))
+
+    def stop_all(self, sid):
+        """Encerrar os indicadores de uma conexão que caiu"""
+        with self._lock:
+            stopped = [(key, entry) for key, entry in self._active.items() if entry[0] == sid]
+            for key, _ in stopped:
+                del self._active[key]
+        for (_, room), entry in stopped:
+            self._emit(room, sid, entry[1], False)
+
+    def sweep(self):
+        """Enviar typing=False para quem parou de digitar há DEBOUNCE segundos"""
+        cutoff = time.monotonic() - DEBOUNCE
+        with self._lock:
+            expired = [(key, entry) for key, entry in self._active.items() if entry[3] < cutoff]
+            for key, _ in expired:
+                del self._active[key]
+        for (_, room), entry in expired:
+            self._emit(room, entry[0], entry[1], False)
+        return len(expired)
+
+typing_indicators = TypingIndicators()
@@ -0,0 +1,73 @@
+from sqlalchemy import func
+from src.models.user import db, Notification, User
+from src import cache
+
+# Contadores de notificações não lidas por usuário guardados no backend de
+# cache. (As não lidas de cada conversa direta ficam na tabela conversation,
+# ver src/models/conversations.py.) Os handlers ajustam os valores a
+# cada inserção e leitura; quando a chave não está em cache (primeiro acesso,
+# expirou, foi despejada) a contagem vem do banco e é guardada de novo.
+# Ajustes em chaves ausentes são ignorados, então um valor parcial nunca é
+# criado; o TTL e o job reconcile_unread corrigem qualquer desvio.
+
+COUNT_TTL = 600  # segundos até a contagem ser relida do banco
+RECONCILE_BATCH_SIZE = 1000
+
+def _notifications_key(user_id):
+    return f'unread:notifications:{user_id}'
+
+def _store(key, value):
+    cache.backend.set(key, value, ttl=COUNT_TTL)
+
+def _adjust(key, delta):
+    if delta:
+        cache.backend.add(key, delta)
+
+def notification_count(user_id):
+    """Notificações não lidas do usuário"""
+    key = _notifications_key(user_id)
+    value = cache.backend.get(key)
+    if value is None:
+        value = Notification.query.filter_by(user_id=user_id, is_read=False).count()
+        _store(key, value)
+    return max(int(value), 0)
+
+def notifications_added(user_id, delta=1):
+    _adjust(_notifications_key(user_id), delta)
+
+def notifications_added_many(user_ids, delta=1):
+    """Ajustar vários usuários de uma vez (fan-out do outbox)"""
+    cache.backend.add_many([_notifications_key(user_id) for user_id in user_ids], delta)
+
+def notifications_read(user_id, count=1):
+    _adjust(_notifications_key(user_id), -count)
+
+def notifications_all_read(user_id):
+    _store(_notifications_key(user_id), 0)
+
+def reconcile(batch_size=RECONCILE_BATCH_SIZE):
+    """Regravar as contagens a partir do banco, em lotes de usuários; retorna quantas
+
+    Útil com o backend compartilhado (CACHE_REDIS_URL); no cache local de cada
+    worker o TTL cumpre esse papel.
+    """
+    fixed = 0
+    last_id = 0
+    while True:
+        user_ids = [row[0] for row in db.session.query(User.id).filter(User.id > last_id)
+                    .order_by(User.id).limit(batch_size).all()]
+        if not user_ids:
+            break
+
+        notifications = dict(
+            db.session.query(Notification.user_id, func.count(Notification.id))
+            .filter(Notification.user_id.in_(user_ids), Notification.is_read == False)
+            .group_by(Notification.user_id).all()
+        )
+        for user_id in user_ids:
+            _store(_notifications_key(user_id), notifications.get(user_id, 0))
+        fixed += len(user_ids)
+
+        db.session.commit()
+        last_id = user_ids[-1]
+    return fixed
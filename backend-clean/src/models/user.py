@@ -4,26 +4,44 @@ from werkzeug.security import generate_password_hash, check_password_hash
 
 db = SQLAlchemy()
 
+def insert_ignore(table):
+    """INSERT que pula linhas cuja chave primária já existe (SQLite e Postgres)"""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table).on_conflict_do_nothing()
+
 # Tabela de associação para membros de comunidades
 community_members = db.Table('community_members',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
     db.Column('community_id', db.Integer, db.ForeignKey('community.id'), primary_key=True),
     db.Column('role', db.String(20), default='member'),  # member, moderator, admin
-    db.Column('joined_at', db.DateTime, default=datetime.utcnow)
+    db.Column('joined_at', db.DateTime, default=datetime.utcnow),
+    db.Index('ix_community_members_community_user', 'community_id', 'user_id')
 )
 
 # Tabela de associação para participantes de eventos
 event_participants = db.Table('event_participants',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
     db.Column('event_id', db.Integer, db.ForeignKey('event.id'), primary_key=True),
-    db.Column('joined_at', db.DateTime, default=datetime.utcnow)
+    db.Column('joined_at', db.DateTime, default=datetime.utcnow),
+    db.Index('ix_event_participants_event_user', 'event_id', 'user_id')
 )
 
 # Tabela de associação para follows
 user_follows = db.Table('user_follows',
     db.Column('follower_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
     db.Column('followed_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('created_at', db.DateTime, default=datetime.utcnow)
+    db.Column('created_at', db.DateTime, default=datetime.utcnow),
+    # A chave primária (follower_id, followed_id) já cobre buscas por follower_id
+    db.Index('ix_user_follows_followed', 'followed_id', 'follower_id')
+)
+
+# Atores distintos de cada grupo de notificações (ver notification_groups.py)
+notification_actors = db.Table('notification_actors',
+    db.Column('notification_id', db.Integer, db.ForeignKey('notification.id'), primary_key=True),
+    db.Column('actor_id', db.Integer, primary_key=True)
 )
 
 class User(db.Model):
@@ -39,6 +57,10 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Contadores denormalizados (mantidos em src/models/counters.py)
+    followers_count = db.Column(db.Integer, default=0, nullable=False)
+    following_count = db.Column(db.Integer, default=0, nullable=False)
+    
     # Relacionamentos
     posts = db.relationship('Post', backref='author', lazy=True, cascade='all, delete-orphan')
     comments = db.relationship('Comment', backref='author', lazy=True, cascade='all, delete-orphan')
@@ -59,6 +81,8 @@ class User(db.Model):
                                secondaryjoin=id == user_follows.c.followed_id,
                                backref='followers')
 
+    __table_args__ = (db.Index('ix_user_followers_count', 'followers_count'),)
+
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
 
@@ -66,19 +90,8 @@ class User(db.Model):
         return check_password_hash(self.password_hash, password)
 
     def to_dict(self):
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'display_name': self.display_name,
-            'bio': self.bio,
-            'avatar_url': self.avatar_url,
-            'is_online': self.is_online,
-            'last_seen': self.last_seen.isoformat() if self.last_seen else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'followers_count': len(self.followers),
-            'following_count': len(self.following)
-        }
+        from src.models.serializers import serialize_users
+        return serialize_users([self])[0]
 
 class Community(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -91,24 +104,17 @@ class Community(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Contador denormalizado
+    members_count = db.Column(db.Integer, default=0, nullable=False)
+    
     # Relacionamentos
     posts = db.relationship('Post', backref='community', lazy=True, cascade='all, delete-orphan')
     events = db.relationship('Event', backref='community', lazy=True, cascade='all, delete-orphan')
     messages = db.relationship('Message', backref='community', lazy=True, cascade='all, delete-orphan')
 
     def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'description': self.description,
-            'banner_url': self.banner_url,
-            'avatar_url': self.avatar_url,
-            'is_private': self.is_private,
-            'owner_id': self.owner_id,
-            'owner': self.owner.to_dict() if self.owner else None,
-            'members_count': len(self.members),
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        from src.models.serializers import serialize_communities
+        return serialize_communities([self])[0]
 
 class Event(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -125,27 +131,17 @@ class Event(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Contador denormalizado
+    participants_count = db.Column(db.Integer, default=0, nullable=False)
+    
     # Relacionamentos
     messages = db.relationship('Message', backref='event', lazy=True, cascade='all, delete-orphan')
 
+    __table_args__ = (db.Index('ix_event_start_date', 'start_date'),)
+
     def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'banner_url': self.banner_url,
-            'start_date': self.start_date.isoformat() if self.start_date else None,
-            'end_date': self.end_date.isoformat() if self.end_date else None,
-            'location': self.location,
-            'is_online': self.is_online,
-            'max_participants': self.max_participants,
-            'creator_id': self.creator_id,
-            'creator': self.creator.to_dict() if self.creator else None,
-            'community_id': self.community_id,
-            'community': self.community.to_dict() if self.community else None,
-            'participants_count': len(self.participants),
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        from src.models.serializers import serialize_events
+        return serialize_events([self])[0]
 
 class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -156,23 +152,29 @@ class Post(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Contadores denormalizados
+    likes_count = db.Column(db.Integer, default=0, nullable=False)
+    comments_count = db.Column(db.Integer, default=0, nullable=False)
+    
+    # Pontuação "hot" pré-calculada (ver src/models/ranking.py)
+    hot_score = db.Column(db.Float, default=0.0, nullable=False)
+    
     # Relacionamentos
     comments = db.relationship('Comment', backref='post', lazy=True, cascade='all, delete-orphan')
     likes = db.relationship('Like', backref='post', lazy=True, cascade='all, delete-orphan')
 
+    __table_args__ = (
+        db.Index('ix_post_created_at', 'created_at'),
+        db.Index('ix_post_community_created', 'community_id', 'created_at'),
+        db.Index('ix_post_author_created', 'author_id', 'created_at'),
+        db.Index('ix_post_hot_score', 'hot_score'),
+        db.Index('ix_post_community_hot', 'community_id', 'hot_score'),
+        db.Index('ix_post_likes_count', 'likes_count'),
+    )
+
     def to_dict(self):
-        return {
-            'id': self.id,
-            'content': self.content,
-            'image_url': self.image_url,
-            'author_id': self.author_id,
-            'author': self.author.to_dict() if self.author else None,
-            'community_id': self.community_id,
-            'community': self.community.to_dict() if self.community else None,
-            'likes_count': len(self.likes),
-            'comments_count': len(self.comments),
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        from src.models.serializers import serialize_posts
+        return serialize_posts([self])[0]
 
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -182,15 +184,11 @@ class Comment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (db.Index('ix_comment_post_created', 'post_id', 'created_at'),)
+
     def to_dict(self):
-        return {
-            'id': self.id,
-            'content': self.content,
-            'author_id': self.author_id,
-            'author': self.author.to_dict() if self.author else None,
-            'post_id': self.post_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        from src.models.serializers import serialize_comments
+        return serialize_comments([self])[0]
 
 class Like(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -198,10 +196,14 @@ class Like(db.Model):
     post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    __table_args__ = (db.UniqueConstraint('user_id', 'post_id', name='unique_user_post_like'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'post_id', name='unique_user_post_like'),
+        db.Index('ix_like_post', 'post_id'),
+    )
 
 class Message(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
+    # IDs gerados pela aplicação (ver src/models/message_writer.py); BIGINT no Postgres
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=False)
     content = db.Column(db.Text, nullable=False)
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     receiver_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # Para mensagens diretas
@@ -211,20 +213,32 @@ class Message(db.Model):
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Histórico e sync paginam pelo ID, que cresce com o tempo
+        db.Index('ix_message_pair_id', 'sender_id', 'receiver_id', 'id'),
+        db.Index('ix_message_community_id', 'community_id', 'id'),
+        db.Index('ix_message_event_id', 'event_id', 'id'),
+    )
+
     def to_dict(self):
-        return {
-            'id': self.id,
-            'content': self.content,
-            'sender_id': self.sender_id,
-            'sender': self.sender.to_dict() if self.sender else None,
-            'receiver_id': self.receiver_id,
-            'receiver': self.receiver.to_dict() if self.receiver else None,
-            'community_id': self.community_id,
-            'event_id': self.event_id,
-            'message_type': self.message_type,
-            'is_read': self.is_read,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        from src.models.serializers import serialize_messages
+        return serialize_messages([self])[0]
+
+class Conversation(db.Model):
+    # Resumo de cada conversa direta, uma linha por lado (ver src/models/conversations.py)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    partner_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    last_message_id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), nullable=False)
+    last_message_at = db.Column(db.DateTime, nullable=False)
+    unread_count = db.Column(db.Integer, default=0, nullable=False)  # Mensagens do parceiro não lidas
+    last_read_id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), default=0, nullable=False)  # Lidas até este ID
+    partner_name = db.Column(db.String(100))
+    partner_avatar = db.Column(db.String(255))
+
+    __table_args__ = (
+        db.Index('ix_conversation_user_recent', 'user_id', 'last_message_id', 'partner_id'),
+        db.Index('ix_conversation_partner', 'partner_id'),
+    )
 
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -236,18 +250,83 @@ class Notification(db.Model):
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Agregação (ver src/models/notification_groups.py)
+    actor_count = db.Column(db.Integer, default=1, nullable=False)  # Atores distintos (notification_actors)
+    actor_ids = db.Column(db.Text)  # JSON com os IDs dos atores mais recentes
+    bucket = db.Column(db.Integer)  # Janela de agrupamento; NULL = não agregável
+    
     # Relacionamento
     user = db.relationship('User', backref='notifications')
 
+    __table_args__ = (
+        db.Index('ix_notification_user_read_created', 'user_id', 'is_read', 'created_at'),
+        db.Index('ix_notification_user_created', 'user_id', 'created_at'),
+        db.Index('ix_notification_group', 'user_id', 'notification_type', 'related_id', 'bucket'),
+    )
+
     def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'title': self.title,
-            'content': self.content,
-            'notification_type': self.notification_type,
-            'related_id': self.related_id,
-            'is_read': self.is_read,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        from src.models.serializers import serialize_notifications
+        return serialize_notifications([self])[0]
+
+
+class TimelineEntry(db.Model):
+    # Timeline materializada: IDs de posts entregues a cada seguidor (fan-out na escrita)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False)  # Data do post, para ordenar sem JOIN
+
+    __table_args__ = (
+        db.Index('ix_timeline_user_created', 'user_id', 'created_at', 'post_id'),
+        db.Index('ix_timeline_post', 'post_id'),
+    )
+
+
+class FollowSuggestion(db.Model):
+    # Sugestões de quem seguir pré-calculadas pelo job compute_suggestions
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    suggested_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    mutual_count = db.Column(db.Integer, nullable=False)  # Quantos seguidos do usuário seguem a sugestão
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_follow_suggestion_user_mutual', 'user_id', 'mutual_count'),
+        db.Index('ix_follow_suggestion_computed', 'computed_at'),
+    )
+
+
+class NotificationOutbox(db.Model):
+    # Intenções de notificação gravadas na transação do handler e entregues
+    # pelo worker de src/models/outbox.py
+    id = db.Column(db.Integer, primary_key=True)
+    audience = db.Column(db.String(20), nullable=False)  # user, community, event, followers
+    audience_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    content = db.Column(db.Text)
+    notification_type = db.Column(db.String(50))
+    related_id = db.Column(db.Integer)
+    actor_id = db.Column(db.Integer)  # Não recebe a própria notificação
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Controle de entrega
+    last_recipient_id = db.Column(db.Integer, default=0, nullable=False)  # Progresso do fan-out
+    delivered_count = db.Column(db.Integer, default=0, nullable=False)
+    locked_until = db.Column(db.DateTime)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text)
+    processed_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index('ix_notification_outbox_pending', 'processed_at', 'id'),)
+
+
+class NotificationArchive(db.Model):
+    # Notificações removidas pela retenção: um lote por usuário, JSON comprimido com zlib
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    policy = db.Column(db.String(50), nullable=False)  # Política que moveu as linhas
+    notification_count = db.Column(db.Integer, nullable=False)
+    oldest_at = db.Column(db.DateTime)
+    newest_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    payload = db.Column(db.LargeBinary, nullable=False)
 
+    __table_args__ = (db.Index('ix_notification_archive_user', 'user_id', 'archived_at'),)
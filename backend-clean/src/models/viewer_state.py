@@ -0,0 +1,61 @@
+from src.models.user import db, Like, community_members
+from src.models.follow_graph import follow_graph
+
+# Estado do visitante (curtiu, segue, é membro) resolvido para uma página
+# inteira com uma consulta IN (...) por relação; follows vêm do grafo em
+# memória. Trabalha sobre os dicts já serializados, então pode ser aplicado
+# depois de um acerto de cache.
+
+def _matching(column, viewer_column, viewer_id, ids):
+    """IDs de `ids` que têm uma linha associada ao visitante"""
+    ids = list({i for i in ids if i is not None})
+    if not viewer_id or not ids:
+        return set()
+    rows = db.session.query(column).filter(viewer_column == viewer_id, column.in_(ids)).all()
+    return {row[0] for row in rows}
+
+def liked_post_ids(viewer_id, post_ids):
+    return _matching(Like.post_id, Like.user_id, viewer_id, post_ids)
+
+def followed_user_ids(viewer_id, user_ids):
+    # Resolvido pelo grafo de follows em memória, sem consulta por página
+    return follow_graph.following_among(viewer_id, user_ids)
+
+def member_community_ids(viewer_id, community_ids):
+    return _matching(community_members.c.community_id, community_members.c.user_id, viewer_id, community_ids)
+
+def decorate_posts(viewer_id, posts):
+    """Adicionar user_liked, following_author e member_of_community aos posts"""
+    liked = liked_post_ids(viewer_id, [p['id'] for p in posts])
+    following = followed_user_ids(viewer_id, [p['author_id'] for p in posts])
+    member = member_community_ids(viewer_id, [p['community_id'] for p in posts])
+
+    for post in posts:
+        post['user_liked'] = post['id'] in liked
+        post['following_author'] = post['author_id'] in following
+        post['member_of_community'] = post['community_id'] in member
+    return posts
+
+def decorate_comments(viewer_id, comments):
+    """Adicionar following_author aos comentários"""
+    following = followed_user_ids(viewer_id, [c['author_id'] for c in comments])
+
+    for comment in comments:
+        comment['following_author'] = comment['author_id'] in following
+    return comments
+
+def decorate_communities(viewer_id, communities):
+    """Adicionar is_member às comunidades"""
+    member = member_community_ids(viewer_id, [c['id'] for c in communities])
+
+    for community in communities:
+        community['is_member'] = community['id'] in member
+    return communities
+
+def decorate_users(viewer_id, users):
+    """Adicionar is_following a listas de usuários"""
+    following = followed_user_ids(viewer_id, [u['id'] for u in users])
+
+    for user in users:
+        user['is_following'] = user['id'] in following
+    return users
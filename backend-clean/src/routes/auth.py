@@ -4,6 +4,11 @@ from datetime import datetime
 
 # CORREÇÃO APLICADA AQUI: trocamos 'src.models.user' por '..models.user'
 from ..models.user import User, db
+from ..models.serializers import serialize_users
+from ..models import search, conversations
+from ..models.autocomplete import autocomplete
+from ..models.presence import presence
+from .. import cache
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -32,14 +37,17 @@ def register():
         user.set_password(data['password'])
         
         db.session.add(user)
+        db.session.flush()
+        search.index_document(user)
         db.session.commit()
+        autocomplete.add(user)
         
         # Fazer login automático
         session['user_id'] = user.id
         
         return jsonify({
             'message': 'Usuário criado com sucesso',
-            'user': user.to_dict()
+            'user': serialize_users([user])[0]
         }), 201
         
     except Exception as e:
@@ -62,17 +70,14 @@ def login():
         if not user or not user.check_password(data['password']):
             return jsonify({'error': 'Credenciais inválidas'}), 401
         
-        # Atualizar status online
-        user.is_online = True
-        user.last_seen = datetime.utcnow()
-        db.session.commit()
+        presence.touch(user.id)
         
         # Criar sessão
         session['user_id'] = user.id
         
         return jsonify({
             'message': 'Login realizado com sucesso',
-            'user': user.to_dict(include_private=True)
+            'user': serialize_users([user])[0]
         }), 200
         
     except Exception as e:
@@ -82,14 +87,7 @@ def login():
 def logout():
     try:
         if 'user_id' in session:
-            # Atualizar status offline
-            user = User.query.get(session['user_id'])
-            if user:
-                user.is_online = False
-                user.last_seen = datetime.utcnow()
-                db.session.commit()
-            
-            session.pop('user_id', None)
+            presence.touch(session.pop('user_id'))
         
         return jsonify({'message': 'Logout realizado com sucesso'}), 200
         
@@ -107,7 +105,7 @@ def get_current_user():
             session.pop('user_id', None)
             return jsonify({'error': 'Usuário não encontrado'}), 404
         
-        return jsonify(user.to_dict(include_private=True)), 200
+        return jsonify(serialize_users([user])[0]), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -133,11 +131,15 @@ def update_current_user():
             user.avatar_url = data['avatar_url']
         
         user.updated_at = datetime.utcnow()
+        search.index_document(user)
+        conversations.partner_changed(user)
         db.session.commit()
+        cache.bump(f'user:{user.id}')
+        autocomplete.add(user)
         
         return jsonify({
             'message': 'Perfil atualizado com sucesso',
-            'user': user.to_dict(include_private=True)
+            'user': serialize_users([user])[0]
         }), 200
         
     except Exception as e:
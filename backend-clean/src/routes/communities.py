@@ -1,5 +1,11 @@
 from flask import Blueprint, jsonify, request, session
 from src.models.user import Community, User, db, community_members
+from src.models.serializers import serialize_communities, serialize_users, embed_community_related
+from src.models.counters import increment, decrement
+from src.models.pagination import InvalidCursor, keyset_paginate, cursor_response, wants_total
+from src.models.viewer_state import decorate_communities, decorate_users
+from src.models import search
+from src import cache
 from datetime import datetime
 
 communities_bp = Blueprint('communities', __name__)
@@ -14,24 +20,36 @@ def get_communities():
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
-        search = request.args.get('search', '')
+        search_term = request.args.get('search', '')
+        cursor = request.args.get('cursor')
         
         query = Community.query
         
-        if search:
-            query = query.filter(Community.name.contains(search))
+        if search_term:
+            query = query.filter(Community.id.in_(search.matching_ids('community', search_term)))
+        
+        if cursor is not None:
+            items, next_cursor = keyset_paginate(
+                query, Community.created_at, Community.id, cursor, per_page, descending=False
+            )
+            return jsonify(cursor_response(
+                'communities', decorate_communities(session.get('user_id'), serialize_communities(items)), next_cursor,
+                count_query=query if wants_total(request.args) else None
+            )), 200
         
         communities = query.paginate(
             page=page, per_page=per_page, error_out=False
         )
         
         return jsonify({
-            'communities': [community.to_dict() for community in communities.items],
+            'communities': decorate_communities(session.get('user_id'), serialize_communities(communities.items)),
             'total': communities.total,
             'pages': communities.pages,
             'current_page': page
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -67,12 +85,14 @@ def create_community():
                 role='admin'
             )
         )
+        increment(Community.members_count, community.id)
         
+        search.index_document(community)
         db.session.commit()
         
         return jsonify({
             'message': 'Comunidade criada com sucesso',
-            'community': community.to_dict()
+            'community': serialize_communities([community])[0]
         }), 201
         
     except Exception as e:
@@ -82,10 +102,15 @@ def create_community():
 @communities_bp.route('/communities/<int:community_id>', methods=['GET'])
 def get_community(community_id):
     try:
-        community = Community.query.get_or_404(community_id)
+        community_dict = cache.cached(
+            'community', [f'community:{community_id}'],
+            lambda: serialize_communities([Community.query.get_or_404(community_id)], related=False)[0],
+            params={'id': community_id}
+        )
+        embed_community_related([community_dict])
         
         # Verificar se é privada e se o usuário tem acesso
-        if community.is_private:
+        if community_dict['is_private']:
             if 'user_id' not in session:
                 return jsonify({'error': 'Comunidade privada - login necessário'}), 401
             
@@ -97,7 +122,7 @@ def get_community(community_id):
             if not is_member:
                 return jsonify({'error': 'Acesso negado - você não é membro desta comunidade'}), 403
         
-        return jsonify(community.to_dict()), 200
+        return jsonify(decorate_communities(session.get('user_id'), [community_dict])[0]), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -134,11 +159,13 @@ def update_community(community_id):
             community.is_private = data['is_private']
         
         community.updated_at = datetime.utcnow()
+        search.index_document(community)
         db.session.commit()
+        cache.bump('posts', f'community:{community_id}')
         
         return jsonify({
             'message': 'Comunidade atualizada com sucesso',
-            'community': community.to_dict()
+            'community': serialize_communities([community])[0]
         }), 200
         
     except Exception as e:
@@ -171,8 +198,10 @@ def join_community(community_id):
                 role='member'
             )
         )
+        increment(Community.members_count, community_id)
         
         db.session.commit()
+        cache.bump(f'community:{community_id}')
         
         return jsonify({'message': 'Você entrou na comunidade com sucesso'}), 200
         
@@ -195,14 +224,17 @@ def leave_community(community_id):
             return jsonify({'error': 'O dono da comunidade não pode sair'}), 400
         
         # Remover da comunidade
-        db.session.execute(
+        result = db.session.execute(
             community_members.delete().where(
                 (community_members.c.user_id == user_id) &
                 (community_members.c.community_id == community_id)
             )
         )
+        if result.rowcount:
+            decrement(Community.members_count, community_id)
         
         db.session.commit()
+        cache.bump(f'community:{community_id}')
         
         return jsonify({'message': 'Você saiu da comunidade'}), 200
         
@@ -233,9 +265,10 @@ def get_community_members(community_id):
             community_members, User.id == community_members.c.user_id
         ).filter(community_members.c.community_id == community_id)
         
+        rows = members_query.all()
         members = []
-        for user, role, joined_at in members_query:
-            member_data = user.to_dict()
+        members_data = decorate_users(session.get('user_id'), serialize_users([row[0] for row in rows]))
+        for member_data, (user, role, joined_at) in zip(members_data, rows):
             member_data['role'] = role
             member_data['joined_at'] = joined_at.isoformat()
             members.append(member_data)
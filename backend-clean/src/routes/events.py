@@ -1,5 +1,12 @@
 from flask import Blueprint, jsonify, request, session
 from src.models.user import Event, User, Community, db, event_participants
+from src.models.serializers import serialize_events, serialize_users, embed_event_related
+from src.models.counters import increment, decrement
+from src.models.pagination import InvalidCursor, keyset_paginate, cursor_response, wants_total
+from src.models.viewer_state import decorate_users
+from src.models import search
+from src.models.outbox import enqueue_notification
+from src import cache
 from datetime import datetime
 
 events_bp = Blueprint('events', __name__)
@@ -14,17 +21,27 @@ def get_events():
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
-        search = request.args.get('search', '')
+        search_term = request.args.get('search', '')
         community_id = request.args.get('community_id', type=int)
+        cursor = request.args.get('cursor')
         
         query = Event.query
         
-        if search:
-            query = query.filter(Event.title.contains(search))
+        if search_term:
+            query = query.filter(Event.id.in_(search.matching_ids('event', search_term)))
         
         if community_id:
             query = query.filter(Event.community_id == community_id)
         
+        if cursor is not None:
+            items, next_cursor = keyset_paginate(
+                query, Event.start_date, Event.id, cursor, per_page, descending=False
+            )
+            return jsonify(cursor_response(
+                'events', serialize_events(items), next_cursor,
+                count_query=query if wants_total(request.args) else None
+            )), 200
+        
         # Ordenar por data de início
         query = query.order_by(Event.start_date.asc())
         
@@ -33,12 +50,14 @@ def get_events():
         )
         
         return jsonify({
-            'events': [event.to_dict() for event in events.items],
+            'events': serialize_events(events.items),
             'total': events.total,
             'pages': events.pages,
             'current_page': page
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -94,12 +113,25 @@ def create_event():
                 status='going'
             )
         )
+        increment(Event.participants_count, event.id)
+        
+        # Avisar os membros da comunidade (entregue pelo outbox)
+        if community_id:
+            enqueue_notification(
+                'community', community_id,
+                title='Novo evento na comunidade',
+                content=f'{community.name}: {event.title}',
+                notification_type='event',
+                related_id=event.id,
+                actor_id=session['user_id']
+            )
         
+        search.index_document(event)
         db.session.commit()
         
         return jsonify({
             'message': 'Evento criado com sucesso',
-            'event': event.to_dict()
+            'event': serialize_events([event])[0]
         }), 201
         
     except Exception as e:
@@ -109,8 +141,13 @@ def create_event():
 @events_bp.route('/events/<int:event_id>', methods=['GET'])
 def get_event(event_id):
     try:
-        event = Event.query.get_or_404(event_id)
-        return jsonify(event.to_dict()), 200
+        event_dict = cache.cached(
+            'event', [f'event:{event_id}'],
+            lambda: serialize_events([Event.query.get_or_404(event_id)], related=False)[0],
+            params={'id': event_id}
+        )
+        embed_event_related([event_dict])
+        return jsonify(event_dict), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -156,12 +193,25 @@ def update_event(event_id):
         if 'max_participants' in data:
             event.max_participants = data['max_participants']
         
+        # Mudança de data ou local avisa os participantes (entregue pelo outbox)
+        if {'start_date', 'end_date', 'location'} & set(data):
+            enqueue_notification(
+                'event', event.id,
+                title='Evento atualizado',
+                content=f'{event.title} teve a data ou o local alterado',
+                notification_type='event',
+                related_id=event.id,
+                actor_id=session['user_id']
+            )
+        
         event.updated_at = datetime.utcnow()
+        search.index_document(event)
         db.session.commit()
+        cache.bump(f'event:{event_id}')
         
         return jsonify({
             'message': 'Evento atualizado com sucesso',
-            'event': event.to_dict()
+            'event': serialize_events([event])[0]
         }), 200
         
     except Exception as e:
@@ -188,7 +238,7 @@ def join_event(event_id):
         
         # Verificar limite de participantes
         if event.max_participants:
-            current_participants = len(event.participants)
+            current_participants = event.participants_count
             if current_participants >= event.max_participants:
                 return jsonify({'error': 'Evento lotado'}), 400
         
@@ -200,8 +250,10 @@ def join_event(event_id):
                 status='going'
             )
         )
+        increment(Event.participants_count, event_id)
         
         db.session.commit()
+        cache.bump(f'event:{event_id}')
         
         return jsonify({'message': 'Você se inscreveu no evento com sucesso'}), 200
         
@@ -224,14 +276,17 @@ def leave_event(event_id):
             return jsonify({'error': 'O criador do evento não pode sair'}), 400
         
         # Remover do evento
-        db.session.execute(
+        result = db.session.execute(
             event_participants.delete().where(
                 (event_participants.c.user_id == user_id) &
                 (event_participants.c.event_id == event_id)
             )
         )
+        if result.rowcount:
+            decrement(Event.participants_count, event_id)
         
         db.session.commit()
+        cache.bump(f'event:{event_id}')
         
         return jsonify({'message': 'Você saiu do evento'}), 200
         
@@ -249,9 +304,10 @@ def get_event_participants(event_id):
             event_participants, User.id == event_participants.c.user_id
         ).filter(event_participants.c.event_id == event_id)
         
+        rows = participants_query.all()
         participants = []
-        for user, status, joined_at in participants_query:
-            participant_data = user.to_dict()
+        participants_data = decorate_users(session.get('user_id'), serialize_users([row[0] for row in rows]))
+        for participant_data, (user, status, joined_at) in zip(participants_data, rows):
             participant_data['status'] = status
             participant_data['joined_at'] = joined_at.isoformat()
             participants.append(participant_data)
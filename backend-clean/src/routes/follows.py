@@ -1,9 +1,20 @@
 from flask import Blueprint, request, jsonify, session
+from sqlalchemy.exc import IntegrityError
 from src.models.user import db, User, user_follows
-from src.routes.notifications import create_notification
+from src.models.serializers import serialize_users
+from src.models.counters import increment, decrement
+from src.models.pagination import InvalidCursor, keyset_paginate, cursor_response, wants_total
+from src.models.timeline import backfill_author, remove_author
+from src.models.viewer_state import decorate_users
+from src.models.follow_graph import follow_graph
+from src.models.suggestions import suggestions_for
+from src import cache
+from src.models.outbox import enqueue_notification
 
 follows_bp = Blueprint('follows', __name__)
 
+MAX_IS_FOLLOWING_IDS = 500
+
 @follows_bp.route('/api/users/<int:user_id>/follow', methods=['POST'])
 def follow_user(user_id):
     """Seguir um usuário"""
@@ -19,21 +30,32 @@ def follow_user(user_id):
     current_user = User.query.get(current_user_id)
     
     # Verificar se já está seguindo
-    if user_to_follow in current_user.following:
+    if follow_graph.is_following(current_user_id, user_id):
         return jsonify({'error': 'Você já está seguindo este usuário'}), 400
     
-    # Adicionar follow
-    current_user.following.append(user_to_follow)
-    db.session.commit()
+    # Adicionar follow; a chave primária decide se a lista em memória estava
+    # desatualizada ou se outro pedido seguiu ao mesmo tempo
+    try:
+        db.session.execute(user_follows.insert().values(follower_id=current_user_id, followed_id=user_id))
+    except IntegrityError:
+        db.session.rollback()
+        follow_graph.forget(current_user_id)
+        return jsonify({'error': 'Você já está seguindo este usuário'}), 400
+    increment(User.followers_count, user_id)
+    increment(User.following_count, current_user_id)
+    backfill_author(current_user_id, user_to_follow)
     
-    # Criar notificação
-    create_notification(
-        user_id=user_id,
+    # Notificação entregue pelo outbox, na mesma transação do follow
+    enqueue_notification(
+        'user', user_id,
         title='Novo seguidor',
         content=f'{current_user.display_name or current_user.username} começou a seguir você',
         notification_type='follow',
-        related_id=current_user_id
+        actor_id=current_user_id
     )
+    db.session.commit()
+    cache.bump(f'user:{user_id}', f'user:{current_user_id}')
+    follow_graph.add(current_user_id, user_id)
     
     return jsonify({'message': 'Usuário seguido com sucesso'})
 
@@ -48,16 +70,25 @@ def unfollow_user(user_id):
     if current_user_id == user_id:
         return jsonify({'error': 'Você não pode deixar de seguir a si mesmo'}), 400
     
-    user_to_unfollow = User.query.get_or_404(user_id)
-    current_user = User.query.get(current_user_id)
+    User.query.get_or_404(user_id)
     
-    # Verificar se está seguindo
-    if user_to_unfollow not in current_user.following:
+    # Remover follow; o banco decide se estava seguindo (a lista em memória
+    # pode estar desatualizada nos dois sentidos e é descartada se divergir)
+    result = db.session.execute(user_follows.delete().where(
+        user_follows.c.follower_id == current_user_id,
+        user_follows.c.followed_id == user_id
+    ))
+    if not result.rowcount:
+        db.session.rollback()
+        if follow_graph.is_following(current_user_id, user_id):
+            follow_graph.forget(current_user_id)
         return jsonify({'error': 'Você não está seguindo este usuário'}), 400
-    
-    # Remover follow
-    current_user.following.remove(user_to_unfollow)
+    decrement(User.followers_count, user_id)
+    decrement(User.following_count, current_user_id)
+    remove_author(current_user_id, user_id)
     db.session.commit()
+    cache.bump(f'user:{user_id}', f'user:{current_user_id}')
+    follow_graph.remove(current_user_id, user_id)
     
     return jsonify({'message': 'Usuário deixou de ser seguido'})
 
@@ -67,13 +98,20 @@ def get_followers(user_id):
     user = User.query.get_or_404(user_id)
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    cursor = request.args.get('cursor')
+    
+    if cursor is not None:
+        query = User.query.join(user_follows, User.id == user_follows.c.follower_id).filter(
+            user_follows.c.followed_id == user_id
+        )
+        return _follow_cursor_page('followers', query, cursor, per_page)
     
     followers = User.query.join(user_follows, User.id == user_follows.c.follower_id).filter(
         user_follows.c.followed_id == user_id
     ).paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
-        'followers': [follower.to_dict() for follower in followers.items],
+        'followers': decorate_users(session.get('user_id'), serialize_users(followers.items)),
         'total': followers.total,
         'pages': followers.pages,
         'current_page': page,
@@ -87,13 +125,20 @@ def get_following(user_id):
     user = User.query.get_or_404(user_id)
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    cursor = request.args.get('cursor')
+    
+    if cursor is not None:
+        query = User.query.join(user_follows, User.id == user_follows.c.followed_id).filter(
+            user_follows.c.follower_id == user_id
+        )
+        return _follow_cursor_page('following', query, cursor, per_page)
     
     following = User.query.join(user_follows, User.id == user_follows.c.followed_id).filter(
         user_follows.c.follower_id == user_id
     ).paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
-        'following': [followed.to_dict() for followed in following.items],
+        'following': decorate_users(session.get('user_id'), serialize_users(following.items)),
         'total': following.total,
         'pages': following.pages,
         'current_page': page,
@@ -101,6 +146,22 @@ def get_following(user_id):
         'has_prev': following.has_prev
     })
 
+def _follow_cursor_page(items_key, query, cursor, per_page):
+    """Paginar seguidores/seguindo por (data do follow, id do usuário)"""
+    try:
+        rows, next_cursor = keyset_paginate(
+            query.add_columns(user_follows.c.created_at),
+            user_follows.c.created_at, User.id, cursor, per_page,
+            key=lambda row: (row[1], row[0].id)
+        )
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(cursor_response(
+        items_key, decorate_users(session.get('user_id'), serialize_users([user for user, _ in rows])), next_cursor,
+        count_query=query if wants_total(request.args) else None
+    ))
+
 @follows_bp.route('/api/users/<int:user_id>/is-following', methods=['GET'])
 def is_following(user_id):
     """Verificar se o usuário atual está seguindo outro usuário"""
@@ -112,10 +173,43 @@ def is_following(user_id):
     if current_user_id == user_id:
         return jsonify({'is_following': False})
     
-    current_user = User.query.get(current_user_id)
-    user_to_check = User.query.get_or_404(user_id)
-    
-    is_following = user_to_check in current_user.following
+    User.query.get_or_404(user_id)
     
-    return jsonify({'is_following': is_following})
+    return jsonify({'is_following': follow_graph.is_following(current_user_id, user_id)})
 
+@follows_bp.route('/is-following', methods=['POST'])
+def is_following_many():
+    """Verificar de uma vez quais usuários de uma lista o usuário atual segue"""
+    data = request.json or {}
+    user_ids = data.get('user_ids')
+    
+    # bool é subclasse de int: true/false do JSON não são IDs
+    if not isinstance(user_ids, list) or not all(
+        isinstance(i, int) and not isinstance(i, bool) for i in user_ids
+    ):
+        return jsonify({'error': 'user_ids deve ser uma lista de IDs'}), 400
+    if len(user_ids) > MAX_IS_FOLLOWING_IDS:
+        return jsonify({'error': f'Máximo de {MAX_IS_FOLLOWING_IDS} IDs por consulta'}), 400
+    
+    following = follow_graph.following_among(session.get('user_id'), user_ids)
+    
+    return jsonify({'is_following': {str(i): i in following for i in user_ids}})
+
+@follows_bp.route('/suggestions', methods=['GET'])
+def get_suggestions():
+    """Sugestões de quem seguir (pré-calculadas pelo job compute_suggestions)"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Não autorizado'}), 401
+    
+    try:
+        limit = min(request.args.get('limit', 10, type=int), 50)
+        suggestions = suggestions_for(session['user_id'], limit=limit)
+        
+        users = serialize_users([user for user, _ in suggestions])
+        for user, (_, mutual_count) in zip(users, suggestions):
+            user['mutual_count'] = mutual_count
+        
+        return jsonify({'suggestions': users})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,20 +1,24 @@
-from flask import Blueprint, request, jsonify, session
-from flask_socketio import emit, join_room, leave_room
-from src.models.user import db, Message, User, Community, Event
 from datetime import datetime
+from flask import Blueprint, current_app, request, jsonify, session
+from flask_socketio import emit, join_room, leave_room
+from src.models.user import db, Message, User, Conversation
+from src.models.serializers import serialize_messages, serialize_conversations
+from src.models.pagination import InvalidCursor, keyset_paginate, cursor_response
+from src.models import conversations
+from src.models.message_writer import message_writer, new_message, rewind
+from src.models.presence import presence
+from src.models.typing_indicator import typing_indicators
 
 messages_bp = Blueprint('messages', __name__)
 
-@messages_bp.route('/api/messages', methods=['GET'])
-def get_messages():
-    """Obter mensagens do usuário"""
-    if 'user_id' not in session:
-        return jsonify({'error': 'Não autorizado'}), 401
-    
-    user_id = session['user_id']
-    message_type = request.args.get('type', 'direct')
-    chat_id = request.args.get('chat_id')
-    
+HISTORY_LIMIT = 50  # mensagens por página do histórico
+MAX_HISTORY_LIMIT = 100
+SYNC_LIMIT = 100  # mensagens por sala no sync; além disso o cliente pagina com after_id
+MAX_SYNC_ROOMS = 50
+SYNC_OVERLAP = 2  # segundos reenviados antes do último ID (atraso de gravação e relógios entre workers)
+
+def _chat_query(user_id, message_type, chat_id):
+    """Mensagens de um chat (ou todas do tipo, sem chat_id)"""
     query = Message.query.filter_by(message_type=message_type)
     
     if message_type == 'direct':
@@ -33,9 +37,45 @@ def get_messages():
         query = query.filter_by(community_id=chat_id)
     elif message_type == 'event' and chat_id:
         query = query.filter_by(event_id=chat_id)
+    return query
+
+def _in_chat(message, user_id, message_type, chat_id):
+    """Verificar se uma mensagem em memória pertence ao chat"""
+    if message.message_type != message_type:
+        return False
+    if message_type == 'direct':
+        return {message.sender_id, message.receiver_id} == {user_id, chat_id}
+    if message_type == 'community':
+        return message.community_id == chat_id
+    return message.event_id == chat_id
+
+@messages_bp.route('/api/messages', methods=['GET'])
+def get_messages():
+    """Obter mensagens do usuário
+
+    Sem cursor, as mais recentes primeiro; ?before_id= continua para trás na
+    mesma ordem. ?after_id= traz as posteriores ao ID, das mais antigas para
+    as mais novas, para avançar a partir da última mensagem conhecida.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Não autorizado'}), 401
     
-    messages = query.order_by(Message.created_at.desc()).limit(50).all()
-    return jsonify([message.to_dict() for message in messages])
+    user_id = session['user_id']
+    message_type = request.args.get('type', 'direct')
+    chat_id = request.args.get('chat_id', type=int)
+    before_id = request.args.get('before_id', type=int)
+    after_id = request.args.get('after_id', type=int)
+    limit = min(max(request.args.get('limit', HISTORY_LIMIT, type=int), 1), MAX_HISTORY_LIMIT)
+    
+    query = _chat_query(user_id, message_type, chat_id)
+    
+    if after_id is not None:
+        messages = query.filter(Message.id > after_id).order_by(Message.id.asc()).limit(limit).all()
+    else:
+        if before_id is not None:
+            query = query.filter(Message.id < before_id)
+        messages = query.order_by(Message.id.desc()).limit(limit).all()
+    return jsonify(serialize_messages(messages))
 
 @messages_bp.route('/api/messages', methods=['POST'])
 def send_message():
@@ -46,19 +86,13 @@ def send_message():
     data = request.get_json()
     user_id = session['user_id']
     
-    message = Message(
-        content=data['content'],
-        sender_id=user_id,
-        receiver_id=data.get('receiver_id'),
-        community_id=data.get('community_id'),
-        event_id=data.get('event_id'),
-        message_type=data.get('message_type', 'direct')
-    )
+    message = new_message(user_id, data)
     
     db.session.add(message)
+    conversations.record_messages([message])
     db.session.commit()
     
-    return jsonify(message.to_dict()), 201
+    return jsonify(serialize_messages([message])[0]), 201
 
 @messages_bp.route('/api/messages/<int:message_id>/read', methods=['PUT'])
 def mark_message_read(message_id):
@@ -73,48 +107,102 @@ def mark_message_read(message_id):
     if message.receiver_id != user_id:
         return jsonify({'error': 'Não autorizado'}), 403
     
+    if not message.is_read and message.message_type == 'direct':
+        conversations.messages_read(user_id, message.sender_id)
     message.is_read = True
     db.session.commit()
     
     return jsonify({'message': 'Mensagem marcada como lida'})
 
+def _is_id(value):
+    """ID positivo vindo do JSON (bool é subclasse de int e não vale)"""
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+def _mark_conversation_read(socketio, user_id, partner_id, up_to_id):
+    """Marcar a conversa como lida até up_to_id e enviar o recibo; retorna quantas foram marcadas
+
+    O recibo (messages_read) vai para o parceiro, que vê as mensagens como
+    lidas, e para as outras conexões de quem leu, que zeram o contador.
+    """
+    # Mensagens do parceiro aceitas aqui podem ser lidas pelo emit antes de gravadas
+    accepted_id = max((m.id for m in message_writer.pending_messages()
+                       if m.message_type == 'direct' and m.sender_id == partner_id and m.receiver_id == user_id),
+                      default=0)
+    marked, advanced, up_to_id = conversations.mark_read(user_id, partner_id, up_to_id, accepted_id)
+    db.session.commit()
+    
+    if marked or advanced:
+        receipt = {
+            'reader_id': user_id,
+            'partner_id': partner_id,
+            'up_to_id': up_to_id,
+            'read_at': datetime.utcnow().isoformat()
+        }
+        socketio.emit('messages_read', receipt, room=f'user_{partner_id}')
+        socketio.emit('messages_read', receipt, room=f'user_{user_id}')
+    return marked
+
+@messages_bp.route('/api/conversations/<int:partner_id>/read', methods=['PUT'])
+def mark_conversation_read(partner_id):
+    """Marcar como lidas todas as mensagens do parceiro até up_to_id"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Não autorizado'}), 401
+    
+    up_to_id = (request.get_json(silent=True) or {}).get('up_to_id')
+    if not _is_id(up_to_id):
+        return jsonify({'error': 'up_to_id é obrigatório'}), 400
+    
+    marked = _mark_conversation_read(current_app.extensions['socketio'], session['user_id'], partner_id, up_to_id)
+    return jsonify({'message': 'Conversa marcada como lida', 'marked': marked})
+
 @messages_bp.route('/api/conversations', methods=['GET'])
 def get_conversations():
-    """Obter lista de conversas do usuário"""
+    """Obter lista de conversas do usuário, mais recentes primeiro
+
+    Com ?cursor= (vazio na primeira página) responde no modo cursor com
+    next_cursor e per_page conversas; sem ele, mantém o formato antigo: a
+    lista completa.
+    """
     if 'user_id' not in session:
         return jsonify({'error': 'Não autorizado'}), 401
     
     user_id = session['user_id']
+    cursor = request.args.get('cursor')
     
-    # Buscar últimas mensagens de cada conversa
-    conversations = []
-    
-    # Conversas diretas
-    direct_messages = db.session.query(Message).filter(
-        (Message.sender_id == user_id) | (Message.receiver_id == user_id),
-        Message.message_type == 'direct'
-    ).order_by(Message.created_at.desc()).all()
-    
-    seen_users = set()
-    for msg in direct_messages:
-        other_user_id = msg.receiver_id if msg.sender_id == user_id else msg.sender_id
-        if other_user_id not in seen_users:
-            seen_users.add(other_user_id)
-            other_user = User.query.get(other_user_id)
-            conversations.append({
-                'type': 'direct',
-                'id': other_user_id,
-                'name': other_user.display_name or other_user.username,
-                'avatar': other_user.avatar_url,
-                'last_message': msg.to_dict(),
-                'unread_count': Message.query.filter_by(
-                    sender_id=other_user_id,
-                    receiver_id=user_id,
-                    is_read=False
-                ).count()
-            })
-    
-    return jsonify(conversations)
+    if cursor is None:
+        rows = conversations.inbox_query(user_id).order_by(
+            Conversation.last_message_id.desc(), Conversation.partner_id.desc()
+        ).all()
+        return jsonify(serialize_conversations(rows))
+    
+    per_page = min(request.args.get('per_page', 50, type=int), 100)
+    try:
+        rows, next_cursor = keyset_paginate(
+            conversations.inbox_query(user_id),
+            Conversation.last_message_id, Conversation.partner_id, cursor, per_page,
+            key=lambda row: (row[0].last_message_id, row[0].partner_id)
+        )
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(cursor_response('conversations', serialize_conversations(rows), next_cursor))
+
+# Destino obrigatório por tipo de mensagem
+_MESSAGE_TARGETS = {'direct': 'receiver_id', 'community': 'community_id', 'event': 'event_id'}
+
+def _validate_message(data):
+    """Mensagem de erro para um envio inválido, ou None"""
+    if not isinstance(data, dict):
+        return 'Dados inválidos'
+    content = data.get('content')
+    if not isinstance(content, str) or not content.strip():
+        return 'Conteúdo é obrigatório'
+    target = _MESSAGE_TARGETS.get(data.get('message_type', 'direct'))
+    if target is None:
+        return 'Tipo de mensagem inválido'
+    if not isinstance(data.get(target), int):
+        return f'{target} é obrigatório'
+    return None
 
 # WebSocket events para chat em tempo real
 def init_socketio_events(socketio):
@@ -122,14 +210,20 @@ def init_socketio_events(socketio):
     def handle_connect():
         if 'user_id' in session:
             user_id = session['user_id']
-            join_room(f'user_{user_id}')
-            
-            # Atualizar status online
             user = User.query.get(user_id)
-            if user:
-                user.is_online = True
-                user.last_seen = datetime.utcnow()
-                db.session.commit()
+            if not user:
+                return False
+            
+            # Resumo do usuário guardado na sessão da conexão: os eventos
+            # seguintes não precisam consultar o banco
+            session['socket_user'] = {
+                'id': user.id,
+                'username': user.username,
+                'display_name': user.display_name,
+                'avatar_url': user.avatar_url
+            }
+            join_room(f'user_{user_id}')
+            presence.connect(user_id, request.sid)
             
             emit('connected', {'message': 'Conectado ao chat'})
     
@@ -138,13 +232,14 @@ def init_socketio_events(socketio):
         if 'user_id' in session:
             user_id = session['user_id']
             leave_room(f'user_{user_id}')
-            
-            # Atualizar status offline
-            user = User.query.get(user_id)
-            if user:
-                user.is_online = False
-                user.last_seen = datetime.utcnow()
-                db.session.commit()
+            presence.disconnect(user_id, request.sid)
+            typing_indicators.stop_all(request.sid)
+    
+    @socketio.on('heartbeat')
+    def handle_heartbeat():
+        """Manter a conexão contando como online"""
+        if 'user_id' in session:
+            presence.heartbeat(session['user_id'], request.sid)
     
     @socketio.on('join_chat')
     def handle_join_chat(data):
@@ -175,26 +270,22 @@ def init_socketio_events(socketio):
     
     @socketio.on('send_message')
     def handle_send_message(data):
+        """Aceitar a mensagem, responder o ack com o ID e emitir; a gravação é write-behind"""
         if 'user_id' not in session:
-            return
+            return {'error': 'Não autorizado'}
         
         user_id = session['user_id']
+        error = _validate_message(data)
+        if error:
+            return {'error': error, 'client_id': (data or {}).get('client_id')}
         
-        # Criar mensagem no banco
-        message = Message(
-            content=data['content'],
-            sender_id=user_id,
-            receiver_id=data.get('receiver_id'),
-            community_id=data.get('community_id'),
-            event_id=data.get('event_id'),
-            message_type=data.get('message_type', 'direct')
-        )
-        
-        db.session.add(message)
-        db.session.commit()
+        message, created = message_writer.submit(user_id, data)
+        ack = {'id': message.id, 'client_id': data.get('client_id'), 'created_at': message.created_at.isoformat()}
+        if not created:
+            return ack  # Reenvio: a mensagem já foi emitida
         
         # Emitir mensagem para a sala apropriada
-        message_data = message.to_dict()
+        message_data = serialize_messages([message])[0]
         
         if message.message_type == 'direct':
             # Enviar para ambos os usuários
@@ -205,28 +296,99 @@ def init_socketio_events(socketio):
             socketio.emit('new_message', message_data, room=f'community_{message.community_id}')
         elif message.message_type == 'event':
             socketio.emit('new_message', message_data, room=f'event_{message.event_id}')
+        
+        return ack
+    
+    @socketio.on('sync')
+    def handle_sync(data):
+        """Entrar nas salas e devolver o que chegou depois do último ID confirmado em cada uma
+
+        Recebe {'rooms': [{'type', 'id', 'last_id'}]}. A resposta (ack) traz as
+        mensagens de cada sala em ordem de ID, incluindo uma janela de
+        SYNC_OVERLAP segundos antes de last_id; o cliente descarta as que já
+        tem pelo ID. Com has_more, o resto vem por GET /api/messages?after_id=.
+        """
+        if 'user_id' not in session:
+            return {'error': 'Não autorizado'}
+        
+        user_id = session['user_id']
+        rooms = data.get('rooms') if isinstance(data, dict) else None
+        if not isinstance(rooms, list) or len(rooms) > MAX_SYNC_ROOMS:
+            return {'error': f'Informe até {MAX_SYNC_ROOMS} salas'}
+        # Validar todas antes de entrar em alguma; last_id ausente ou 0 = cliente sem histórico
+        for room in rooms:
+            if (not isinstance(room, dict) or room.get('type') not in _MESSAGE_TARGETS
+                    or not _is_id(room.get('id'))
+                    or room.get('last_id') not in (None, 0) and not _is_id(room['last_id'])):
+                return {'error': 'Sala inválida'}
+        
+        pending = message_writer.pending_messages()
+        synced = []
+        for room in rooms:
+            chat_type, chat_id, last_id = room['type'], room['id'], room.get('last_id')
+            
+            # Entrar antes de consultar: o que chegar depois vem pelo emit
+            if chat_type != 'direct':
+                join_room(f'{chat_type}_{chat_id}')
+            
+            query = _chat_query(user_id, chat_type, chat_id)
+            if last_id:
+                since = rewind(last_id, SYNC_OVERLAP)
+                rows = query.filter(Message.id > since).order_by(Message.id.asc()).limit(SYNC_LIMIT + 1).all()
+                has_more = len(rows) > SYNC_LIMIT
+                rows = rows[:SYNC_LIMIT]
+            else:
+                # Cliente sem histórico: só a página mais recente
+                since = 0
+                rows = query.order_by(Message.id.desc()).limit(SYNC_LIMIT).all()[::-1]
+                has_more = False
+            
+            if not has_more:
+                # Aceitas por este worker e ainda na fila de gravação
+                known = {message.id for message in rows}
+                rows += [message for message in pending if message.id > since and message.id not in known
+                         and _in_chat(message, user_id, chat_type, chat_id)]
+                rows.sort(key=lambda message: message.id)
+            synced.append((chat_type, chat_id, rows, has_more))
+        
+        serialized = iter(serialize_messages([message for _, _, rows, _ in synced for message in rows]))
+        return {'rooms': [{
+            'type': chat_type,
+            'id': chat_id,
+            'messages': [next(serialized) for _ in rows],
+            'has_more': has_more
+        } for chat_type, chat_id, rows, has_more in synced]}
+    
+    @socketio.on('mark_read')
+    def handle_mark_read(data):
+        """Marcar a conversa direta como lida até up_to_id; o ack traz quantas foram marcadas"""
+        if 'user_id' not in session:
+            return {'error': 'Não autorizado'}
+        
+        if not isinstance(data, dict) or not _is_id(data.get('partner_id')) or not _is_id(data.get('up_to_id')):
+            return {'error': 'partner_id e up_to_id são obrigatórios'}
+        
+        return {'marked': _mark_conversation_read(socketio, session['user_id'], data['partner_id'], data['up_to_id'])}
     
     @socketio.on('typing')
     def handle_typing(data):
-        if 'user_id' not in session:
+        """Repassar o indicador de digitação, agregado por usuário e sala"""
+        user = session.get('socket_user')
+        if user is None or not isinstance(data, dict):
             return
         
-        user_id = session['user_id']
         chat_type = data.get('type')
         chat_id = data.get('id')
         is_typing = data.get('typing', False)
         
-        user = User.query.get(user_id)
-        typing_data = {
-            'user_id': user_id,
-            'username': user.username,
-            'typing': is_typing
-        }
-        
         if chat_type == 'community':
-            emit('user_typing', typing_data, room=f'community_{chat_id}', include_self=False)
+            room = f'community_{chat_id}'
         elif chat_type == 'event':
-            emit('user_typing', typing_data, room=f'event_{chat_id}', include_self=False)
+            room = f'event_{chat_id}'
         elif chat_type == 'direct':
-            emit('user_typing', typing_data, room=f'user_{chat_id}', include_self=False)
+            room = f'user_{chat_id}'
+        else:
+            return
+        
+        typing_indicators.typing(user, room, request.sid, is_typing)
 
@@ -1,5 +1,12 @@
+import json
+from datetime import datetime
 from flask import Blueprint, request, jsonify, session
-from src.models.user import db, Notification, User
+from src.models.user import db, Notification
+from src.models.serializers import serialize_notifications
+from src.models.pagination import InvalidCursor, keyset_paginate, cursor_response, wants_total
+from src.models.notification_push import notification_pusher
+from src.models.notification_groups import AGGREGATED_TYPES, add_actor, add_to_group, bucket_for
+from src.models import unread
 
 notifications_bp = Blueprint('notifications', __name__)
 
@@ -13,18 +20,32 @@ def get_notifications():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     unread_only = request.args.get('unread_only', False, type=bool)
+    cursor = request.args.get('cursor')
     
     query = Notification.query.filter_by(user_id=user_id)
     
     if unread_only:
         query = query.filter_by(is_read=False)
     
+    if cursor is not None:
+        try:
+            items, next_cursor = keyset_paginate(
+                query, Notification.created_at, Notification.id, cursor, per_page
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify(cursor_response(
+            'notifications', serialize_notifications(items), next_cursor,
+            count_query=query if wants_total(request.args) else None
+        ))
+    
     notifications = query.order_by(Notification.created_at.desc()).paginate(
         page=page, per_page=per_page, error_out=False
     )
     
     return jsonify({
-        'notifications': [notification.to_dict() for notification in notifications.items],
+        'notifications': serialize_notifications(notifications.items),
         'total': notifications.total,
         'pages': notifications.pages,
         'current_page': page,
@@ -44,8 +65,11 @@ def mark_notification_read(notification_id):
     if notification.user_id != user_id:
         return jsonify({'error': 'Não autorizado'}), 403
     
+    was_unread = not notification.is_read
     notification.is_read = True
     db.session.commit()
+    if was_unread:
+        unread.notifications_read(user_id)
     
     return jsonify({'message': 'Notificação marcada como lida'})
 
@@ -59,6 +83,7 @@ def mark_all_notifications_read():
     
     Notification.query.filter_by(user_id=user_id, is_read=False).update({'is_read': True})
     db.session.commit()
+    unread.notifications_all_read(user_id)
     
     return jsonify({'message': 'Todas as notificações marcadas como lidas'})
 
@@ -68,23 +93,56 @@ def get_unread_count():
     if 'user_id' not in session:
         return jsonify({'error': 'Não autorizado'}), 401
     
-    user_id = session['user_id']
-    count = Notification.query.filter_by(user_id=user_id, is_read=False).count()
-    
-    return jsonify({'unread_count': count})
+    return jsonify({'unread_count': unread.notification_count(session['user_id'])})
+
+def add_notification(user_id, title, content, notification_type, related_id=None, actor_id=None):
+    """Criar a notificação na transação atual (sem commit)
 
-def create_notification(user_id, title, content, notification_type, related_id=None):
-    """Função helper para criar notificações"""
-    notification = Notification(
-        user_id=user_id,
-        title=title,
-        content=content,
-        notification_type=notification_type,
-        related_id=related_id
+    Com actor_id, tipos agregáveis (follow, like, comment) atualizam o grupo
+    aberto do mesmo objeto em vez de inserir outra linha. Retorna
+    (notificação, delta de não lidas); depois do commit, quem chamou passa os
+    dois para notification_added.
+    """
+    now = datetime.utcnow()
+    aggregate = actor_id is not None and notification_type in AGGREGATED_TYPES
+    
+    notification, unread_delta = None, 0
+    if aggregate:
+        notification, reopened = add_to_group(user_id, notification_type, related_id, actor_id, now)
+        unread_delta = int(reopened)
+    
+    if notification is None:
+        notification = Notification(
+            user_id=user_id,
+            title=title,
+            content=content,
+            notification_type=notification_type,
+            related_id=related_id,
+            created_at=now,
+            actor_count=1,
+            actor_ids=json.dumps([actor_id]) if actor_id is not None else None,
+            bucket=bucket_for(now) if aggregate else None
+        )
+        db.session.add(notification)
+        if aggregate:
+            db.session.flush()
+            add_actor(notification.id, actor_id)
+        unread_delta = 1
+    
+    return notification, unread_delta
+
+def notification_added(user_id, notification, unread_delta):
+    """Contagem de não lidas e entrega em tempo real, depois do commit"""
+    unread.notifications_added(user_id, unread_delta)
+    notification_pusher.push(user_id, notification.id)
+
+def create_notification(user_id, title, content, notification_type, related_id=None, actor_id=None):
+    """Função helper para criar notificações (com commit e push)"""
+    notification, unread_delta = add_notification(
+        user_id, title, content, notification_type, related_id=related_id, actor_id=actor_id
     )
-    
-    db.session.add(notification)
     db.session.commit()
+    notification_added(user_id, notification, unread_delta)
     
     return notification
 
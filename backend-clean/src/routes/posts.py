@@ -1,9 +1,26 @@
 from flask import Blueprint, jsonify, request, session
-from src.models.user import Post, Comment, Like, User, Community, db
+from src.models.user import Post, Comment, Like, Community, db
+from src.models.serializers import serialize_posts, serialize_comments, embed_post_related
+from src.models.counters import increment, decrement
+from src.models.pagination import InvalidCursor, keyset_paginate, cursor_response, wants_total
+from src.models.timeline import fan_out_post, remove_post, trim_timeline, home_timeline
+from src.models.viewer_state import decorate_posts, decorate_comments
+from src.models.like_buffer import like_buffer
+from src.models.ranking import hot_score, refresh_scores
+from src.models import search
+from src import cache
 from datetime import datetime
 
 posts_bp = Blueprint('posts', __name__)
 
+# Ordenações do feed: todas são leituras por coluna indexada; o cursor guarda
+# o nome da ordenação e só vale para ela
+SORT_COLUMNS = {
+    'new': Post.created_at,
+    'hot': Post.hot_score,
+    'top': Post.likes_count,
+}
+
 def require_auth():
     if 'user_id' not in session:
         return jsonify({'error': 'Não autenticado'}), 401
@@ -16,48 +33,98 @@ def get_posts():
         per_page = request.args.get('per_page', 20, type=int)
         community_id = request.args.get('community_id', type=int)
         user_id = request.args.get('user_id', type=int)
+        cursor = request.args.get('cursor')
+        sort = request.args.get('sort', 'new')
+        
+        if sort not in SORT_COLUMNS:
+            return jsonify({'error': 'Ordenação inválida (use new, hot ou top)'}), 400
+        
+        # A parte anônima da página vem do cache; o estado do visitante é
+        # aplicado depois
+        params = {
+            'page': page, 'per_page': per_page, 'community_id': community_id,
+            'user_id': user_id, 'cursor': cursor, 'sort': sort,
+            'include_total': wants_total(request.args)
+        }
+        data = cache.cached('posts', ['posts'], lambda: _posts_page(**params), params=params)
+        embed_post_related(data['posts'])
+        decorate_posts(session.get('user_id'), data['posts'])
+        
+        return jsonify(data), 200
+        
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@posts_bp.route('/feed', methods=['GET'])
+def get_home_feed():
+    """Home timeline: posts de quem o usuário segue, mais recentes primeiro"""
+    try:
+        auth_error = require_auth()
+        if auth_error:
+            return auth_error
         
-        query = Post.query
-        
-        if community_id:
-            query = query.filter(Post.community_id == community_id)
-        
-        if user_id:
-            query = query.filter(Post.author_id == user_id)
-        
-        # Ordenar por data de criação (mais recentes primeiro)
-        query = query.order_by(Post.created_at.desc())
+        user_id = session['user_id']
+        per_page = request.args.get('per_page', 20, type=int)
+        cursor = request.args.get('cursor')
         
-        posts = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        # Na primeira página, aproveitar para manter a timeline limitada
+        if not cursor:
+            trim_timeline(user_id)
+            db.session.commit()
         
-        posts_data = []
-        for post in posts.items:
-            post_dict = post.to_dict()
-            
-            # Adicionar informações de like do usuário atual
-            if 'user_id' in session:
-                user_like = Like.query.filter_by(
-                    user_id=session['user_id'], 
-                    post_id=post.id
-                ).first()
-                post_dict['user_liked'] = user_like is not None
-            else:
-                post_dict['user_liked'] = False
-            
-            posts_data.append(post_dict)
+        posts, next_cursor = home_timeline(user_id, cursor, per_page)
         
-        return jsonify({
-            'posts': posts_data,
-            'total': posts.total,
-            'pages': posts.pages,
-            'current_page': page
-        }), 200
+        return jsonify(cursor_response(
+            'posts', _posts_for_viewer(posts), next_cursor
+        )), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _posts_page(page, per_page, community_id, user_id, cursor, sort, include_total):
+    """Montar uma página anônima (sem estado do visitante) da listagem de posts"""
+    sort_column = SORT_COLUMNS[sort]
+    query = Post.query
+    
+    if community_id:
+        query = query.filter(Post.community_id == community_id)
+    
+    if user_id:
+        query = query.filter(Post.author_id == user_id)
+    
+    # Modo cursor (opt-in): sem OFFSET e sem COUNT(*) obrigatório
+    if cursor is not None:
+        items, next_cursor = keyset_paginate(
+            query, sort_column, Post.id, cursor, per_page, sort=sort
+        )
+        return cursor_response(
+            'posts', serialize_posts(items, related=False), next_cursor,
+            count_query=query if include_total else None
+        )
+    
+    # Ordenar pela coluna escolhida (por padrão, mais recentes primeiro)
+    query = query.order_by(sort_column.desc(), Post.id.desc())
+    
+    posts = query.paginate(
+        page=page, per_page=per_page, error_out=False
+    )
+    
+    return {
+        'posts': serialize_posts(posts.items, related=False),
+        'total': posts.total,
+        'pages': posts.pages,
+        'current_page': page
+    }
+
+def _posts_for_viewer(posts):
+    """Serializar posts com o estado do usuário atual (like, follow, membro)"""
+    return decorate_posts(session.get('user_id'), serialize_posts(posts))
+
 @posts_bp.route('/posts', methods=['POST'])
 def create_post():
     try:
@@ -81,15 +148,23 @@ def create_post():
             content=data['content'],
             image_url=data.get('image_url'),
             author_id=session['user_id'],
-            community_id=community_id
+            community_id=community_id,
+            hot_score=hot_score(0, 0, None)
         )
         
         db.session.add(post)
+        db.session.flush()  # Para obter o ID e a data do post
+        
+        # Entregar o post às timelines dos seguidores
+        fan_out_post(post)
+        
+        search.index_document(post)
         db.session.commit()
+        cache.bump('posts')
         
         return jsonify({
             'message': 'Post criado com sucesso',
-            'post': post.to_dict()
+            'post': serialize_posts([post])[0]
         }), 201
         
     except Exception as e:
@@ -99,19 +174,13 @@ def create_post():
 @posts_bp.route('/posts/<int:post_id>', methods=['GET'])
 def get_post(post_id):
     try:
-        post = Post.query.get_or_404(post_id)
-        
-        post_dict = post.to_dict()
-        
-        # Adicionar informações de like do usuário atual
-        if 'user_id' in session:
-            user_like = Like.query.filter_by(
-                user_id=session['user_id'], 
-                post_id=post.id
-            ).first()
-            post_dict['user_liked'] = user_like is not None
-        else:
-            post_dict['user_liked'] = False
+        post_dict = cache.cached(
+            'post', [f'post:{post_id}'],
+            lambda: serialize_posts([Post.query.get_or_404(post_id)], related=False)[0],
+            params={'id': post_id}
+        )
+        embed_post_related([post_dict])
+        decorate_posts(session.get('user_id'), [post_dict])
         
         return jsonify(post_dict), 200
         
@@ -139,11 +208,13 @@ def update_post(post_id):
             post.image_url = data['image_url']
         
         post.updated_at = datetime.utcnow()
+        search.index_document(post)
         db.session.commit()
+        cache.bump('posts', f'post:{post_id}')
         
         return jsonify({
             'message': 'Post atualizado com sucesso',
-            'post': post.to_dict()
+            'post': serialize_posts([post])[0]
         }), 200
         
     except Exception as e:
@@ -163,8 +234,12 @@ def delete_post(post_id):
         if post.author_id != session['user_id']:
             return jsonify({'error': 'Permissão negada'}), 403
         
+        remove_post(post.id)
+        search.remove_document(post)
         db.session.delete(post)
         db.session.commit()
+        like_buffer.forget(post_id)
+        cache.bump('posts', f'post:{post_id}')
         
         return jsonify({'message': 'Post deletado com sucesso'}), 200
         
@@ -179,30 +254,24 @@ def like_post(post_id):
         if auth_error:
             return auth_error
         
-        post = Post.query.get_or_404(post_id)
         user_id = session['user_id']
         
-        # Verificar se já curtiu
+        # Alternar: descurtir se já curtiu, senão curtir
         existing_like = Like.query.filter_by(user_id=user_id, post_id=post_id).first()
         
         if existing_like:
-            # Remover like (descurtir)
-            db.session.delete(existing_like)
+            result = like_buffer.unlike(user_id, post_id)
             action = 'descurtido'
         else:
-            # Adicionar like
-            like = Like(user_id=user_id, post_id=post_id)
-            db.session.add(like)
+            result = like_buffer.like(user_id, post_id)
             action = 'curtido'
         
-        db.session.commit()
-        
-        # Retornar contagem atualizada
-        likes_count = Like.query.filter_by(post_id=post_id).count()
+        if result is None:
+            return jsonify({'error': 'Post não encontrado'}), 404
         
         return jsonify({
             'message': f'Post {action} com sucesso',
-            'likes_count': likes_count,
+            'likes_count': result[0],
             'user_liked': action == 'curtido'
         }), 200
         
@@ -210,6 +279,42 @@ def like_post(post_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@posts_bp.route('/posts/<int:post_id>/like', methods=['PUT'])
+def put_like(post_id):
+    """Curtir um post (idempotente)"""
+    try:
+        auth_error = require_auth()
+        if auth_error:
+            return auth_error
+        
+        result = like_buffer.like(session['user_id'], post_id)
+        if result is None:
+            return jsonify({'error': 'Post não encontrado'}), 404
+        
+        return jsonify({'likes_count': result[0], 'user_liked': True}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@posts_bp.route('/posts/<int:post_id>/like', methods=['DELETE'])
+def delete_like(post_id):
+    """Descurtir um post (idempotente)"""
+    try:
+        auth_error = require_auth()
+        if auth_error:
+            return auth_error
+        
+        result = like_buffer.unlike(session['user_id'], post_id)
+        if result is None:
+            return jsonify({'error': 'Post não encontrado'}), 404
+        
+        return jsonify({'likes_count': result[0], 'user_liked': False}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @posts_bp.route('/posts/<int:post_id>/comments', methods=['GET'])
 def get_post_comments(post_id):
     try:
@@ -217,18 +322,31 @@ def get_post_comments(post_id):
         
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
+        cursor = request.args.get('cursor')
+        
+        if cursor is not None:
+            query = Comment.query.filter_by(post_id=post_id)
+            items, next_cursor = keyset_paginate(
+                query, Comment.created_at, Comment.id, cursor, per_page, descending=False
+            )
+            return jsonify(cursor_response(
+                'comments', decorate_comments(session.get('user_id'), serialize_comments(items)), next_cursor,
+                count_query=query if wants_total(request.args) else None
+            )), 200
         
         comments = Comment.query.filter_by(post_id=post_id).order_by(
             Comment.created_at.asc()
         ).paginate(page=page, per_page=per_page, error_out=False)
         
         return jsonify({
-            'comments': [comment.to_dict() for comment in comments.items],
+            'comments': decorate_comments(session.get('user_id'), serialize_comments(comments.items)),
             'total': comments.total,
             'pages': comments.pages,
             'current_page': page
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -252,11 +370,14 @@ def create_comment(post_id):
         )
         
         db.session.add(comment)
+        increment(Post.comments_count, post_id)
+        refresh_scores([post_id])
         db.session.commit()
+        cache.bump('posts', f'post:{post_id}')
         
         return jsonify({
             'message': 'Comentário criado com sucesso',
-            'comment': comment.to_dict()
+            'comment': serialize_comments([comment])[0]
         }), 201
         
     except Exception as e:
@@ -286,7 +407,7 @@ def update_comment(comment_id):
         
         return jsonify({
             'message': 'Comentário atualizado com sucesso',
-            'comment': comment.to_dict()
+            'comment': serialize_comments([comment])[0]
         }), 200
         
     except Exception as e:
@@ -307,7 +428,10 @@ def delete_comment(comment_id):
             return jsonify({'error': 'Permissão negada'}), 403
         
         db.session.delete(comment)
+        decrement(Post.comments_count, comment.post_id)
+        refresh_scores([comment.post_id])
         db.session.commit()
+        cache.bump('posts', f'post:{comment.post_id}')
         
         return jsonify({'message': 'Comentário deletado com sucesso'}), 200
         
@@ -0,0 +1,65 @@
+from flask import Blueprint, request, jsonify, session
+from src.models.serializers import serialize_posts, serialize_communities, serialize_events, serialize_users, public_view
+from src.models.pagination import InvalidCursor
+from src.models.viewer_state import decorate_posts, decorate_communities, decorate_users
+from src.models import search as search_index
+
+search_bp = Blueprint('search', __name__)
+
+# Serialização em lote e estado do visitante por tipo de resultado
+_SERIALIZERS = {
+    'post': (serialize_posts, decorate_posts),
+    'community': (serialize_communities, decorate_communities),
+    'event': (serialize_events, None),
+    'user': (serialize_users, decorate_users),
+}
+
+@search_bp.route('', methods=['GET'])
+def search():
+    """Buscar posts, comunidades, eventos e usuários por relevância"""
+    try:
+        query = request.args.get('q', '').strip()
+        kind = request.args.get('type') or None
+        per_page = min(request.args.get('per_page', 20, type=int), 50)
+        cursor = request.args.get('cursor') or None
+
+        if kind is not None and kind not in search_index.KINDS:
+            return jsonify({'error': 'Tipo de busca inválido'}), 400
+        if not query:
+            return jsonify({'error': 'Termo de busca é obrigatório'}), 400
+
+        try:
+            hits, next_cursor = search_index.search(query, kind=kind, cursor=cursor, per_page=per_page)
+        except InvalidCursor:
+            return jsonify({'error': 'Cursor inválido'}), 400
+
+        # Carregar os objetos de cada tipo com uma consulta por tipo
+        viewer_id = session.get('user_id')
+        items = {}
+        for hit_kind, (serialize, decorate) in _SERIALIZERS.items():
+            ids = [ref_id for k, ref_id, _ in hits if k == hit_kind]
+            if not ids:
+                continue
+            model = search_index.KINDS[hit_kind]
+            objects = model.query.filter(model.id.in_(ids)).all()
+            serialized = serialize(objects)
+            if decorate:
+                decorate(viewer_id, serialized)
+            for item in serialized:
+                items[(hit_kind, item['id'])] = item
+
+        # Documentos de objetos removidos fora dos handlers são ignorados; a busca
+        # devolve só o perfil público dos usuários (resultados, autores, donos)
+        results = [
+            {'type': k, 'score': score, 'item': public_view(items[(k, ref_id)])}
+            for k, ref_id, score in hits if (k, ref_id) in items
+        ]
+
+        return jsonify({
+            'results': results,
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
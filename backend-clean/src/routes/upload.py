@@ -3,6 +3,9 @@ import uuid
 from flask import Blueprint, request, jsonify, session, current_app
 from werkzeug.utils import secure_filename
 from PIL import Image
+from src.models.autocomplete import autocomplete
+from src.models import conversations
+from src import cache
 import io
 
 upload_bp = Blueprint('upload', __name__)
@@ -159,7 +162,10 @@ def upload_avatar():
         
         # Atualizar usuário
         user.avatar_url = f"/uploads/{filename}"
+        conversations.partner_changed(user)
         db.session.commit()
+        cache.bump(f'user:{user_id}')
+        autocomplete.add(user)
         
         return jsonify({
             'message': 'Avatar atualizado com sucesso',
@@ -1,12 +1,20 @@
 from flask import Blueprint, jsonify, request
 from src.models.user import User, db
+from src.models.serializers import serialize_users
+from src.models import search, conversations
+from src.models.autocomplete import autocomplete, DEFAULT_LIMIT
+from src.models.follow_graph import follow_graph
+from src.models.presence import presence
+from src import cache
 
 user_bp = Blueprint('user', __name__)
 
+MAX_ONLINE_IDS = 500
+
 @user_bp.route('/users', methods=['GET'])
 def get_users():
     users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    return jsonify(serialize_users(users))
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -14,13 +22,44 @@ def create_user():
     data = request.json
     user = User(username=data['username'], email=data['email'])
     db.session.add(user)
+    db.session.flush()
+    search.index_document(user)
     db.session.commit()
-    return jsonify(user.to_dict()), 201
+    autocomplete.add(user)
+    return jsonify(serialize_users([user])[0]), 201
+
+@user_bp.route('/users/autocomplete', methods=['GET'])
+def autocomplete_users():
+    """Sugestões de usuários por prefixo de username ou nome (sem consulta ao banco)"""
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', DEFAULT_LIMIT, type=int), 50)
+    return jsonify({'users': autocomplete.search(query, limit=limit)})
 
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
-    user = User.query.get_or_404(user_id)
-    return jsonify(user.to_dict())
+    user_dict = cache.cached(
+        'user', [f'user:{user_id}'],
+        lambda: serialize_users([User.query.get_or_404(user_id)])[0],
+        params={'id': user_id}
+    )
+    # A presença muda a cada conexão e não entra no cache
+    user_dict['is_online'] = presence.is_online(user_id)
+    return jsonify(user_dict)
+
+@user_bp.route('/users/online', methods=['POST'])
+def online_users():
+    """Verificar de uma vez quais usuários de uma lista estão online"""
+    data = request.json or {}
+    user_ids = data.get('user_ids')
+    
+    if not isinstance(user_ids, list) or not all(isinstance(i, int) for i in user_ids):
+        return jsonify({'error': 'user_ids deve ser uma lista de IDs'}), 400
+    if len(user_ids) > MAX_ONLINE_IDS:
+        return jsonify({'error': f'Máximo de {MAX_ONLINE_IDS} IDs por consulta'}), 400
+    
+    online = presence.online_among(user_ids)
+    
+    return jsonify({'online': {str(i): i in online for i in user_ids}})
 
 @user_bp.route('/users/<int:user_id>', methods=['PUT'])
 def update_user(user_id):
@@ -28,12 +67,20 @@ def update_user(user_id):
     data = request.json
     user.username = data.get('username', user.username)
     user.email = data.get('email', user.email)
+    search.index_document(user)
+    conversations.partner_changed(user)
     db.session.commit()
-    return jsonify(user.to_dict())
+    cache.bump(f'user:{user_id}')
+    autocomplete.add(user)
+    return jsonify(serialize_users([user])[0])
 
 @user_bp.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
+    search.remove_document(user)
     db.session.delete(user)
     db.session.commit()
+    cache.bump(f'user:{user_id}')
+    autocomplete.remove(user_id)
+    follow_graph.forget(user_id)
     return '', 204
@@ -0,0 +1,16 @@
+"""Configuração dos testes
+
+src.main cria o esquema e aplica as migrações ao ser importado; os testes usam
+um SQLite temporário para nunca tocar em src/instance/app.db.
+"""
+import os
+import tempfile
+
+_handle, DATABASE = tempfile.mkstemp(suffix='.db')
+os.close(_handle)
+os.environ['DATABASE_URL'] = f'sqlite:///{DATABASE}'
+os.environ.setdefault('WORKER_ID', '0')
+os.environ.pop('SOCKETIO_MESSAGE_QUEUE', None)
+
+def pytest_sessionfinish(session, exitstatus):
+    os.remove(DATABASE)
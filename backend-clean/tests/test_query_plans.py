@@ -0,0 +1,22 @@
+"""As consultas quentes não podem cair em varredura completa da tabela
+
+Usa as mesmas consultas e a mesma verificação de src/jobs/check_query_plans.py.
+"""
+import pytest
+
+from src.jobs.check_query_plans import app, explain, hot_queries, is_full_scan
+
+@pytest.mark.parametrize('name', list(hot_queries()))
+def test_hot_query_uses_index(name):
+    with app.app_context():
+        plan = explain(hot_queries()[name])
+    assert not any(is_full_scan(line) for line in plan), f'{name}: {" | ".join(plan)}'
+
+@pytest.mark.parametrize('line, full_scan', [
+    ('SCAN post', True),
+    ('SCAN post USING INDEX ix_post_created_at', False),
+    ('SEARCH message USING INDEX ix_message_pair_id (sender_id=? AND receiver_id=?)', False),
+    ('Seq Scan on post  (cost=0.00..1.01 rows=1 width=4)', True),
+])
+def test_is_full_scan(line, full_scan):
+    assert is_full_scan(line) is full_scan
@@ -9,11 +9,14 @@ const Chat = ({ chatType = 'direct', chatId, chatName }) => {
   const [typingUsers, setTypingUsers] = useState([]);
   const messagesEndRef = useRef(null);
   const typingTimeoutRef = useRef(null);
+  const lastIdRef = useRef(0);
+  const lastReadRef = useRef(0);
   
   const { socket, isConnected, joinChat, leaveChat, sendMessage, sendTyping } = useSocket();
 
   useEffect(() => {
     if (chatId) {
+      lastReadRef.current = 0;
       joinChat(chatType, chatId);
       loadMessages();
     }
@@ -26,6 +29,9 @@ const Chat = ({ chatType = 'direct', chatId, chatName }) => {
   }, [chatId, chatType]);
 
   useEffect(() => {
+    // Último ID recebido: ponto de partida do sync ao reconectar
+    lastIdRef.current = messages.length ? messages[messages.length - 1].id : 0;
+    markRead();
     scrollToBottom();
   }, [messages]);
 
@@ -33,16 +39,52 @@ const Chat = ({ chatType = 'direct', chatId, chatName }) => {
     if (socket) {
       socket.on('new_message', handleNewMessage);
       socket.on('user_typing', handleUserTyping);
+      socket.on('messages_read', handleMessagesRead);
+      socket.on('message_failed', handleMessageFailed);
     }
 
     return () => {
       if (socket) {
         socket.off('new_message', handleNewMessage);
         socket.off('user_typing', handleUserTyping);
+        socket.off('messages_read', handleMessagesRead);
+        socket.off('message_failed', handleMessageFailed);
       }
     };
   }, [socket]);
 
+  useEffect(() => {
+    if (!socket || !chatId) return;
+
+    // Ao reconectar, voltar à sala e buscar só o que chegou depois da última mensagem
+    const handleReconnect = () => {
+      socket.emit('sync', {
+        rooms: [{ type: chatType, id: Number(chatId), last_id: lastIdRef.current }]
+      }, (response) => {
+        const room = response?.rooms?.[0];
+        if (!room) return;
+        mergeMessages(room.messages);
+        if (room.has_more && room.messages.length) {
+          loadNewerMessages(room.messages[room.messages.length - 1].id);
+        }
+      });
+    };
+
+    socket.io.on('reconnect', handleReconnect);
+    return () => {
+      socket.io.off('reconnect', handleReconnect);
+    };
+  }, [socket, chatId, chatType]);
+
+  const mergeMessages = (incoming) => {
+    // O sync e o emit podem repetir mensagens: deduplicar pelo ID e manter a ordem
+    setMessages(prev => {
+      const ids = new Set(prev.map(m => m.id));
+      const fresh = incoming.filter(m => !ids.has(m.id));
+      return fresh.length ? [...prev, ...fresh].sort((a, b) => a.id - b.id) : prev;
+    });
+  };
+
   const loadMessages = async () => {
     try {
       const params = new URLSearchParams({
@@ -63,6 +105,31 @@ const Chat = ({ chatType = 'direct', chatId, chatName }) => {
     }
   };
 
+  const loadNewerMessages = async (afterId) => {
+    try {
+      const params = new URLSearchParams({
+        type: chatType,
+        chat_id: chatId,
+        after_id: afterId,
+        limit: 100
+      });
+
+      const response = await fetch(`/api/messages?${params}`, {
+        credentials: 'include'
+      });
+
+      if (response.ok) {
+        const data = await response.json();
+        mergeMessages(data);
+        if (data.length === 100) {
+          loadNewerMessages(data[data.length - 1].id);
+        }
+      }
+    } catch (error) {
+      console.error('Erro ao sincronizar mensagens:', error);
+    }
+  };
+
   const handleNewMessage = (message) => {
     // Verificar se a mensagem pertence a este chat
     if (
@@ -71,10 +138,38 @@ const Chat = ({ chatType = 'direct', chatId, chatName }) => {
       (chatType === 'community' && message.community_id === chatId) ||
       (chatType === 'event' && message.event_id === chatId)
     ) {
-      setMessages(prev => [...prev, message]);
+      mergeMessages([message]);
     }
   };
 
+  const markRead = () => {
+    if (chatType !== 'direct' || !socket) return;
+
+    // Uma chamada marca tudo do parceiro até a última mensagem recebida
+    const received = messages.filter(m => m.sender_id === Number(chatId));
+    const upToId = received.length ? received[received.length - 1].id : 0;
+    if (upToId > lastReadRef.current) {
+      lastReadRef.current = upToId;
+      socket.emit('mark_read', { partner_id: Number(chatId), up_to_id: upToId });
+    }
+  };
+
+  const handleMessagesRead = (receipt) => {
+    // Recibo do parceiro: as mensagens enviadas até up_to_id foram lidas
+    if (chatType !== 'direct' || receipt.reader_id !== Number(chatId)) return;
+    setMessages(prev => prev.map(m =>
+      m.receiver_id === receipt.reader_id && m.id <= receipt.up_to_id && !m.is_read
+        ? { ...m, is_read: true }
+        : m
+    ));
+  };
+
+  const handleMessageFailed = (data) => {
+    // O servidor aceitou a mensagem mas não conseguiu gravá-la: tirar da conversa
+    setMessages(prev => prev.filter(m => m.id !== data.id));
+    console.error('Mensagem não entregue:', data.error);
+  };
+
   const handleUserTyping = (data) => {
     if (data.typing) {
       setTypingUsers(prev => [...prev.filter(u => u.user_id !== data.user_id), data]);
@@ -82,10 +177,11 @@ const Chat = ({ chatType = 'direct', chatId, chatName }) => {
       setTypingUsers(prev => prev.filter(u => u.user_id !== data.user_id));
     }
 
-    // Remover indicador após 3 segundos
+    // O servidor repete typing=true a cada 3s e manda typing=false quando o
+    // usuário para; o timeout só cobre um aviso de parada perdido
     setTimeout(() => {
       setTypingUsers(prev => prev.filter(u => u.user_id !== data.user_id));
-    }, 3000);
+    }, 6000);
   };
 
   const handleSendMessage = (e) => {
@@ -182,6 +278,7 @@ const Chat = ({ chatType = 'direct', chatId, chatName }) => {
               <div className="text-sm">{message.content}</div>
               <div className="text-xs opacity-70 mt-1">
                 {formatTime(message.created_at)}
+                {chatType === 'direct' && message.receiver_id === Number(chatId) && message.is_read && ' · Lida'}
               </div>
             </div>
           </div>
@@ -192,7 +289,7 @@ const Chat = ({ chatType = 'direct', chatId, chatName }) => {
           <div className="flex justify-start">
             <div className="bg-gray-700 px-4 py-2 rounded-lg">
               <div className="text-xs text-cyan-300">
-                {typingUsers.map(u => u.username).join(', ')} está digitando...
+                {typingUsers.map(u => u.display_name || u.username).join(', ')} está digitando...
               </div>
             </div>
           </div>
@@ -3,6 +3,9 @@ import { io } from 'socket.io-client';
 
 const SocketContext = createContext();
 
+// Intervalo do heartbeat de presença (o servidor expira a conexão após 90s sem ele)
+const HEARTBEAT_INTERVAL = 30000;
+
 export const useSocket = () => {
   const context = useContext(SocketContext);
   if (!context) {
@@ -16,6 +19,7 @@ export const SocketProvider = ({ children }) => {
   const [isConnected, setIsConnected] = useState(false);
   const [messages, setMessages] = useState([]);
   const [notifications, setNotifications] = useState([]);
+  const [unreadCount, setUnreadCount] = useState(0);
 
   useEffect(() => {
     // Conectar ao servidor WebSocket
@@ -43,9 +47,13 @@ export const SocketProvider = ({ children }) => {
       setMessages(prev => [message, ...prev]);
     });
 
-    newSocket.on('new_notification', (notification) => {
-      console.log('Nova notificação recebida:', notification);
-      setNotifications(prev => [notification, ...prev]);
+    newSocket.on('new_notification', (payload) => {
+      // Notificações chegam em lote, já com a contagem de não lidas atualizada;
+      // grupos atualizados substituem a versão anterior da lista
+      console.log('Novas notificações recebidas:', payload);
+      const ids = new Set(payload.notifications.map(n => n.id));
+      setNotifications(prev => [...payload.notifications, ...prev.filter(n => !ids.has(n.id))]);
+      setUnreadCount(payload.unread_count);
     });
 
     newSocket.on('user_typing', (data) => {
@@ -53,9 +61,16 @@ export const SocketProvider = ({ children }) => {
       // Implementar indicador de digitação
     });
 
+    const heartbeat = setInterval(() => {
+      if (newSocket.connected) {
+        newSocket.emit('heartbeat');
+      }
+    }, HEARTBEAT_INTERVAL);
+
     setSocket(newSocket);
 
     return () => {
+      clearInterval(heartbeat);
       newSocket.close();
     };
   }, []);
@@ -89,12 +104,14 @@ export const SocketProvider = ({ children }) => {
     isConnected,
     messages,
     notifications,
+    unreadCount,
     joinChat,
     leaveChat,
     sendMessage,
     sendTyping,
     setMessages,
-    setNotifications
+    setNotifications,
+    setUnreadCount
   };
 
   return (